@@ -1,13 +1,32 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
+from flask import (Flask, Response, g, has_request_context, make_response, render_template, request, jsonify, send_file,
+                   session, redirect, url_for)
 import re
+import json
+import queue
+import base64
+import bisect
+import csv
+import hashlib
+import time
+import random
+import threading
+from collections import Counter
+import click
+from contextlib import contextmanager
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import os
+from markupsafe import Markup
+from werkzeug.local import LocalProxy
 from werkzeug.utils import secure_filename
 import uuid
 import secrets
-from werkzeug.security import generate_password_hash, check_password_hash
-from flask_migrate import Migrate
+from sqlalchemy import and_, case, func, literal, or_, true
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import aliased, contains_eager, joinedload
+from sqlalchemy.sql.expression import ClauseElement, Executable
 
 # 自動載入 .env 檔案
 try:
@@ -16,20 +35,21 @@ try:
 except ImportError:
     pass
 
-from db_autofix import check_and_rebuild_db
-
-# Render 部署會有 /data 目錄，本地則 fallback
-if os.path.exists('/data'):
-    DB_PATH = '/data/badminton.db'
-else:
-    DB_PATH = os.path.abspath('./badminton.db')
-
-check_and_rebuild_db(DB_PATH)
+from listing_cache import VersionedLRUCache
+from request_metrics import RequestMetrics, instrument_engine
+from event_hub import EventHub
+import cover_images
+import notification_outbox
+import password_hashing
+import player_stats
+import team_search
+import team_slots
+import team_geo
+import sqlite_profile
+import static_assets
 
 app = Flask(__name__)
 # --- Render/local 路徑與環境變數設定 ---
-import platform
-
 # Render 部署會有 /data 目錄，本地則 fallback
 if os.path.exists('/data'):
     DB_PATH = '/data/badminton.db'
@@ -39,6 +59,8 @@ else:
     UPLOAD_PATH = os.path.abspath('./uploads')
 
 app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{DB_PATH}'
+# SQLite 連線設定檔（WAL、busy_timeout、快取 pragma 與連線池），以 SQLITE_PROFILE 等環境變數調整
+SQLITE_PROFILE, SQLITE_PRAGMAS, app.config['SQLALCHEMY_ENGINE_OPTIONS'] = sqlite_profile.load_profile(os.environ)
 app.config['UPLOAD_FOLDER'] = UPLOAD_PATH
 
 # SECRET_KEY 必須設在環境變數（Render dashboard 設定）
@@ -46,22 +68,106 @@ app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY')
 if not app.config['SECRET_KEY']:
     raise RuntimeError('SECRET_KEY 環境變數未設定！請在 Render 或本地設置。')
 
+# 隊伍列表快取：容量與存活秒數
+app.config['TEAMS_CACHE_SIZE'] = int(os.environ.get('TEAMS_CACHE_SIZE', 256))
+app.config['TEAMS_CACHE_TTL'] = int(os.environ.get('TEAMS_CACHE_TTL', 30))
+# 隊伍頁名單/留言區塊快取：快取鍵已含最新事件 id，TTL 只用來回收冷門隊伍
+app.config['FRAGMENT_CACHE_SIZE'] = int(os.environ.get('FRAGMENT_CACHE_SIZE', 512))
+app.config['FRAGMENT_CACHE_TTL'] = int(os.environ.get('FRAGMENT_CACHE_TTL', 600))
+
+# 過期隊伍清理：每批隊伍數、是否先封存、背景排程間隔秒數（0 表示不排程，只能用 flask reap-expired-teams）
+app.config['REAPER_BATCH_SIZE'] = int(os.environ.get('REAPER_BATCH_SIZE', 500))
+app.config['REAPER_ARCHIVE'] = os.environ.get('REAPER_ARCHIVE', '1') == '1'
+app.config['REAPER_INTERVAL'] = int(os.environ.get('REAPER_INTERVAL', 0))
+
+# 請求量測：/metrics 是否啟用與存取 token（未設定則不檢查）、慢請求門檻毫秒（0 表示不記錄）、
+# 同一查詢在單一請求內重複幾次視為疑似 N+1
+app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', '1') == '1'
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN', '')
+app.config['SLOW_REQUEST_MS'] = int(os.environ.get('SLOW_REQUEST_MS', 0))
+app.config['N_PLUS_ONE_THRESHOLD'] = int(os.environ.get('N_PLUS_ONE_THRESHOLD', 10))
+
+# 行程衝突：block 與已正式報名的隊伍時間重疊時拒絕加入；warn 照常加入並在回應中列出重疊的隊伍；off 不檢查
+app.config['SCHEDULE_CONFLICT_MODE'] = os.environ.get('SCHEDULE_CONFLICT_MODE', 'block')
+if app.config['SCHEDULE_CONFLICT_MODE'] not in ('block', 'warn', 'off'):
+    raise RuntimeError(f'未知的 SCHEDULE_CONFLICT_MODE：{app.config["SCHEDULE_CONFLICT_MODE"]}（可用：block, warn, off）')
+
+# 通知：背景寄送執行緒數（0 表示不啟動，只能用 flask drain-notifications）、每批認領的收件者數、閒置時輪詢秒數、
+# 合併等待秒數（同一收件者在這段時間內的通知一起寄出）、最多嘗試次數、寄送方式（log 只寫入 log、smtp 寄 email）
+app.config['NOTIFY_WORKERS'] = int(os.environ.get('NOTIFY_WORKERS', 1))
+app.config['NOTIFY_BATCH_SIZE'] = int(os.environ.get('NOTIFY_BATCH_SIZE', 100))
+app.config['NOTIFY_INTERVAL'] = float(os.environ.get('NOTIFY_INTERVAL', 1))
+app.config['NOTIFY_COALESCE_SECONDS'] = int(os.environ.get('NOTIFY_COALESCE_SECONDS', 5))
+app.config['NOTIFY_MAX_ATTEMPTS'] = int(os.environ.get('NOTIFY_MAX_ATTEMPTS', 5))
+app.config['NOTIFY_SENDER'] = os.environ.get('NOTIFY_SENDER', 'log')
+app.config['NOTIFY_SMTP_HOST'] = os.environ.get('NOTIFY_SMTP_HOST', 'localhost')
+app.config['NOTIFY_SMTP_PORT'] = int(os.environ.get('NOTIFY_SMTP_PORT', 25))
+app.config['NOTIFY_FROM'] = os.environ.get('NOTIFY_FROM', 'noreply@localhost')
+if app.config['NOTIFY_SENDER'] not in ('log', 'smtp'):
+    raise RuntimeError(f'未知的 NOTIFY_SENDER：{app.config["NOTIFY_SENDER"]}（可用：log, smtp）')
+
+# SSE：每個 worker 同時開啟的串流上限。每個串流佔用一條 gthread 執行緒，上限需小於 GUNICORN_THREADS，
+# 其餘執行緒保留給一般請求；超過上限的連線回 503，頁面改用輪詢
+app.config['SSE_MAX_STREAMS'] = int(os.environ.get('SSE_MAX_STREAMS', 48))
+
+# 隊伍封面圖：上傳大小上限（與前端 validateImageFile 相同的 5MB）
+app.config['COVER_MAX_BYTES'] = int(os.environ.get('COVER_MAX_BYTES', 5 * 1024 * 1024))
+
+# 密碼雜湊：方式與成本（werkzeug 格式，例如 scrypt:32768:8:1 或 pbkdf2:sha256:600000；更改後使用者下次登入時自動重新雜湊）、
+# 每個 worker 同時計算的雜湊數、排隊上限（超過時登入與註冊回 503）、等待秒數上限
+app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', 1))
+app.config['PASSWORD_HASH_QUEUE'] = int(os.environ.get('PASSWORD_HASH_QUEUE', 16))
+app.config['PASSWORD_HASH_TIMEOUT'] = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+try:
+    password_hasher = password_hashing.PasswordHasher(
+        app.config['PASSWORD_HASH_METHOD'],
+        workers=app.config['PASSWORD_HASH_WORKERS'],
+        max_pending=app.config['PASSWORD_HASH_QUEUE'],
+        timeout=app.config['PASSWORD_HASH_TIMEOUT'],
+    )
+except ValueError as e:
+    raise RuntimeError(f'PASSWORD_HASH_METHOD 設定錯誤：{e}（可用：scrypt、pbkdf2）') from None
+
 # 自動建立 uploads 資料夾
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
 db = SQLAlchemy(app)
-migrate = Migrate(app, db)
+with app.app_context():
+    sqlite_profile.apply_pragmas(db.engine, SQLITE_PRAGMAS)
+
+# 目前登入的使用者：第一次用到時才查詢，同一個請求內路由與模板共用
+def get_current_user():
+    if 'user_id' not in session:
+        return None
+    if 'current_user' not in g:
+        g.current_user = db.session.get(User, session['user_id'])
+    return g.current_user
+
+
+# CSRF token 每個 session 只產生一次，登入/登出時才更換，避免每次回應都改寫 session cookie
+def get_csrf_token():
+    if 'csrf_token' not in session:
+        session['csrf_token'] = secrets.token_hex(16)
+    return session['csrf_token']
+
+
+def login_user(user):
+    session['user_id'] = user.id
+    session['csrf_token'] = secrets.token_hex(16)
+    g.current_user = user
+
+
+def logout_user():
+    session.pop('user_id', None)
+    session['csrf_token'] = secrets.token_hex(16)
+    g.pop('current_user', None)
+
 
 @app.context_processor
 def inject_user():
-    current_user = None
-    if 'user_id' in session:
-        current_user = User.query.get(session['user_id'])
-    
-    csrf_token = secrets.token_hex(16)
-    session['csrf_token'] = csrf_token
-    
-    return dict(current_user=current_user, csrf_token=csrf_token)
+    # 模板沒用到就不會查詢資料庫或寫入 session
+    return dict(current_user=LocalProxy(get_current_user), csrf_token=LocalProxy(get_csrf_token))
 
 # Database Models
 class User(db.Model):
@@ -82,13 +188,27 @@ class User(db.Model):
     notification_enabled = db.Column(db.Boolean, default=True)  # 通知設定
     ban_until = db.Column(db.DateTime)  # 禁令到期時間
 
+    # 雜湊在 password_hasher 的背景執行緒計算；忙碌時丟出 password_hashing.HasherBusy
     def set_password(self, password):
-        from werkzeug.security import generate_password_hash
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
-        from werkzeug.security import check_password_hash
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)[0]
+
+
+# 球場：以城市＋名稱識別，保存座標供同一球場的隊伍沿用
+class Venue(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    city = db.Column(db.String(50), nullable=False)
+    name = db.Column(db.String(100), nullable=False)
+    address = db.Column(db.String(200))
+    latitude = db.Column(db.Float, nullable=False)
+    longitude = db.Column(db.Float, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('uq_venue_city_name', 'city', 'name', unique=True),
+    )
 
 
 class Team(db.Model):
@@ -105,19 +225,56 @@ class Team(db.Model):
     description = db.Column(db.Text)
     cover_image = db.Column(db.String(200))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # 由 start_time 推導的時段欄位（team_slots.register_sync 維護），供時段篩選走索引
+    start_weekday = db.Column(db.SmallInteger)  # 0=週一 … 6=週日
+    start_minute = db.Column(db.SmallInteger)  # 開始時間為當天第幾分鐘
+    time_slot = db.Column(db.String(10))  # 早上/下午/晚上/深夜
+    is_weekend = db.Column(db.Boolean)
+    # 球場座標（沒有座標的隊伍不會出現在附近搜尋）與網格編號（team_geo.register_sync 維護）
+    venue_id = db.Column(db.Integer, db.ForeignKey('venue.id'))
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    geo_cell = db.Column(db.Integer)
     
     organizer = db.relationship('User', backref='organized_teams')
 
+    __table_args__ = (
+        db.Index('ix_team_start_time', 'start_time', 'id'),
+        db.Index('ix_team_end_time', 'end_time'),
+        db.Index('ix_team_created_at', 'created_at', 'id'),
+        db.Index('ix_team_slot', 'time_slot', 'start_time', 'id', 'is_weekend'),
+        db.Index('ix_team_weekend', 'is_weekend', 'start_time', 'id'),
+        # 附近搜尋只讀索引即可算出距離與過濾已開始的隊伍
+        db.Index('ix_team_geo', 'geo_cell', 'start_time', 'latitude', 'longitude', 'id'),
+        # 過期隊伍會被刪除，id 不可重複使用（片段快取與 ETag 以隊伍 id 為鍵）
+        {'sqlite_autoincrement': True},
+    )
+
+# 新增/修改隊伍時同步全文檢索索引（刪除由資料庫觸發器處理）、時段欄位與網格編號
+team_search.register_sync(Team)
+team_slots.register_sync(Team)
+team_geo.register_sync(Team)
+
 class TeamMember(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     team_id = db.Column(db.Integer, db.ForeignKey('team.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     is_waitlist = db.Column(db.Boolean, default=False)
     joined_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # 隊伍時間的副本（隊伍建立後不會改時間），以 (user_id, team_start) 索引查詢行程衝突
+    team_start = db.Column(db.DateTime)
+    team_end = db.Column(db.DateTime)
     
     team = db.relationship('Team', backref='members')
     user = db.relationship('User', backref='team_memberships')
 
+    __table_args__ = (
+        db.Index('ix_team_member_team_waitlist', 'team_id', 'is_waitlist', 'joined_at'),
+        db.Index('ix_team_member_user', 'user_id', 'team_id'),
+        db.Index('uq_team_member_team_user', 'team_id', 'user_id', unique=True),
+        db.Index('ix_team_member_schedule', 'user_id', 'team_start', 'team_end', 'team_id', 'is_waitlist'),
+    )
+
 class TeamMessage(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     team_id = db.Column(db.Integer, db.ForeignKey('team.id'), nullable=False)
@@ -129,6 +286,11 @@ class TeamMessage(db.Model):
     team = db.relationship('Team', backref='messages')
     user = db.relationship('User', backref='messages')
 
+    # SQLite 索引隱含 rowid（即 id），可直接依 id 排序與做 cursor 範圍查詢
+    __table_args__ = (
+        db.Index('ix_team_message_team_public', 'team_id', 'is_public'),
+    )
+
 class Cancellation(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -139,6 +301,273 @@ class Cancellation(db.Model):
     user = db.relationship('User', backref='cancellations')
     team = db.relationship('Team', backref='cancellations')
 
+    __table_args__ = (
+        db.Index('ix_cancellation_team', 'team_id'),
+    )
+
+# 過期隊伍封存：每隊一筆，成員與取消紀錄以 JSON 陣列保存
+class TeamArchive(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    team_id = db.Column(db.Integer, nullable=False, index=True)  # 原隊伍 id（改用 AUTOINCREMENT 前的舊資料可能重複）
+    name = db.Column(db.String(100), nullable=False)
+    organizer_id = db.Column(db.Integer, nullable=False)
+    location_city = db.Column(db.String(50), nullable=False)
+    location_venue = db.Column(db.String(100), nullable=False)
+    activity_type = db.Column(db.String(50), nullable=False)
+    start_time = db.Column(db.DateTime, nullable=False)
+    end_time = db.Column(db.DateTime, nullable=False)
+    max_participants = db.Column(db.Integer)
+    member_count = db.Column(db.Integer, nullable=False)
+    waitlist_count = db.Column(db.Integer, nullable=False)
+    message_count = db.Column(db.Integer, nullable=False)
+    members = db.Column(db.Text, nullable=False)  # [[user_id, is_waitlist], ...]
+    cancellations = db.Column(db.Text, nullable=False)  # [[user_id, hours_before_event, cancelled_at], ...]
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+# 隊伍事件紀錄：加入/退出/候補遞補/留言，供 SSE 串流推送與斷線續傳
+class TeamEvent(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    team_id = db.Column(db.Integer, nullable=False, index=True)
+    kind = db.Column(db.String(20), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # 事件 id 是 SSE 斷線續傳與快取失效的遞增序號，清理舊事件後也不可重複使用
+    __table_args__ = {'sqlite_autoincrement': True}
+
+
+# 與觸發的寫入放在同一個 transaction
+def record_team_event(team_id, kind, **data):
+    db.session.add(TeamEvent(team_id=team_id, kind=kind, payload=json.dumps(data, ensure_ascii=False)))
+
+
+NOTIFY_MESSAGE_PREVIEW = 100  # 留言通知節錄的字數
+
+
+# 通知寄件匣：與觸發的寫入同一個 transaction 新增，背景執行緒寄出後刪除（notification_outbox.py）
+class Notification(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)  # 收件者
+    kind = db.Column(db.String(20), nullable=False)  # join/promote/message
+    team_id = db.Column(db.Integer)
+    payload = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    available_at = db.Column(db.DateTime)  # 可被認領的時間（認領後延後一段租期）；NULL 表示重試次數用完、已放棄
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text)
+
+    __table_args__ = (
+        db.Index('ix_notification_available', 'available_at', 'id'),
+        db.Index('ix_notification_user', 'user_id', 'available_at'),
+    )
+
+
+# recipients 為收件者 user_id 的子查詢或清單，只寫入開啟通知的使用者；一次 INSERT ... SELECT 完成
+def build_enqueue_stmt(kind, team_id, recipients, **data):
+    now = datetime.utcnow()
+    select = db.select(
+        User.id, literal(kind), literal(team_id), literal(json.dumps(data, ensure_ascii=False)), literal(now),
+        literal(now + timedelta(seconds=app.config['NOTIFY_COALESCE_SECONDS'])), literal(0),
+    ).where(User.id.in_(recipients), User.notification_enabled == True)
+    return db.insert(Notification).from_select(
+        ['user_id', 'kind', 'team_id', 'payload', 'created_at', 'available_at', 'attempts'], select)
+
+
+# 隊伍成員（waitlist 為 True 時含候補）中除了 exclude_user_id 以外的 user_id
+def build_team_recipients_stmt(team_id, exclude_user_id, waitlist=False):
+    stmt = db.select(TeamMember.user_id).where(TeamMember.team_id == team_id, TeamMember.user_id != exclude_user_id)
+    if not waitlist:
+        stmt = stmt.where(TeamMember.is_waitlist == False)
+    return stmt
+
+
+# 與觸發的寫入放在同一個 transaction
+def enqueue_notifications(kind, team_id, recipients, **data):
+    db.session.execute(build_enqueue_stmt(kind, team_id, recipients, **data))
+
+
+# 球員信譽統計（player_stats.py）：累計值每人一列，近期統計依活動日期分日累加；
+# 與報名、退出、遞補、過期隊伍清理同一個 transaction 以 upsert 遞增，flask rebuild-player-stats 可從紀錄重建
+class UserStats(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    joined_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    played_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    cancellation_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    late_cancellation_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    notice_hours_total = db.Column(db.Float, nullable=False, default=0, server_default='0')
+    updated_at = db.Column(db.DateTime)
+
+    user = db.relationship('User', backref=db.backref('stats', uselist=False))
+
+
+class UserStatsDay(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)  # 活動日期
+    joined_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    played_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    cancellation_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    late_cancellation_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    notice_hours_total = db.Column(db.Float, nullable=False, default=0, server_default='0')
+
+    __table_args__ = (
+        db.Index('ix_user_stats_day_day', 'day'),
+    )
+
+
+# deltas 為子查詢，欄位為 user_id、day 與 player_stats.COUNTERS 中的部分計數（每列為增量）；
+# 回傳兩個 INSERT ... SELECT ... ON CONFLICT DO UPDATE，分別累加到分日與累計的統計
+def build_stats_upserts(deltas, now):
+    counters = [name for name in player_stats.COUNTERS if name in deltas.c]
+    sums = [func.sum(deltas.c[name]) for name in counters]
+    stmts = []
+    for model, keys, extra in ((UserStatsDay, ['user_id', 'day'], {}), (UserStats, ['user_id'], {'updated_at': now})):
+        group = [deltas.c[key] for key in keys]
+        # upsert 的 SELECT 需要 WHERE 子句，避免 SQLite 把 ON CONFLICT 解析成 JOIN 的 ON
+        select = db.select(*group, *sums, *[literal(value) for value in extra.values()]).where(true()).group_by(*group)
+        stmt = sqlite_insert(model).from_select([*keys, *counters, *extra], select)
+        update = {name: getattr(model, name) + stmt.excluded[name] for name in counters}
+        update.update({name: stmt.excluded[name] for name in extra})
+        stmts.append(stmt.on_conflict_do_update(index_elements=keys, set_=update))
+    return stmts
+
+
+def record_player_stats(user_id, game_start, **deltas):
+    """單一球員的統計增量，與觸發的寫入放在同一個 transaction。"""
+    source = db.select(literal(user_id).label('user_id'), literal(game_start.date()).label('day'),
+                       *[literal(value).label(name) for name, value in deltas.items()]).subquery()
+    for stmt in build_stats_upserts(source, datetime.utcnow()):
+        db.session.execute(stmt)
+
+
+# 多位球員近期統計一次查出：每人最多 WINDOW_DAYS 列，依主鍵範圍讀取
+def build_stats_window_stmt(user_ids, today):
+    first_day, last_day = player_stats.window_range(today)
+    return (
+        db.select(UserStatsDay.user_id, *[func.sum(getattr(UserStatsDay, name)).label(name)
+                                          for name in player_stats.COUNTERS])
+        .where(UserStatsDay.user_id.in_(user_ids), UserStatsDay.day.between(first_day, last_day))
+        .group_by(UserStatsDay.user_id)
+    )
+
+
+# 快取版本計數器：寫入時遞增，各 worker 讀取後判斷本機快取是否失效
+class CacheVersion(db.Model):
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+def get_cache_version(name):
+    version = db.session.execute(
+        db.select(CacheVersion.version).where(CacheVersion.name == name)
+    ).scalar()
+    return version or 0
+
+
+# 與觸發的寫入放在同一個 transaction，commit 後才對其他 worker 生效
+def bump_cache_version(name):
+    stmt = sqlite_insert(CacheVersion).values(name=name, version=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[CacheVersion.name],
+        set_={'version': CacheVersion.version + 1}
+    )
+    db.session.execute(stmt)
+
+
+teams_cache = VersionedLRUCache(maxsize=app.config['TEAMS_CACHE_SIZE'], ttl=app.config['TEAMS_CACHE_TTL'])
+
+
+# ====== 靜態檔案 ======
+
+# flask build-assets 產生的指紋檔名內容永不改變，可讓瀏覽器快取一年；尚未建置的檔案照常由 static/ 提供
+STATIC_MAX_AGE = 365 * 24 * 3600
+static_manifest = static_assets.load_manifest(app.static_folder)
+
+
+@app.url_defaults
+def fingerprint_static_url(endpoint, values):
+    if endpoint == 'static' and 'filename' in values:
+        values['filename'] = static_manifest.url_path(values['filename'])
+
+
+def serve_static(filename):
+    asset = static_manifest.built(filename)
+    if asset is None:
+        return app.send_static_file(filename)
+    # 依 Accept-Encoding 直接送出預先壓縮的檔案，不在請求中壓縮
+    encoding, path = static_assets.choose_encoding(asset, request.headers.get('Accept-Encoding'))
+    response = send_file(path, mimetype=asset.mimetype, conditional=True,
+                         etag=f'{asset.digest}-{encoding or "identity"}', max_age=STATIC_MAX_AGE)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+app.view_functions['static'] = serve_static
+
+
+@app.cli.command('build-assets')
+def build_assets_command():
+    """壓縮 static/ 下的檔案並加上內容指紋，另存 gzip / brotli 預先壓縮檔（重新啟動後生效）。"""
+    manifest = static_assets.build(app.static_folder)
+    for name, entry in sorted(manifest['assets'].items()):
+        encodings = ', '.join(entry['encodings']) or '-'
+        print(f'{name} -> {static_assets.BUILD_DIR}/{entry["path"]} ({entry["size"]} bytes; {encodings})')
+
+
+# ====== HTTP 快取驗證 ======
+
+# 模板內容與靜態檔建置版本也是驗證值的一部分，部署新版後舊的 ETag 自動失效
+def compute_template_version():
+    digest = hashlib.sha1()
+    template_dir = os.path.join(app.root_path, app.template_folder)
+    for root, dirs, files in os.walk(template_dir):
+        dirs.sort()
+        for name in sorted(files):
+            with open(os.path.join(root, name), 'rb') as f:
+                digest.update(name.encode() + f.read())
+    # 頁面引用的靜態檔網址也跟著建置版本改變
+    digest.update(static_manifest.version.encode())
+    return digest.hexdigest()[:12]
+
+
+TEMPLATE_VERSION = compute_template_version()
+
+
+def make_etag(*parts):
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+# 頁面內含 CSRF token 與登入狀態，驗證值需區分不同的 session
+def viewer_etag_parts():
+    token = session.get('csrf_token', '')
+    return session.get('user_id'), hashlib.sha1(token.encode()).hexdigest()[:12]
+
+
+def conditional_response(etag, render, last_modified=None, private=False):
+    """If-None-Match / If-Modified-Since 相符時直接回 304，不執行 render。"""
+    if last_modified is not None:
+        last_modified = last_modified.replace(microsecond=0, tzinfo=timezone.utc)
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains(etag)
+    else:
+        not_modified = (last_modified is not None and request.if_modified_since is not None
+                        and last_modified <= request.if_modified_since)
+    response = app.response_class(status=304) if not_modified else make_response(render())
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # 每次都向伺服器確認，由驗證值決定是否重送內容
+    response.cache_control.no_cache = True
+    if private:
+        response.cache_control.private = True
+        response.vary.add('Cookie')
+    else:
+        response.cache_control.public = True
+    return response
+
 # Routes
 @app.route('/')
 def index():
@@ -147,61 +576,367 @@ def index():
     return render_template('index.html')
 
 
-@app.route('/teams')
-def teams():
-    city = request.args.get('city', '')
-    venue = request.args.get('venue', '')
-    skill_level = request.args.get('skill_level', '')
-    time_period = request.args.get('time_period', '')
-    
-    query = Team.query
-    
+# 列表排序方式：名稱 -> (排序欄位, 是否遞減)；relevance 依全文檢索分數、distance 依與搜尋點的距離排序
+TEAM_SORTS = {
+    'start_time': ('start_time', False),   # 即將開始
+    '-start_time': ('start_time', True),   # 最晚開始
+    '-created_at': ('created_at', True),   # 最新建立
+    'relevance': (None, False),            # 搜尋相關度（需搭配 q）
+    'distance': (None, False),             # 由近到遠（需搭配 near）
+}
+DEFAULT_TEAM_SORT = 'start_time'
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+# 隊伍列表查詢：一次 JOIN + GROUP BY 取回隊伍、主辦者欄位與報名/候補人數，
+# 避免每隊各自 COUNT 與延遲載入 organizer 造成的 N+1 查詢。
+# 以 (排序欄位, id) 做 keyset 分頁，after 為上一頁最後一筆的 (排序值, id)。
+# q 以 FTS5 全文檢索過濾隊伍名稱、球場、地址與說明；slots 以預先算好的時段欄位過濾；
+# near 只讀取涵蓋搜尋範圍的網格，並帶出距離平方 distance_sq。
+# 隊伍列表每一列：隊伍、主辦者資訊與正式/候補人數（呼叫端需 GROUP BY Team.id, User.id）
+def build_team_rows_stmt():
+    columns = [
+        Team,
+        User.nickname,
+        User.gender,
+        User.skill_level.label('organizer_skill_level'),
+        func.sum(case((TeamMember.is_waitlist == False, 1), else_=0)).label('current_members'),
+        func.sum(case((TeamMember.is_waitlist == True, 1), else_=0)).label('waitlist_count'),
+    ]
+    return (
+        db.select(*columns)
+        .join(User, User.id == Team.organizer_id)
+        .outerjoin(TeamMember, TeamMember.team_id == Team.id)
+    )
+
+
+def build_team_listing_stmt(city='', venue='', skill_level='', sort=DEFAULT_TEAM_SORT, limit=None, after=None, q='',
+                            slots=team_slots.NO_FILTER, near=None):
+    column_name, descending = TEAM_SORTS[sort]
+    match_query = team_search.build_match_query(q)
+    distance_sq = team_geo.distance_sq_column(Team, near) if near else None
+    if column_name:
+        sort_col = getattr(Team, column_name)
+    elif sort == 'distance' and near:
+        sort_col = distance_sq
+    elif match_query:
+        sort_col = team_search.score_column()
+    else:
+        sort_col = Team.start_time
+
+    page = db.select(Team.id).where(Team.start_time > datetime.utcnow())
+    if match_query:
+        page = page.add_columns(team_search.score_column().label('score'))
+        page = page.join(team_search.team_fts, team_search.team_fts.c.rowid == Team.id)
+        page = page.where(team_search.match_clause(match_query))
+    if near:
+        page = page.add_columns(distance_sq.label('distance_sq'))
+        page = page.where(*team_geo.where_clauses(Team, near))
     if city:
-        query = query.filter(Team.location_city.contains(city))
+        page = page.where(Team.location_city.contains(city))
     if venue:
-        query = query.filter(Team.location_venue.contains(venue))
+        page = page.where(Team.location_venue.contains(venue))
     if skill_level:
-        query = query.filter(Team.activity_type.contains(skill_level))
-    
-    teams = query.filter(Team.start_time > datetime.utcnow()).all()
+        page = page.where(Team.activity_type.contains(skill_level))
+    page = page.where(*team_slots.where_clauses(Team, slots))
+    if after:
+        after_value, after_id = after
+        if descending:
+            page = page.where(or_(sort_col < after_value,
+                                  and_(sort_col == after_value, Team.id < after_id)))
+        else:
+            page = page.where(or_(sort_col > after_value,
+                                  and_(sort_col == after_value, Team.id > after_id)))
+    order_by = (sort_col.desc(), Team.id.desc()) if descending else (sort_col, Team.id)
+    page = page.order_by(*order_by)
+    if limit:
+        page = page.limit(limit)
+
+    stmt = build_team_rows_stmt()
+    group_by = [Team.id, User.id]
+    if match_query or near:
+        # bm25() 不能出現在 GROUP BY 查詢內，分數與距離改由本頁子查詢帶出
+        page = page.subquery()
+        stmt = stmt.join(page, page.c.id == Team.id)
+        if match_query:
+            stmt = stmt.add_columns(page.c.score)
+            group_by.append(page.c.score)
+        if near:
+            stmt = stmt.add_columns(page.c.distance_sq)
+            group_by.append(page.c.distance_sq)
+        if not column_name:
+            order_by = (page.c.distance_sq if sort == 'distance' and near else page.c.score, Team.id)
+    else:
+        stmt = stmt.where(Team.id.in_(page))
+    return stmt.group_by(*group_by).order_by(*order_by)
+
+
+def query_team_listing(*args, **kwargs):
+    return db.session.execute(build_team_listing_stmt(*args, **kwargs)).all()
+
+
+def cover_url(cover_image, variant=None):
+    """Team.cover_image 存的是 <雜湊>.<副檔名>，轉為圖片網址；variant 為 None 時為原圖。"""
+    if not cover_image:
+        return None
+    digest, extension = cover_image.split('.', 1)
+    return url_for('cover_file', name=cover_images.file_name(digest, extension, variant))
+
+
+def serialize_team_row(row):
+    team = row.Team
+    return {
+        'id': team.id,
+        'name': team.name,
+        'organizer': row.nickname,
+        'organizer_gender': row.gender,
+        'organizer_skill_level': row.organizer_skill_level,
+        'location_city': team.location_city,
+        'location_venue': team.location_venue,
+        'location_address': team.location_address,
+        'start_time': team.start_time.strftime('%Y-%m-%d %H:%M'),
+        'end_time': team.end_time.strftime('%Y-%m-%d %H:%M'),
+        'activity_type': team.activity_type,
+        'current_members': row.current_members or 0,
+        'max_participants': team.max_participants,
+        'waitlist_count': row.waitlist_count or 0,
+        'description': team.description,
+        'cover_image': cover_url(team.cover_image, 'card'),
+        'latitude': team.latitude,
+        'longitude': team.longitude,
+    }
+
+
+# cursor 為 base64url 編碼的 JSON：[排序值, team id]，排序值為 ISO 時間、相關度分數或距離平方
+def encode_team_cursor(row, sort):
+    column_name, _ = TEAM_SORTS[sort]
+    if column_name:
+        value = getattr(row.Team, column_name).isoformat()
+    elif sort == 'distance':
+        value = row.distance_sq
+    else:
+        value = row.score
+    payload = json.dumps([value, row.Team.id])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_team_cursor(cursor, sort):
+    column_name, _ = TEAM_SORTS[sort]
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        value, team_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        value = datetime.fromisoformat(value) if column_name else float(value)
+        return value, int(team_id)
+    except (ValueError, TypeError):
+        return None
+
+
+# time_period：平日晚間、假日、早上等，preferred 為登入者個人檔案的偏好時段；
+# weekdays：1,6,7（1=週一）；start_from / start_until：開始時間介於 HH:MM 之間。格式錯誤時丟出 ValueError
+def parse_slot_filter(args):
+    time_period = args.get('time_period', '').strip()
+    if time_period == 'preferred':
+        user = get_current_user()
+        preferred = user.preferred_time if user else ''
+        time_period = '' if preferred in team_slots.ANY_TIME else preferred
+    is_weekend, time_slot = team_slots.parse_time_period(time_period)
+    weekdays = args.get('weekdays', '').strip()
+    start_from = args.get('start_from', '').strip()
+    start_until = args.get('start_until', '').strip()
+    return team_slots.SlotFilter(
+        is_weekend, time_slot,
+        team_slots.parse_weekdays(weekdays) if weekdays else None,
+        team_slots.parse_clock(start_from) if start_from else None,
+        team_slots.parse_clock(start_until) if start_until else None,
+    )
+
+
+@app.route('/teams')
+def teams():
+    # 查詢與快取鍵使用同一組正規化後的條件，避免不同寫法共用快取卻查到不同結果
+    city = request.args.get('city', '').strip()
+    venue = request.args.get('venue', '').strip()
+    skill_level = request.args.get('skill_level', '').strip()
+    q = request.args.get('q', '').strip()
+    # 只有標點符號等無法檢索的內容時視為未搜尋
+    if not team_search.build_match_query(q):
+        q = ''
+    # near=緯度,經度、radius=公里：只列出範圍內有座標的隊伍，預設由近到遠排序
+    near = None
+    if request.args.get('near'):
+        try:
+            near = team_geo.parse_near(request.args['near'], request.args.get('radius', ''))
+        except (ValueError, TypeError):
+            return jsonify({'error': '位置格式錯誤'}), 400
+    default_sort = 'distance' if near else 'relevance' if q else DEFAULT_TEAM_SORT
+    sort = request.args.get('sort', default_sort)
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    cursor = request.args.get('cursor', '')
     
-    team_data = []
-    for team in teams:
-        current_members = TeamMember.query.filter_by(team_id=team.id, is_waitlist=False).count()
-        waitlist_count = TeamMember.query.filter_by(team_id=team.id, is_waitlist=True).count()
-        
-        team_data.append({
-            'id': team.id,
-            'name': team.name,
-            'organizer': team.organizer.nickname,
-            'organizer_gender': team.organizer.gender,
-            'organizer_skill_level': team.organizer.skill_level,
-            'location_city': team.location_city,
-            'location_venue': team.location_venue,
-            'location_address': team.location_address,
-            'start_time': team.start_time.strftime('%Y-%m-%d %H:%M'),
-            'end_time': team.end_time.strftime('%Y-%m-%d %H:%M'),
-            'activity_type': team.activity_type,
-            'current_members': current_members,
-            'max_participants': team.max_participants,
-            'waitlist_count': waitlist_count,
-            'description': team.description,
-            'cover_image': team.cover_image
-        })
+    if sort not in TEAM_SORTS or (sort == 'relevance' and not q) or (sort == 'distance' and not near):
+        return jsonify({'error': '不支援的排序方式'}), 400
+    after = None
+    if cursor:
+        after = decode_team_cursor(cursor, sort)
+        if after is None:
+            return jsonify({'error': 'cursor 格式錯誤'}), 400
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    if request.args.get('time_period') == 'preferred' and 'user_id' not in session:
+        return jsonify({'error': '請先登入'}), 401
+    try:
+        slots = parse_slot_filter(request.args)
+    except ValueError:
+        return jsonify({'error': '時段格式錯誤'}), 400
     
-    return jsonify(team_data)
+    # 先讀版本號再查詢，確保快取內容不會比版本號舊
+    version = get_cache_version('teams')
+    # 快取鍵使用解析後的時段條件，preferred 依使用者不同而不同
+    cache_key = (city, venue, skill_level, q, slots, near, sort, limit, cursor)
+    cached = teams_cache.get(cache_key, version)
+    if cached is None:
+        rows = query_team_listing(city, venue, skill_level, sort=sort, limit=limit, after=after, q=q, slots=slots,
+                                  near=near)
+        next_cursor = encode_team_cursor(rows[-1], sort) if len(rows) == limit else None
+        items = [serialize_team_row(row) for row in rows]
+        if near:
+            for item, row in zip(items, rows):
+                item['distance_km'] = team_geo.distance_km(row.distance_sq)
+        body = json.dumps({
+            'teams': items,
+            'next_cursor': next_cursor
+        }, ensure_ascii=False)
+        # 列表會隨時間變動（已開始的隊伍不再列出），ETag 取自內容本身
+        cached = (make_etag(body), body)
+        teams_cache.set(cache_key, version, cached)
+    etag, body = cached
+    return conditional_response(etag, lambda: app.response_class(body, mimetype='application/json'))
+
+
+# ====== 隊伍推薦 ======
+
+RECOMMEND_PAGE_SIZE = 20
+MAX_RECOMMEND_PAGE_SIZE = 100
+
+team_recommender_index = None
+team_recommender_lock = threading.Lock()
+
+
+# numpy 只在第一次使用推薦功能時載入（不拖慢啟動），未安裝時停用此功能
+def get_team_recommender():
+    global team_recommender_index
+    if team_recommender_index is None:
+        with team_recommender_lock:
+            if team_recommender_index is None:
+                try:
+                    from team_recommender import TeamRecommender
+                except ImportError:
+                    return None
+                team_recommender_index = TeamRecommender()
+    return team_recommender_index
+
+
+# 推薦計分所需的隊伍特徵：主辦者級數、正式成員人數與級數總和
+def build_recommendation_rows_stmt(team_ids=None):
+    member_user = aliased(User)
+    confirmed = TeamMember.is_waitlist == False
+    stmt = (
+        db.select(Team.id, Team.start_time, Team.end_time, Team.location_city, Team.max_participants,
+                  User.skill_level,
+                  func.sum(case((confirmed, 1), else_=0)),
+                  func.sum(case((confirmed, member_user.skill_level), else_=0)))
+        .join(User, User.id == Team.organizer_id)
+        .outerjoin(TeamMember, TeamMember.team_id == Team.id)
+        .outerjoin(member_user, member_user.id == TeamMember.user_id)
+        .where(Team.start_time > datetime.utcnow())
+        .group_by(Team.id, User.id)
+    )
+    if team_ids is not None:
+        stmt = stmt.where(Team.id.in_(team_ids))
+    return stmt
+
+
+def load_recommendation_rows(team_ids):
+    from team_recommender import TeamRow
+    return [TeamRow(*row) for row in db.session.execute(build_recommendation_rows_stmt(team_ids))]
+
+
+# 留言不影響推薦特徵；建立/報名/退出/遞補才需要重算該隊
+def build_changed_teams_stmt(after_id, until_id):
+    return (
+        db.select(TeamEvent.team_id)
+        .where(TeamEvent.id > after_id, TeamEvent.id <= until_id, TeamEvent.kind != 'message')
+        .distinct()
+    )
+
+
+def changed_recommendation_teams(after_id, until_id):
+    return db.session.execute(build_changed_teams_stmt(after_id, until_id)).scalars().all()
+
+
+@app.route('/teams/recommended')
+def recommended_teams():
+    if 'user_id' not in session:
+        return jsonify({'error': '請先登入'}), 401
+    recommender = get_team_recommender()
+    if recommender is None:
+        return jsonify({'error': '推薦功能未啟用（需要安裝 numpy）'}), 503
+    user = get_current_user()
+    limit = request.args.get('limit', RECOMMEND_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, MAX_RECOMMEND_PAGE_SIZE))
+
+    # 以最新事件 id 增量更新隊伍特徵；修改個人檔案（級數）時整批重建
+    latest_event_id = db.session.execute(db.select(func.max(TeamEvent.id))).scalar() or 0
+    recommender.sync(get_cache_version('profiles'), latest_event_id,
+                     changed_recommendation_teams, load_recommendation_rows)
+    joined = db.session.execute(
+        db.select(TeamMember.team_id).where(TeamMember.user_id == user.id)
+    ).scalars().all()
+    scores = dict(recommender.rank(user.skill_level, user.preferred_region, user.preferred_time,
+                                   limit=limit, exclude=joined))
+    rows = db.session.execute(
+        build_team_rows_stmt().where(Team.id.in_(scores)).group_by(Team.id, User.id)
+    ).all()
+    rows.sort(key=lambda row: -scores[row.Team.id])
+    return jsonify({'teams': [dict(serialize_team_row(row), score=round(scores[row.Team.id], 3)) for row in rows]})
+
+
+@app.route('/teams/cache_stats')
+def teams_cache_stats():
+    return jsonify(teams_cache.stats())
+
+# 依城市與球場名稱取得場館；帶座標且尚未登記時以此座標登記，已登記的場館沿用原座標
+def resolve_venue(city, name, address, coordinates=None):
+    if coordinates:
+        latitude, longitude = coordinates
+        stmt = sqlite_insert(Venue).values(city=city, name=name, address=address, latitude=latitude,
+                                           longitude=longitude, created_at=datetime.utcnow())
+        db.session.execute(stmt.on_conflict_do_nothing(index_elements=[Venue.city, Venue.name]))
+    return db.session.execute(
+        db.select(Venue).where(Venue.city == city, Venue.name == name)
+    ).scalar_one_or_none()
+
 
 @app.route('/create_team', methods=['GET', 'POST'])
 def create_team():
     if 'user_id' not in session:
         return redirect(url_for('profile_setup'))
     
-    user = User.query.get(session['user_id'])
+    user = get_current_user()
     if user.ban_until and user.ban_until > datetime.utcnow():
         return jsonify({'error': '您目前被禁止建立隊伍，請等待禁令解除'}), 403
     
     if request.method == 'POST':
         data = request.get_json()
+        # 座標可省略；同一球場已登記過時以登記的座標為準
+        coordinates = None
+        if data.get('latitude') is not None and data.get('longitude') is not None:
+            try:
+                coordinates = team_geo.validate_coordinates(data['latitude'], data['longitude'])
+            except (ValueError, TypeError):
+                return jsonify({'error': '座標格式錯誤'}), 400
+        venue = resolve_venue(data['location_city'], data['location_venue'], data['location_address'], coordinates)
+        latitude, longitude = (venue.latitude, venue.longitude) if venue else (None, None)
         
         team = Team(
             name=data['name'],
@@ -213,27 +948,127 @@ def create_team():
             end_time=datetime.fromisoformat(data['end_time']),
             max_participants=min(int(data['max_participants']), 4),
             activity_type=data['activity_type'],
-            description=data.get('description', '')
+            description=data.get('description', ''),
+            venue_id=venue.id if venue else None,
+            latitude=latitude,
+            longitude=longitude
         )
         
         db.session.add(team)
         db.session.commit()
         
         # Automatically add organizer as first member
-        member = TeamMember(team_id=team.id, user_id=session['user_id'])
+        member = TeamMember(team_id=team.id, user_id=session['user_id'],
+                            team_start=team.start_time, team_end=team.end_time)
         db.session.add(member)
+        record_player_stats(member.user_id, team.start_time, joined_count=1)
+        record_team_event(team.id, 'create')
+        bump_cache_version('teams')
         db.session.commit()
         
-        return jsonify({'success': True, 'team_id': team.id})
+        # 主辦者自己的行程重疊只提醒，不阻擋建立
+        conflicts = find_schedule_conflicts(user.id, team.start_time, team.end_time, exclude_team_id=team.id)
+        return jsonify({'success': True, 'team_id': team.id, 'conflicts': conflicts})
     
     return render_template('create_team.html')
 
+MAX_AVAILABILITY_TEAMS = 100
+
+
+# 兩段時間重疊：A 開始 < B 結束 且 A 結束 > B 開始（相接不算重疊）。
+# (user_id, team_start, team_end, ...) 索引上以 team_start 做範圍搜尋，team_end 在索引內過濾
+def schedule_overlap_clause(start, end):
+    return and_(TeamMember.team_start < end, TeamMember.team_end > start)
+
+
+def build_schedule_conflicts_stmt(user_id, start, end, exclude_team_id=None):
+    stmt = (
+        db.select(TeamMember.team_id, TeamMember.team_start, TeamMember.team_end, TeamMember.is_waitlist, Team.name)
+        .join(Team, Team.id == TeamMember.team_id)
+        .where(TeamMember.user_id == user_id, schedule_overlap_clause(start, end))
+        .order_by(TeamMember.team_start)
+    )
+    if exclude_team_id is not None:
+        stmt = stmt.where(TeamMember.team_id != exclude_team_id)
+    return stmt
+
+
+def serialize_conflict(row):
+    return {
+        'team_id': row.team_id,
+        'name': row.name,
+        'start_time': row.team_start.strftime('%Y-%m-%d %H:%M'),
+        'end_time': row.team_end.strftime('%Y-%m-%d %H:%M'),
+        'is_waitlist': row.is_waitlist,
+    }
+
+
+def find_schedule_conflicts(user_id, start, end, exclude_team_id=None):
+    rows = db.session.execute(build_schedule_conflicts_stmt(user_id, start, end, exclude_team_id)).all()
+    return [serialize_conflict(row) for row in rows]
+
+
+# 名額判斷、行程衝突檢查與寫入在同一個 INSERT ... SELECT 完成；
+# block_conflicts 時與正式報名的隊伍重疊就不寫入（RETURNING 沒有資料列）
+def build_join_stmt(team_id, user_id, joined_at, block_conflicts=False):
+    confirmed = (
+        db.select(func.count())
+        .select_from(TeamMember)
+        .where(TeamMember.team_id == team_id, TeamMember.is_waitlist == False)
+        .scalar_subquery()
+    )
+    select = (
+        db.select(literal(team_id), literal(user_id), confirmed >= Team.max_participants, literal(joined_at),
+                  Team.start_time, Team.end_time)
+        .where(Team.id == team_id)
+    )
+    if block_conflicts:
+        # 同一隊伍的重複報名交給唯一索引（IntegrityError）處理，不算行程衝突
+        overlapping = db.select(TeamMember.id).where(
+            TeamMember.user_id == user_id,
+            TeamMember.team_id != team_id,
+            TeamMember.is_waitlist == False,
+            schedule_overlap_clause(Team.start_time, Team.end_time),
+        )
+        select = select.where(~overlapping.exists())
+    return (
+        db.insert(TeamMember.__table__)
+        .from_select(['team_id', 'user_id', 'is_waitlist', 'joined_at', 'team_start', 'team_end'], select)
+        .returning(TeamMember.__table__.c.is_waitlist)
+    )
+
+
+WRITE_RETRY_ATTEMPTS = 4
+WRITE_RETRY_BACKOFF_SECONDS = 0.05
+
+
+def is_database_locked(error):
+    return 'locked' in str(error.orig)
+
+
+# 報名與退出的寫入遇到其他 worker 持有寫鎖時（讀取後升級為寫入的 transaction 不會等待 busy_timeout），
+# 整個 transaction 退回後稍候重試；多次仍失敗時回 503 請前端稍後再試。write 需自行重新讀取要修改的資料
+def retry_locked_write(write, *args):
+    for attempt in range(WRITE_RETRY_ATTEMPTS):
+        try:
+            return write(*args)
+        except OperationalError as e:
+            db.session.rollback()
+            if not is_database_locked(e):
+                raise
+            if attempt + 1 < WRITE_RETRY_ATTEMPTS:
+                time.sleep(WRITE_RETRY_BACKOFF_SECONDS * 2 ** attempt * (1 + random.random()))
+    app.logger.warning('%s 重試 %d 次仍遇到資料庫鎖定：user=%s', request.path, WRITE_RETRY_ATTEMPTS,
+                       session.get('user_id'))
+    return jsonify({'error': '目前使用人數過多，請稍後再試'}), 503, {'Retry-After': '1'}
+
+
 @app.route('/join_team/<int:team_id>', methods=['POST'])
 def join_team(team_id):
     if 'user_id' not in session:
         return jsonify({'error': '請先設定個人檔案'}), 401
     
-    user = User.query.get(session['user_id'])
+    user = get_current_user()
     if user.ban_until and user.ban_until > datetime.utcnow():
         return jsonify({'error': '您目前被禁止參加活動，請等待禁令解除'}), 403
     
@@ -249,34 +1084,248 @@ def join_team(team_id):
     if existing_member:
         return jsonify({'error': '您已經是此隊伍的成員'}), 400
     
-    current_members = TeamMember.query.filter_by(team_id=team_id, is_waitlist=False).count()
-    
-    is_waitlist = current_members >= team.max_participants
+    return retry_locked_write(write_join, team, user, now)
+
+
+def write_join(team, user, now):
+    team_id = team.id
+    # 名額判斷、行程衝突檢查與寫入在同一個 INSERT ... SELECT 完成：SQLite 執行寫入陳述式時已持有寫鎖，
+    # 同時報名的請求會依序執行，不會超收也不會同時加入兩個重疊的隊伍；重複報名由 (team_id, user_id) 唯一索引擋下
+    mode = app.config['SCHEDULE_CONFLICT_MODE']
+    try:
+        is_waitlist = db.session.execute(
+            build_join_stmt(team_id, user.id, now, block_conflicts=mode == 'block')
+        ).scalar_one_or_none()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'error': '您已經是此隊伍的成員'}), 400
     
-    member = TeamMember(
-        team_id=team_id,
-        user_id=session['user_id'],
-        is_waitlist=is_waitlist
-    )
+    conflicts = []
+    if mode != 'off':
+        conflicts = find_schedule_conflicts(user.id, team.start_time, team.end_time, exclude_team_id=team_id)
+    if is_waitlist is None:
+        # 只有 block 模式會因行程衝突而沒有寫入
+        db.session.rollback()
+        confirmed = [conflict for conflict in conflicts if not conflict['is_waitlist']]
+        error = f'與已報名的「{confirmed[0]["name"]}」時間重疊' if confirmed else '與已報名的隊伍時間重疊'
+        return jsonify({'error': error, 'conflicts': confirmed}), 409
     
-    db.session.add(member)
+    if not is_waitlist:
+        record_player_stats(user.id, team.start_time, joined_count=1)
+    record_team_event(team_id, 'join', user_id=user.id, nickname=user.nickname, is_waitlist=is_waitlist)
+    # 通知其他正式成員（含主辦者）
+    enqueue_notifications('join', team_id, build_team_recipients_stmt(team_id, exclude_user_id=user.id),
+                          nickname=user.nickname, is_waitlist=is_waitlist)
+    bump_cache_version('teams')
     db.session.commit()
     
     status = '候補' if is_waitlist else '成功加入'
-    return jsonify({'success': True, 'status': status})
+    # 加入成功時列出仍然重疊的隊伍（warn 模式，或 block 模式下只在候補名單的隊伍）供前端提醒
+    return jsonify({'success': True, 'status': status, 'conflicts': conflicts})
 
-# 自動清理過期隊伍（活動結束後自動刪除隊伍與成員、留言等）
-def clean_expired_teams():
-    now = datetime.utcnow()
-    expired_teams = Team.query.filter(Team.end_time < now).all()
-    for team in expired_teams:
-        # 刪除隊伍成員
-        TeamMember.query.filter_by(team_id=team.id).delete()
-        # 刪除隊伍留言
-        TeamMessage.query.filter_by(team_id=team.id).delete()
-        # 刪除隊伍本身
-        db.session.delete(team)
+
+# 一次回答多個隊伍與目前使用者行程的重疊情形（首頁列表用來標示衝突的隊伍）：
+# 以一次索引範圍查詢取出這些隊伍時間範圍內的所有報名，依開始時間排序後在記憶體中比對
+@app.route('/teams/availability')
+def teams_availability():
+    if 'user_id' not in session:
+        return jsonify({'error': '請先登入'}), 401
+    try:
+        team_ids = {int(value) for value in request.args.get('team_ids', '').split(',') if value.strip()}
+    except ValueError:
+        return jsonify({'error': 'team_ids 格式錯誤'}), 400
+    if len(team_ids) > MAX_AVAILABILITY_TEAMS:
+        return jsonify({'error': f'一次最多查詢 {MAX_AVAILABILITY_TEAMS} 個隊伍'}), 400
+    if not team_ids:
+        return jsonify({'conflicts': {}, 'joined': []})
+    
+    candidates = db.session.execute(
+        db.select(Team.id, Team.start_time, Team.end_time).where(Team.id.in_(team_ids))
+    ).all()
+    if not candidates:
+        return jsonify({'conflicts': {}, 'joined': []})
+    window_start = min(candidate.start_time for candidate in candidates)
+    window_end = max(candidate.end_time for candidate in candidates)
+    memberships = db.session.execute(build_schedule_conflicts_stmt(session['user_id'], window_start, window_end)).all()
+    
+    starts = [membership.team_start for membership in memberships]
+    conflicts = {}
+    for candidate in candidates:
+        # 只有開始時間早於候選隊伍結束時間的報名可能重疊
+        overlapping = [
+            serialize_conflict(membership)
+            for membership in memberships[:bisect.bisect_left(starts, candidate.end_time)]
+            if membership.team_end > candidate.start_time and membership.team_id != candidate.id
+        ]
+        if overlapping:
+            conflicts[str(candidate.id)] = overlapping
+    joined = sorted(membership.team_id for membership in memberships if membership.team_id in team_ids)
+    return jsonify({'conflicts': conflicts, 'joined': joined})
+
+# 自動清理過期隊伍（活動結束後刪除隊伍與成員、留言、事件、取消紀錄）
+# 以集合式 DELETE 分批處理，每批獨立 commit，避免長時間佔住寫入鎖
+def build_archive_stmt(team_ids):
+    def count(model, *criteria):
+        return db.select(func.count(model.id)).where(model.team_id == Team.id, *criteria).scalar_subquery()
+
+    members = (
+        db.select(func.json_group_array(func.json_array(TeamMember.user_id, TeamMember.is_waitlist)))
+        .where(TeamMember.team_id == Team.id)
+        .scalar_subquery()
+    )
+    cancellations = (
+        db.select(func.json_group_array(func.json_array(
+            Cancellation.user_id, Cancellation.hours_before_event, Cancellation.cancelled_at)))
+        .where(Cancellation.team_id == Team.id)
+        .scalar_subquery()
+    )
+    columns = ['team_id', 'name', 'organizer_id', 'location_city', 'location_venue', 'activity_type',
+               'start_time', 'end_time', 'max_participants', 'member_count', 'waitlist_count',
+               'message_count', 'members', 'cancellations', 'archived_at']
+    select = db.select(
+        Team.id, Team.name, Team.organizer_id, Team.location_city, Team.location_venue, Team.activity_type,
+        Team.start_time, Team.end_time, Team.max_participants,
+        count(TeamMember, TeamMember.is_waitlist == False),
+        count(TeamMember, TeamMember.is_waitlist == True),
+        count(TeamMessage),
+        members, cancellations, literal(datetime.utcnow()),
+    ).where(Team.id.in_(team_ids))
+    return db.insert(TeamArchive).from_select(columns, select)
+
+
+def build_played_deltas(team_ids):
+    return (
+        db.select(TeamMember.user_id, func.date(Team.start_time).label('day'), literal(1).label('played_count'))
+        .join(Team, Team.id == TeamMember.team_id)
+        .where(TeamMember.team_id.in_(team_ids), TeamMember.is_waitlist == False)
+    )
+
+
+# 從紀錄重建信譽統計的來源：仍在名單上的正式成員、取消紀錄，以及封存隊伍的成員與取消紀錄
+def build_stats_history_deltas():
+    def deltas(user_id, start_time, joined=1, played=0, hours_before=None):
+        if hours_before is None:
+            cancellation = (literal(0), literal(0), literal(0.0))
+        else:
+            cancellation = (literal(1), case((hours_before < player_stats.LATE_CANCEL_HOURS, 1), else_=0),
+                            func.max(hours_before, 0.0))
+        cancelled, late, notice_hours = cancellation
+        return (user_id.label('user_id'), func.date(start_time).label('day'), literal(joined).label('joined_count'),
+                literal(played).label('played_count'), cancelled.label('cancellation_count'),
+                late.label('late_cancellation_count'), notice_hours.label('notice_hours_total'))
+
+    # 封存的 members 為 [[user_id, is_waitlist], ...]，cancellations 為 [[user_id, hours_before_event, cancelled_at], ...]
+    archived_member = func.json_each(TeamArchive.members).table_valued('value').alias('archived_member')
+    archived_cancellation = (func.json_each(TeamArchive.cancellations).table_valued('value')
+                             .alias('archived_cancellation'))
+    return db.union_all(
+        db.select(*deltas(TeamMember.user_id, TeamMember.team_start)).where(TeamMember.is_waitlist == False),
+        db.select(*deltas(Cancellation.user_id, Team.start_time, hours_before=Cancellation.hours_before_event))
+        .join(Team, Team.id == Cancellation.team_id),
+        db.select(*deltas(func.json_extract(archived_member.c.value, '$[0]'), TeamArchive.start_time, played=1))
+        .join(archived_member, true())
+        .where(func.json_extract(archived_member.c.value, '$[1]') == 0),
+        db.select(*deltas(func.json_extract(archived_cancellation.c.value, '$[0]'), TeamArchive.start_time,
+                          hours_before=func.json_extract(archived_cancellation.c.value, '$[1]')))
+        .join(archived_cancellation, true()),
+    )
+
+
+def rebuild_player_stats(now=None):
+    """清空後從紀錄重新計算所有球員的信譽統計（單一 transaction），回傳 (累計列數, 分日列數)。"""
+    now = now or datetime.utcnow()
+    first_day, _ = player_stats.window_range(now.date())
+    db.session.execute(db.delete(UserStatsDay))
+    db.session.execute(db.delete(UserStats))
+    for stmt in build_stats_upserts(build_stats_history_deltas().subquery(), now):
+        db.session.execute(stmt)
+    db.session.execute(db.delete(UserStatsDay).where(UserStatsDay.day < first_day))
+    bump_cache_version('player_stats')
     db.session.commit()
+    return (db.session.execute(db.select(func.count()).select_from(UserStats)).scalar(),
+            db.session.execute(db.select(func.count()).select_from(UserStatsDay)).scalar())
+
+
+def build_reap_stmts(team_ids):
+    stmts = [db.delete(model).where(model.team_id.in_(team_ids))
+             for model in (TeamMember, TeamMessage, TeamEvent, Cancellation)]
+    # 全文檢索索引由 team_fts_delete 觸發器一併刪除
+    stmts.append(db.delete(Team).where(Team.id.in_(team_ids)))
+    return stmts
+
+
+def clean_expired_teams(batch_size=None, archive=None, now=None):
+    batch_size = batch_size or app.config['REAPER_BATCH_SIZE']
+    archive = app.config['REAPER_ARCHIVE'] if archive is None else archive
+    now = now or datetime.utcnow()
+    started = time.perf_counter()
+    totals = Counter()
+    while True:
+        team_ids = db.session.execute(
+            db.select(Team.id).where(Team.end_time < now).limit(batch_size)
+        ).scalars().all()
+        if not team_ids:
+            break
+        if archive:
+            totals['team_archive'] += db.session.execute(build_archive_stmt(team_ids)).rowcount
+        # 刪除成員前先把正式成員的場次結算為已完成
+        for stmt in build_stats_upserts(build_played_deltas(team_ids).subquery(), now):
+            db.session.execute(stmt)
+        for stmt in build_reap_stmts(team_ids):
+            result = db.session.execute(stmt, execution_options={'synchronize_session': False})
+            totals[stmt.table.name] += result.rowcount
+        bump_cache_version('teams')
+        bump_cache_version('player_stats')
+        db.session.commit()
+    # 超出近期統計範圍的分日統計已不會再讀取（累計值另存在 user_stats）
+    first_day, _ = player_stats.window_range(now.date())
+    totals['user_stats_day'] += db.session.execute(db.delete(UserStatsDay).where(UserStatsDay.day < first_day)).rowcount
+    db.session.commit()
+    elapsed = time.perf_counter() - started
+    deleted = sum(count for name, count in totals.items() if name != 'team_archive')
+    return {
+        'teams': totals['team'],
+        'deleted_rows': deleted,
+        'archived_teams': totals['team_archive'],
+        'tables': dict(totals),
+        'elapsed_seconds': round(elapsed, 3),
+        'rows_per_second': round(deleted / elapsed, 1) if elapsed else 0,
+    }
+
+
+# 背景排程：每個 worker 一條執行緒，於第一個請求時啟動（flask 指令不會啟動）
+reaper_started = False
+reaper_lock = threading.Lock()
+
+
+def run_reaper(interval):
+    # 多個 worker 同時啟動時錯開第一次執行
+    delay = random.uniform(0, interval)
+    while True:
+        time.sleep(delay)
+        delay = interval
+        with app.app_context():
+            try:
+                stats = clean_expired_teams()
+            except Exception:
+                db.session.rollback()
+                app.logger.exception('清理過期隊伍失敗')
+                continue
+            if stats['teams']:
+                app.logger.info('已清理 %d 個過期隊伍、%d 筆資料（%.1f 筆/秒）',
+                                stats['teams'], stats['deleted_rows'], stats['rows_per_second'])
+
+
+@app.before_request
+def start_reaper():
+    global reaper_started
+    if reaper_started or not app.config['REAPER_INTERVAL']:
+        return
+    with reaper_lock:
+        if not reaper_started:
+            reaper_started = True
+            threading.Thread(target=run_reaper, args=(app.config['REAPER_INTERVAL'],),
+                             name='expired-team-reaper', daemon=True).start()
 
 
 @app.route('/leave_team/<int:team_id>', methods=['POST'])
@@ -285,48 +1334,172 @@ def leave_team(team_id):
         return jsonify({'error': '請先登入'}), 401
     
     team = Team.query.get_or_404(team_id)
-    member = TeamMember.query.filter_by(team_id=team_id, user_id=session['user_id']).first()
+    return retry_locked_write(write_leave, team, session['user_id'])
+
+
+def write_leave(team, user_id):
+    team_id = team.id
+    member = TeamMember.query.filter_by(team_id=team_id, user_id=user_id).first()
     
     if not member:
         return jsonify({'error': '您不是此隊伍的成員'}), 400
     
-    # Check if cancellation is within 24 hours
     hours_before = (team.start_time - datetime.utcnow()).total_seconds() / 3600
     
-    if hours_before < 24 and not member.is_waitlist:
-        # Apply penalty
-        user = User.query.get(session['user_id'])
-        user.cancellation_count += 1
-        user.ban_until = datetime.utcnow() + timedelta(days=7)
-        
-        cancellation = Cancellation(
-            user_id=session['user_id'],
-            team_id=team_id,
-            hours_before_event=hours_before
-        )
-        db.session.add(cancellation)
+    # 退出正式名額一律留下取消紀錄（信譽統計的來源），活動前 24 小時內取消禁止參加活動 7 天
+    if not member.is_waitlist:
+        db.session.add(Cancellation(user_id=member.user_id, team_id=team_id, hours_before_event=hours_before))
+        record_player_stats(member.user_id, team.start_time, **player_stats.cancellation_deltas(hours_before))
+        if hours_before < player_stats.LATE_CANCEL_HOURS:
+            get_current_user().ban_until = datetime.utcnow() + timedelta(days=7)
+            # 名單上的出席率只在臨時取消與活動結算時改變
+            bump_cache_version('player_stats')
     
     db.session.delete(member)
+    record_team_event(team_id, 'leave', user_id=member.user_id, was_waitlist=member.is_waitlist)
     
     # Promote waitlist member if needed
     if not member.is_waitlist:
         waitlist_member = TeamMember.query.filter_by(team_id=team_id, is_waitlist=True).order_by(TeamMember.joined_at).first()
         if waitlist_member:
             waitlist_member.is_waitlist = False
+            record_player_stats(waitlist_member.user_id, team.start_time, joined_count=1)
+            record_team_event(team_id, 'promote', user_id=waitlist_member.user_id)
+            enqueue_notifications('promote', team_id, [waitlist_member.user_id])
     
+    bump_cache_version('teams')
     db.session.commit()
     
     return jsonify({'success': True})
 
+MESSAGE_PAGE_SIZE = 50
+MAX_MESSAGE_PAGE_SIZE = 200
+
+
+# 留言分頁：以 id 為 cursor。after_id 取較新的留言，before_id 取較舊的留言，
+# 兩者皆未指定時取最新一頁；結果一律由新到舊排列。
+def build_message_page_stmt(team_id, is_public=True, before_id=None, after_id=None, limit=MESSAGE_PAGE_SIZE):
+    stmt = (
+        db.select(TeamMessage)
+        .options(joinedload(TeamMessage.user))
+        .where(TeamMessage.team_id == team_id, TeamMessage.is_public == is_public)
+    )
+    if before_id:
+        stmt = stmt.where(TeamMessage.id < before_id)
+    if after_id:
+        # 從 after_id 之後往新的方向取，避免一次補回過多留言時漏掉中間的部分
+        stmt = stmt.where(TeamMessage.id > after_id).order_by(TeamMessage.id)
+    else:
+        stmt = stmt.order_by(TeamMessage.id.desc())
+    return stmt.limit(limit)
+
+
+def query_message_page(team_id, is_public=True, before_id=None, after_id=None, limit=MESSAGE_PAGE_SIZE):
+    stmt = build_message_page_stmt(team_id, is_public, before_id, after_id, limit)
+    messages = db.session.execute(stmt).scalars().all()
+    if after_id:
+        messages.reverse()
+    return messages
+
+
+# 正式成員與候補連同信譽統計一次查出（依索引 team_id, is_waitlist, joined_at 排序）
+def build_roster_stmt(team_id):
+    return (
+        db.select(TeamMember)
+        .options(joinedload(TeamMember.user).joinedload(User.stats))
+        .where(TeamMember.team_id == team_id)
+        .order_by(TeamMember.is_waitlist, TeamMember.joined_at)
+    )
+
+
+def build_team_event_stamp_stmt(team_id):
+    return db.select(func.max(TeamEvent.id), func.max(TeamEvent.created_at)).where(TeamEvent.team_id == team_id)
+
+
+fragment_cache = VersionedLRUCache(maxsize=app.config['FRAGMENT_CACHE_SIZE'], ttl=app.config['FRAGMENT_CACHE_TTL'])
+
+
+# 名單上的出席率（player_stats 版本號）只影響名單區塊，不影響留言區塊與推薦
+def roster_versions():
+    return get_cache_version('profiles'), get_cache_version('player_stats'), TEMPLATE_VERSION
+
+
+def render_roster_fragment(team, latest_event_id, version):
+    key = ('roster', team.id, latest_event_id)
+    fragment = fragment_cache.get(key, version)
+    if fragment is None:
+        members = db.session.execute(build_roster_stmt(team.id)).scalars().all()
+        confirmed = [m for m in members if not m.is_waitlist]
+        waitlist = [m for m in members if m.is_waitlist]
+        fragment = {
+            'roster': Markup(render_template('_team_roster.html', team=team, members=confirmed, waitlist=waitlist,
+                                             summarize=player_stats.summarize)),
+            'member_count': len(confirmed),
+            'waitlist_count': len(waitlist),
+        }
+        fragment_cache.set(key, version, fragment)
+    return fragment
+
+
+def render_messages_fragment(team, latest_event_id, version):
+    key = ('messages', team.id, latest_event_id)
+    fragment = fragment_cache.get(key, version)
+    if fragment is None:
+        # 只渲染最新一頁，較早的留言由頁面以 before_id 載入
+        messages = query_message_page(team.id)
+        fragment = {
+            'messages': Markup(render_template('_team_messages.html', messages=messages, timedelta=timedelta,
+                                               has_more_messages=len(messages) == MESSAGE_PAGE_SIZE)),
+            'latest_message_id': messages[0].id if messages else 0,
+            'oldest_message_id': messages[-1].id if messages else 0,
+        }
+        fragment_cache.set(key, version, fragment)
+    return fragment
+
+
+# 隊伍頁的名單與留言區塊與觀看者無關，依最新 team_event 分別快取渲染結果；
+# 修改個人檔案（profiles 版本號）或模板更新時整批失效，出席率變動（player_stats 版本號）只讓名單失效
+def render_team_fragments(team, latest_event_id, versions):
+    profiles, _, template = versions
+    return {**render_roster_fragment(team, latest_event_id, versions),
+            **render_messages_fragment(team, latest_event_id, (profiles, template))}
+
+
 @app.route('/team/<int:team_id>')
 def team_detail(team_id):
+    team = Team.query.options(joinedload(Team.organizer)).get_or_404(team_id)
+    # 名單與公開留言的每次變動都會寫入 team_event，最新事件即為頁面的修改戳記
+    latest_event_id, latest_event_at = db.session.execute(build_team_event_stamp_stmt(team_id)).one()
+    versions = roster_versions()
+    etag = make_etag('team', team_id, latest_event_id, *versions, *viewer_etag_parts())
+    last_modified = max(filter(None, (team.created_at, latest_event_at)), default=None)
+
+    def render():
+        return render_template('team_detail.html', team=team, fragments=render_team_fragments(team, latest_event_id, versions),
+                               message_page_size=MESSAGE_PAGE_SIZE)
+
+    return conditional_response(etag, render, last_modified=last_modified, private=True)
+
+
+# 名單異動（SSE 的 join / leave / promote）時隊伍頁只重新取得名單區塊，不重新載入整頁；
+# 與觀看者無關，同一個最新事件的所有觀看者共用同一份快取
+@app.route('/team/<int:team_id>/roster')
+def team_roster(team_id):
     team = Team.query.get_or_404(team_id)
-    members = TeamMember.query.filter_by(team_id=team_id, is_waitlist=False).all()
-    waitlist = TeamMember.query.filter_by(team_id=team_id, is_waitlist=True).all()
-    messages = TeamMessage.query.filter_by(team_id=team_id, is_public=True).order_by(TeamMessage.created_at.desc()).all()
-    
-    from datetime import timedelta
-    return render_template('team_detail.html', team=team, members=members, waitlist=waitlist, messages=messages, timedelta=timedelta)
+    latest_event_id, latest_event_at = db.session.execute(build_team_event_stamp_stmt(team_id)).one()
+    versions = roster_versions()
+    etag = make_etag('roster', team_id, latest_event_id, *versions)
+    last_modified = max(filter(None, (team.created_at, latest_event_at)), default=None)
+
+    def render():
+        fragments = render_roster_fragment(team, latest_event_id, versions)
+        return jsonify({
+            'html': str(fragments['roster']),
+            'member_count': fragments['member_count'],
+            'waitlist_count': fragments['waitlist_count'],
+        })
+
+    return conditional_response(etag, render, last_modified=last_modified)
 
 @app.route('/team/<int:team_id>/messages', methods=['GET', 'POST'])
 def team_messages(team_id):
@@ -343,30 +1516,188 @@ def team_messages(team_id):
         )
         
         db.session.add(message)
+        db.session.flush()
+        if message.is_public:
+            record_team_event(team_id, 'message', id=message.id, user_nickname=message.user.nickname,
+                              message=message.message, created_at=message.created_at.strftime('%Y-%m-%d %H:%M'))
+            enqueue_notifications('message', team_id,
+                                  build_team_recipients_stmt(team_id, exclude_user_id=message.user_id, waitlist=True),
+                                  nickname=message.user.nickname, message=message.message[:NOTIFY_MESSAGE_PREVIEW])
         db.session.commit()
         
-        return jsonify({'success': True})
+        return jsonify({'success': True, 'id': message.id})
     
     # GET request
     is_public = request.args.get('public', 'true').lower() == 'true'
-    messages = TeamMessage.query.filter_by(team_id=team_id, is_public=is_public).order_by(TeamMessage.created_at.desc()).all()
+    before_id = request.args.get('before_id', type=int)
+    after_id = request.args.get('after_id', type=int)
+    limit = request.args.get('limit', MESSAGE_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, MAX_MESSAGE_PAGE_SIZE))
     
-    message_data = []
-    for msg in messages:
-        message_data.append({
+    # 留言只會新增，最新 id 沒變代表同樣參數的結果也沒變，可直接回 304
+    latest_id = db.session.execute(
+        db.select(func.max(TeamMessage.id))
+        .where(TeamMessage.team_id == team_id, TeamMessage.is_public == is_public)
+    ).scalar() or 0
+    etag = (f'msg-{team_id}-{int(is_public)}-{latest_id}-{before_id or 0}-{after_id or 0}-{limit}'
+            f'-{get_cache_version("profiles")}')
+
+    def render():
+        messages = query_message_page(team_id, is_public, before_id=before_id, after_id=after_id, limit=limit)
+        return jsonify([{
             'id': msg.id,
             'user_nickname': msg.user.nickname,
             'message': msg.message,
             'created_at': msg.created_at.strftime('%Y-%m-%d %H:%M')
-        })
+        } for msg in messages])
+
+    return conditional_response(etag, render, private=not is_public)
+
+# ====== 隊伍封面圖 ======
+
+# 檔名即內容雜湊，同一網址的內容永遠不變，可讓瀏覽器與 CDN 快取一年
+COVER_MAX_AGE = 365 * 24 * 3600
+
+
+@app.route('/team/<int:team_id>/cover', methods=['POST'])
+def upload_team_cover(team_id):
+    """請求本文直接是圖片內容（不是 multipart 表單），邊讀邊寫入磁碟，不會整個檔案載入記憶體。"""
+    if 'user_id' not in session:
+        return jsonify({'error': '請先登入'}), 401
+    team = Team.query.get_or_404(team_id)
+    if team.organizer_id != session['user_id']:
+        return jsonify({'error': '只有主辦者可以更換封面'}), 403
+    max_bytes = app.config['COVER_MAX_BYTES']
+    too_large = jsonify({'error': f'圖片大小不能超過 {max_bytes // (1024 * 1024)}MB'}), 413
+    # 有 Content-Length 時先擋下過大的上傳；分段傳輸則在讀取時計算
+    if request.content_length and request.content_length > max_bytes:
+        return too_large
+    # 讀取上傳內容可能需要一段時間，先結束查詢主辦者時開啟的讀取 transaction
+    db.session.rollback()
+    try:
+        digest, extension, size, created = cover_images.store(request.stream, app.config['UPLOAD_FOLDER'], max_bytes)
+    except cover_images.ImageTooLarge:
+        return too_large
+    except cover_images.InvalidImage:
+        return jsonify({'error': '請上傳 JPG、PNG、GIF 或 WebP 格式的圖片'}), 400
+
+    team = db.session.get(Team, team_id)
+    if team is None:
+        return jsonify({'error': '隊伍不存在'}), 404
+    team.cover_image = cover_images.file_name(digest, extension)
+    record_team_event(team_id, 'cover', cover_image=cover_url(team.cover_image, 'large'))
+    bump_cache_version('teams')
+    db.session.commit()
+    return jsonify({
+        'success': True,
+        'cover_image': cover_url(team.cover_image),
+        'variants': {variant: cover_url(team.cover_image, variant) for variant in cover_images.VARIANTS},
+        'size': size,
+        'deduplicated': not created,
+    })
+
+
+@app.route('/covers/<name>')
+def cover_file(name):
+    resolved = cover_images.resolve(app.config['UPLOAD_FOLDER'], name)
+    if resolved is None or not os.path.isfile(resolved[0]):
+        return jsonify({'error': '找不到圖片'}), 404
+    path, mimetype = resolved
+    # send_file 處理 If-None-Match / If-Modified-Since（304）與 Range（206）
+    response = send_file(path, mimetype=mimetype, conditional=True, etag=name.split('.', 1)[0],
+                         max_age=COVER_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+# ====== 隊伍即時事件（Server-Sent Events） ======
+
+SSE_HEARTBEAT_SECONDS = 15
+SSE_BUSY_RETRY_SECONDS = 30
+EVENT_FETCH_LIMIT = 500
+
+
+def fetch_team_events(after_id):
+    with app.app_context():
+        events = db.session.execute(
+            db.select(TeamEvent).where(TeamEvent.id > after_id).order_by(TeamEvent.id).limit(EVENT_FETCH_LIMIT)
+        ).scalars().all()
+        db.session.expunge_all()
+        return events
+
+
+team_event_hub = EventHub(fetch_team_events, max_subscribers=app.config['SSE_MAX_STREAMS'])
+
+
+def format_sse(event):
+    return f'id: {event.id}\nevent: {event.kind}\ndata: {event.payload}\n\n'
+
+
+@app.route('/team/<int:team_id>/events')
+def team_events(team_id):
+    Team.query.get_or_404(team_id)
+    # 斷線重連時瀏覽器會帶 Last-Event-ID，從該事件之後補送；新連線則從目前最新事件開始
+    since_id = request.headers.get('Last-Event-ID', type=int)
+    if since_id is None:
+        since_id = db.session.execute(db.select(func.max(TeamEvent.id))).scalar() or 0
+    subscription = team_event_hub.subscribe(team_id, since_id)
+    if subscription is None:
+        # 串流已佔滿保留給 SSE 的執行緒；EventSource 收到非 200 不會自動重連，由頁面改用輪詢
+        return jsonify({'error': '即時更新連線已滿，請稍後再試'}), 503, {'Retry-After': str(SSE_BUSY_RETRY_SECONDS)}
     
-    return jsonify(message_data)
+    def stream():
+        try:
+            yield 'retry: 3000\n\n'
+            while not subscription.overflowed:
+                try:
+                    event = subscription.get(timeout=SSE_HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield ': heartbeat\n\n'
+                    continue
+                yield format_sse(event)
+        finally:
+            team_event_hub.unsubscribe(subscription)
+    
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+# 個人頁與我的隊伍：報名紀錄連同隊伍一次查出
+def build_memberships_stmt(user_id):
+    return (
+        db.select(TeamMember)
+        .join(TeamMember.team)
+        .options(contains_eager(TeamMember.team))
+        .where(TeamMember.user_id == user_id)
+        .order_by(Team.start_time.desc())
+    )
+
 
 @app.route('/user/<int:user_id>')
 def user_profile(user_id):
     user = User.query.get_or_404(user_id)
-    memberships = TeamMember.query.filter_by(user_id=user.id).join(Team).order_by(Team.start_time.desc()).all()
-    return render_template('user_profile.html', user=user, memberships=memberships)
+    # 報名、退出、候補遞補、過期清理都會改變這組統計值
+    membership_count, latest_joined_at, waitlist_count = db.session.execute(
+        db.select(func.count(TeamMember.id), func.max(TeamMember.joined_at),
+                  func.sum(case((TeamMember.is_waitlist == True, 1), else_=0)))
+        .where(TeamMember.user_id == user_id)
+    ).one()
+    # 信譽統計直接讀取維護好的統計列；近期統計隨日期移動，驗證值也包含今天的日期
+    stats = db.session.get(UserStats, user_id)
+    now = datetime.utcnow()
+    etag = make_etag('user', user_id, membership_count, latest_joined_at, waitlist_count, user.ban_until,
+                     stats.updated_at if stats else None, now.date(), get_cache_version('profiles'),
+                     TEMPLATE_VERSION, *viewer_etag_parts())
+
+    def render():
+        memberships = db.session.execute(build_memberships_stmt(user.id)).scalars().all()
+        recent = db.session.execute(build_stats_window_stmt([user.id], now.date())).one_or_none()
+        return render_template('user_profile.html', user=user, memberships=memberships, now=now,
+                               stats=player_stats.summarize(stats), recent_stats=player_stats.summarize(recent),
+                               window_days=player_stats.WINDOW_DAYS)
+
+    return conditional_response(etag, render, private=True)
 
 # ====== 註冊、登入、登出功能 ======
 
@@ -374,7 +1705,7 @@ def user_profile(user_id):
 def profile_setup():
     if 'user_id' not in session:
         return redirect(url_for('login'))
-    user = User.query.get(session['user_id'])
+    user = get_current_user()
     if request.method == 'POST':
         data = request.get_json()
         # Optional phone update validation if provided
@@ -394,6 +1725,9 @@ def profile_setup():
         user.contact = data.get('contact', user.contact)
         user.bio = data.get('bio', user.bio)
         user.notification_enabled = bool(data.get('notification_enabled', True))
+        # 列表會顯示主辦者暱稱/性別/級數，隊伍頁與個人頁也會顯示暱稱
+        bump_cache_version('teams')
+        bump_cache_version('profiles')
         db.session.commit()
         return jsonify({'success': True})
     return render_template('profile_setup.html', user=user)
@@ -439,10 +1773,16 @@ def register():
             preferred_region=preferred_region,
             notification_enabled=notification_enabled
         )
-        user.set_password(password)
+        # 雜湊期間不佔用資料庫連線
+        db.session.rollback()
+        try:
+            user.set_password(password)
+        except password_hashing.HasherBusy:
+            flash('目前登入人數過多，請稍後再試', 'warning')
+            return render_template('register.html'), 503
         db.session.add(user)
         db.session.commit()
-        session['user_id'] = user.id
+        login_user(user)
         flash('註冊成功，已自動登入！', 'success')
         return redirect(url_for('index'))
     return render_template('register.html')
@@ -455,17 +1795,34 @@ def login():
         user = User.query.filter_by(username=username).first()
         if not user:
             flash('查無此帳號，請先註冊', 'danger')
-        elif user.check_password(password):
-            session['user_id'] = user.id
-            flash('登入成功！', 'success')
-            return redirect(url_for('index'))
-        else:
+            return render_template('login.html')
+        user_id, old_hash = user.id, user.password_hash
+        # 雜湊期間不佔用資料庫連線
+        db.session.rollback()
+        try:
+            ok, new_hash = password_hasher.verify(old_hash, password)
+        except password_hashing.HasherBusy:
+            flash('目前登入人數過多，請稍後再試', 'warning')
+            return render_template('login.html'), 503
+        if not ok:
             flash('帳號或密碼錯誤', 'danger')
+            return render_template('login.html')
+        if new_hash:
+            # 雜湊設定改過：以新設定重新雜湊；期間密碼被改過則不覆蓋
+            db.session.execute(
+                db.update(User)
+                .where(User.id == user_id, User.password_hash == old_hash)
+                .values(password_hash=new_hash)
+            )
+            db.session.commit()
+        login_user(user)
+        flash('登入成功！', 'success')
+        return redirect(url_for('index'))
     return render_template('login.html')
 
 @app.route('/logout')
 def logout():
-    session.pop('user_id', None)
+    logout_user()
     flash('已登出', 'info')
     return redirect(url_for('login'))
 
@@ -475,17 +1832,545 @@ def my_teams():
     if 'user_id' not in session:
         return redirect(url_for('login'))
     user_id = session['user_id']
-    memberships = TeamMember.query.filter_by(user_id=user_id).join(Team).order_by(Team.start_time.desc()).all()
+    memberships = db.session.execute(build_memberships_stmt(user_id)).scalars().all()
     # memberships: List[TeamMember]，每個有 team, is_waitlist
     return render_template('my_teams.html', memberships=memberships)
 
 
+# ====== 通知寄送 ======
+
+NOTIFY_LEASE_SECONDS = 300  # 認領後多久沒完成就讓其他執行緒重新認領（需大於一批的寄送時間）
+NOTIFY_MAX_BACKOFF_SECONDS = 3600
+
+NOTIFICATION_TEXT = {
+    'join': lambda n, data: f'{data["nickname"]} {"登記候補" if data["is_waitlist"] else "加入了"}「{n.team_name or "隊伍"}」',
+    'promote': lambda n, data: f'你已從候補遞補為「{n.team_name or "隊伍"}」的正式成員',
+    'message': lambda n, data: f'{data["nickname"]} 在「{n.team_name or "隊伍"}」留言：{data["message"]}',
+}
+
+
+# 依到期順序挑出最多 batch_size 位收件者，一次認領他們所有到期的通知（同一收件者合併寄送）
+def build_claim_stmt(batch_size, now, lease_until):
+    recipients = (
+        db.select(Notification.user_id)
+        .where(Notification.available_at <= now)
+        .order_by(Notification.available_at, Notification.id)
+        .limit(batch_size)
+    )
+    return (
+        db.update(Notification)
+        .where(Notification.user_id.in_(recipients), Notification.available_at <= now)
+        .values(available_at=lease_until, attempts=Notification.attempts + 1)
+    )
+
+
+def claim_notifications(batch_size, due_before=None):
+    now = datetime.utcnow()
+    stmt = build_claim_stmt(batch_size, due_before or now, now + timedelta(seconds=NOTIFY_LEASE_SECONDS))
+    rows = db.session.execute(stmt.returning(
+        Notification.id, Notification.user_id, Notification.kind, Notification.team_id,
+        Notification.payload, Notification.attempts
+    )).all()
+    db.session.commit()
+    if not rows:
+        return []
+    users = {row.id: row for row in db.session.execute(
+        db.select(User.id, User.nickname, User.contact).where(User.id.in_({row.user_id for row in rows})))}
+    team_names = dict(db.session.execute(
+        db.select(Team.id, Team.name).where(Team.id.in_({row.team_id for row in rows if row.team_id}))).all())
+    db.session.rollback()
+    return [
+        notification_outbox.ClaimedNotification(
+            row.id, row.user_id, users[row.user_id].nickname, users[row.user_id].contact, row.kind, row.team_id,
+            team_names.get(row.team_id), json.loads(row.payload), row.attempts)
+        for row in sorted(rows, key=lambda row: row.id)
+    ]
+
+
+# 寄出（或收件者無法寄送而略過）的通知刪除；失敗的以指數退避重試，用完次數後保留並標記放棄
+def finish_notifications(delivered_ids, failed):
+    now = datetime.utcnow()
+    if delivered_ids:
+        db.session.execute(db.delete(Notification).where(Notification.id.in_(delivered_ids)))
+    for notification, error in failed:
+        if notification.attempts >= app.config['NOTIFY_MAX_ATTEMPTS']:
+            available_at = None
+        else:
+            available_at = now + timedelta(seconds=min(30 * 2 ** notification.attempts, NOTIFY_MAX_BACKOFF_SECONDS))
+        db.session.execute(
+            db.update(Notification).where(Notification.id == notification.id)
+            .values(available_at=available_at, last_error=error[:500])
+        )
+    db.session.commit()
+
+
+def render_notifications(notifications):
+    lines = [NOTIFICATION_TEXT[n.kind](n, n.payload) for n in notifications]
+    subject = lines[0] if len(lines) == 1 else f'羽球揪團：你有 {len(lines)} 則新通知'
+    return subject, lines
+
+
+def make_notification_sender():
+    if app.config['NOTIFY_SENDER'] == 'smtp':
+        return notification_outbox.SmtpSender(app.config['NOTIFY_SMTP_HOST'], app.config['NOTIFY_SMTP_PORT'],
+                                              app.config['NOTIFY_FROM'])
+    return notification_outbox.LogSender(app.logger)
+
+
+def run_in_app_context(func):
+    with app.app_context():
+        try:
+            return func()
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+notification_pool = notification_outbox.OutboxWorkerPool(
+    claim_notifications, finish_notifications, render_notifications, make_notification_sender(),
+    workers=app.config['NOTIFY_WORKERS'], batch_size=app.config['NOTIFY_BATCH_SIZE'],
+    interval=app.config['NOTIFY_INTERVAL'], run_in_context=run_in_app_context,
+)
+
+
+# 與過期隊伍清理相同，在 worker 收到第一個請求時才啟動（gunicorn fork 之後）
+@app.before_request
+def start_notification_workers():
+    if app.config['NOTIFY_WORKERS'] and not notification_pool.started:
+        notification_pool.start()
+
+
+# 積壓量以資料庫為準，各 worker 回報的值相同
+def notification_metric_families():
+    stats = notification_pool.stats()
+    backlog, oldest = db.session.execute(
+        db.select(func.count(), func.min(Notification.available_at)).where(Notification.available_at.isnot(None))
+    ).one()
+    given_up = db.session.execute(
+        db.select(func.count()).select_from(Notification).where(Notification.available_at.is_(None))
+    ).scalar()
+    oldest_age = max((datetime.utcnow() - oldest).total_seconds(), 0) if oldest else 0
+    return [
+        ('notifications_processed_total', 'counter', '已處理的通知數',
+         [({'result': 'delivered'}, stats.get('delivered', 0)), ({'result': 'failed'}, stats.get('failed', 0))]),
+        ('notification_sends_total', 'counter', '合併後的寄送次數',
+         [({'result': name}, stats.get(key, 0))
+          for name, key in (('sent', 'deliveries'), ('skipped', 'skipped'), ('error', 'send_failures'))]),
+        ('notification_batches_total', 'counter', '認領的批次數', [({}, stats.get('batches', 0))]),
+        ('notification_send_seconds_total', 'counter', '寄送耗時合計', [({}, stats['send_seconds'])]),
+        ('notification_workers', 'gauge', '執行中的寄送執行緒', [({}, stats['workers'])]),
+        ('notification_backlog', 'gauge', '待寄送的通知數', [({}, backlog)]),
+        ('notification_backlog_age_seconds', 'gauge', '最早一則待寄送通知已到期的秒數', [({}, round(oldest_age, 3))]),
+        ('notification_given_up', 'gauge', '重試次數用完而放棄的通知數', [({}, given_up)]),
+    ]
+
+
+# ====== 請求量測 ======
+
+request_metrics = RequestMetrics(n_plus_one_threshold=app.config['N_PLUS_ONE_THRESHOLD'],
+                                 slow_request_seconds=app.config['SLOW_REQUEST_MS'] / 1000)
+
+
+# 背景執行緒（SSE 輪詢、過期隊伍清理）的查詢不屬於任何請求，不列入統計
+def current_request_trace():
+    if has_request_context():
+        return g.get('request_trace')
+    return None
+
+
+if app.config['METRICS_ENABLED']:
+    with app.app_context():
+        instrument_engine(db.engine, current_request_trace)
+
+
+@app.before_request
+def start_request_trace():
+    if app.config['METRICS_ENABLED']:
+        g.request_trace = request_metrics.start()
+
+
+@app.after_request
+def record_request_metrics(response):
+    trace = g.pop('request_trace', None)
+    if trace is None:
+        return response
+    endpoint = request.endpoint or 'unmatched'
+    seconds, repeated, slow = request_metrics.finish(trace, endpoint, request.method, response.status_code)
+    if repeated:
+        app.logger.warning('疑似 N+1 查詢：%s %s 同一查詢執行 %d 次：%s',
+                           request.method, request.path, repeated[1], repeated[0])
+    if slow:
+        statements = '\n'.join(f'  {query_seconds * 1000:.1f} ms  {sql}' for query_seconds, sql in trace.log)
+        app.logger.warning('慢請求：%s %s 耗時 %.0f ms，%d 個查詢共 %.0f ms\n%s', request.method, request.path,
+                           seconds * 1000, trace.queries, trace.db_seconds * 1000, statements)
+    return response
+
+
+def cache_metric_families():
+    caches = {'teams': teams_cache.stats(), 'fragments': fragment_cache.stats()}
+    return [
+        ('cache_hits_total', 'counter', '快取命中次數', [({'cache': name}, s['hits']) for name, s in caches.items()]),
+        ('cache_misses_total', 'counter', '快取未命中次數', [({'cache': name}, s['misses']) for name, s in caches.items()]),
+        ('cache_entries', 'gauge', '快取目前筆數', [({'cache': name}, s['size']) for name, s in caches.items()]),
+    ]
+
+
+def event_stream_metric_families():
+    return [
+        ('sse_streams', 'gauge', '開啟中的 SSE 串流', [({}, team_event_hub.subscriber_count())]),
+        ('sse_streams_max', 'gauge', '每個 worker 的 SSE 串流上限', [({}, app.config['SSE_MAX_STREAMS'])]),
+        ('sse_streams_rejected_total', 'counter', '串流已滿而回 503 的連線數', [({}, team_event_hub.rejected)]),
+    ]
+
+
+def password_hash_metric_families():
+    stats = password_hasher.stats()
+    return [
+        ('password_hashes_total', 'counter', '送出的密碼雜湊數', [({}, stats.get('submitted', 0))]),
+        ('password_hash_rejected_total', 'counter', '排隊已滿或等待逾時而回 503 的次數',
+         [({'reason': 'queue_full'}, stats.get('rejected', 0)), ({'reason': 'timeout'}, stats.get('timeouts', 0))]),
+        ('password_hash_seconds_total', 'counter', '密碼雜湊計算耗時合計', [({}, stats['hash_seconds'])]),
+        ('password_hash_wait_seconds_total', 'counter', '請求等待密碼雜湊（含排隊）的耗時合計', [({}, stats['wait_seconds'])]),
+        ('password_hash_pending', 'gauge', '排隊與計算中的密碼雜湊數', [({}, stats['pending'])]),
+    ]
+
+
+@app.route('/metrics')
+def metrics():
+    if not app.config['METRICS_ENABLED']:
+        return jsonify({'error': '量測功能未啟用'}), 404
+    token = app.config['METRICS_TOKEN']
+    if token and not secrets.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return jsonify({'error': '未授權'}), 401
+    # 每個 gunicorn worker 各自統計，以 worker 標籤區分
+    extra = (cache_metric_families() + notification_metric_families() + event_stream_metric_families()
+             + password_hash_metric_families())
+    return Response(request_metrics.render(extra), mimetype='text/plain; version=0.0.4')
+
+
+# ====== 資料庫維護指令 ======
+
+class ExplainQueryPlan(Executable, ClauseElement):
+    inherit_cache = False
+    # 包住 UPDATE 時編譯器會把外層當成 DML 檢查這個屬性
+    _inline = False
+
+    def __init__(self, stmt):
+        self.stmt = stmt
+
+
+@compiles(ExplainQueryPlan)
+def _compile_explain_query_plan(element, compiler, **kw):
+    sql = compiler.process(element.stmt, **kw)
+    # EXPLAIN 的結果欄位與原查詢無關，不沿用原查詢欄位的型別轉換
+    compiler._result_columns = []
+    return 'EXPLAIN QUERY PLAN ' + sql
+
+
+# 各路由熱門查詢（與路由內寫法一致），供 check-query-plans 檢查是否走索引
+def hot_path_queries():
+    now = datetime.utcnow()
+    return {
+        'teams': [
+            build_team_listing_stmt(limit=DEFAULT_PAGE_SIZE),
+            build_team_listing_stmt(city='台北市', limit=DEFAULT_PAGE_SIZE, after=(now, 1)),
+            build_team_listing_stmt(sort='-start_time', limit=DEFAULT_PAGE_SIZE, after=(now, 1)),
+            build_team_listing_stmt(sort='-created_at', limit=DEFAULT_PAGE_SIZE, after=(now, 1)),
+            build_team_listing_stmt(sort='relevance', limit=DEFAULT_PAGE_SIZE, q='新莊 球場'),
+            build_team_listing_stmt(sort='relevance', limit=DEFAULT_PAGE_SIZE, after=(-1.0, 1), q='新莊'),
+            build_team_listing_stmt(limit=DEFAULT_PAGE_SIZE, slots=team_slots.SlotFilter(True, '晚上', None, None, None)),
+            build_team_listing_stmt(limit=DEFAULT_PAGE_SIZE, after=(now, 1),
+                                    slots=team_slots.SlotFilter(None, '早上', None, None, None)),
+            build_team_listing_stmt(limit=DEFAULT_PAGE_SIZE, slots=team_slots.SlotFilter(False, None, None, None, None)),
+            build_team_listing_stmt(city='台北市', limit=DEFAULT_PAGE_SIZE,
+                                    slots=team_slots.SlotFilter(None, None, (5, 6), 18 * 60, 21 * 60)),
+            build_team_listing_stmt(sort='distance', limit=DEFAULT_PAGE_SIZE, near=team_geo.Near(25.04, 121.56, 5)),
+            build_team_listing_stmt(sort='distance', limit=DEFAULT_PAGE_SIZE, after=(1.0, 1),
+                                    near=team_geo.Near(25.04, 121.56, 20)),
+            build_team_listing_stmt(city='台北市', limit=DEFAULT_PAGE_SIZE, q='羽球',
+                                    near=team_geo.Near(25.04, 121.56, 5)),
+        ],
+        'teams_recommended': [
+            build_recommendation_rows_stmt([1, 2]),
+            build_changed_teams_stmt(100, 200),
+        ],
+        'join_team': [
+            TeamMember.query.filter_by(team_id=1, user_id=1).statement,
+            # EXPLAIN 檢查 INSERT ... SELECT 中判斷名額與行程衝突的查詢部分
+            build_join_stmt(1, 1, now, block_conflicts=True).select,
+            build_schedule_conflicts_stmt(1, now, now + timedelta(hours=2), exclude_team_id=1),
+        ],
+        'teams_availability': [
+            db.select(Team.id, Team.start_time, Team.end_time).where(Team.id.in_([1, 2, 3])),
+            build_schedule_conflicts_stmt(1, now, now + timedelta(days=7)),
+        ],
+        'leave_team': [
+            TeamMember.query.filter_by(team_id=1, user_id=1).statement,
+            TeamMember.query.filter_by(team_id=1, is_waitlist=True).order_by(TeamMember.joined_at).statement,
+        ],
+        'team_detail': [
+            build_team_event_stamp_stmt(1),
+            build_roster_stmt(1),
+            build_message_page_stmt(1),
+        ],
+        'team_messages': [
+            db.select(func.max(TeamMessage.id)).where(TeamMessage.team_id == 1, TeamMessage.is_public == True),
+            build_message_page_stmt(1, before_id=100),
+            build_message_page_stmt(1, after_id=100),
+        ],
+        'user_profile': [
+            build_memberships_stmt(1),
+            build_stats_window_stmt([1], now.date()),
+        ],
+        'notifications': [
+            build_enqueue_stmt('message', 1, build_team_recipients_stmt(1, exclude_user_id=1, waitlist=True)).select,
+            build_claim_stmt(app.config['NOTIFY_BATCH_SIZE'], now, now),
+            db.select(func.count(), func.min(Notification.available_at)).where(Notification.available_at.isnot(None)),
+        ],
+        'clean_expired_teams': [
+            db.select(Team.id).where(Team.end_time < now).limit(app.config['REAPER_BATCH_SIZE']),
+            build_archive_stmt([1, 2]).select,
+            build_played_deltas([1, 2]),
+            *build_reap_stmts([1, 2]),
+            db.delete(UserStatsDay).where(UserStatsDay.day < now.date()),
+        ],
+    }
+
+
+# 找出查詢計畫中未使用索引的全表掃描（SCAN <table> 或臨時建立的自動索引）
+def find_table_scans(stmt):
+    table_names = set(db.metadata.tables)
+    problems = []
+    for row in db.session.execute(ExplainQueryPlan(stmt)):
+        detail = row[-1]
+        words = detail.split()
+        if 'AUTOMATIC' in words:
+            problems.append(detail)
+        elif len(words) >= 2 and words[0] == 'SCAN' and words[1] in table_names and 'USING' not in words:
+            problems.append(detail)
+    return problems
+
+
+@app.cli.command('check-query-plans')
+def check_query_plans_command():
+    """以 EXPLAIN QUERY PLAN 檢查各路由查詢，發現全表掃描時以非零狀態結束。"""
+    failed = False
+    for route, statements in hot_path_queries().items():
+        for stmt in statements:
+            problems = find_table_scans(stmt)
+            if problems:
+                failed = True
+                for detail in problems:
+                    print(f'[FAIL] {route}: {detail}')
+            else:
+                print(f'[OK]   {route}')
+    if failed:
+        raise SystemExit(1)
+
+
+@app.cli.command('search-backfill')
+def search_backfill_command():
+    """重建隊伍全文檢索索引（首次啟用或索引不同步時執行）。"""
+    started = datetime.utcnow()
+    # 讀取與寫入使用同一個連線與 transaction，避免 SQLite 鎖互相等待
+    connection = db.session.connection()
+    team_search.install(connection)
+    teams = db.session.execute(db.select(Team).execution_options(yield_per=1000)).scalars()
+    total = team_search.rebuild(connection, teams)
+    bump_cache_version('teams')
+    db.session.commit()
+    elapsed = (datetime.utcnow() - started).total_seconds()
+    print(f'已重建 {total} 筆隊伍索引，耗時 {elapsed:.2f} 秒')
+
+
+@app.cli.command('drain-notifications')
+@click.option('--now', 'skip_delay', is_flag=True, help='不等合併等待時間，立即寄出剛建立的通知')
+def drain_notifications_command(skip_delay):
+    """在前景寄出到期的通知直到沒有為止（NOTIFY_WORKERS=0 時以排程執行）。"""
+    # 失敗的通知以退避時間重試，不會在這次執行中重複認領
+    due_before = datetime.utcnow() + timedelta(seconds=app.config['NOTIFY_COALESCE_SECONDS']) if skip_delay else None
+    pool = notification_outbox.OutboxWorkerPool(
+        lambda batch_size: claim_notifications(batch_size, due_before=due_before),
+        finish_notifications, render_notifications, make_notification_sender(),
+        batch_size=app.config['NOTIFY_BATCH_SIZE'],
+    )
+    started = time.perf_counter()
+    while pool.drain_once():
+        pass
+    stats = pool.stats()
+    elapsed = time.perf_counter() - started
+    print(f'已處理 {stats.get("notifications", 0)} 則通知（寄出 {stats.get("deliveries", 0)} 次、'
+          f'略過 {stats.get("skipped", 0)} 次、失敗 {stats.get("failed", 0)} 則），耗時 {elapsed:.2f} 秒')
+
+
+@app.cli.command('rebuild-player-stats')
+def rebuild_player_stats_command():
+    """從名單、取消紀錄與封存隊伍重新計算球員信譽統計（升級後第一次使用或懷疑統計有誤時執行）。"""
+    stats_rows, day_rows = rebuild_player_stats()
+    print(f'已重建 {stats_rows} 位球員的統計（近期分日統計 {day_rows} 列）')
+
+
+@app.cli.command('reap-expired-teams')
+@click.option('--batch-size', type=int, default=lambda: app.config['REAPER_BATCH_SIZE'], show_default='REAPER_BATCH_SIZE',
+              help='每批處理的隊伍數')
+@click.option('--archive/--no-archive', default=lambda: app.config['REAPER_ARCHIVE'], show_default='REAPER_ARCHIVE',
+              help='刪除前是否先封存到 team_archive')
+def reap_expired_teams_command(batch_size, archive):
+    """分批清理已結束的隊伍及其成員、留言、事件與取消紀錄。"""
+    stats = clean_expired_teams(batch_size=batch_size, archive=archive)
+    print(f'已清理 {stats["teams"]} 個隊伍、{stats["deleted_rows"]} 筆資料（封存 {stats["archived_teams"]} 隊），'
+          f'耗時 {stats["elapsed_seconds"]:.2f} 秒，{stats["rows_per_second"]:.1f} 筆/秒')
+    for name, count in sorted(stats['tables'].items()):
+        print(f'  {name}: {count}')
+
+
+@app.cli.command('sqlite-settings')
+def sqlite_settings_command():
+    """顯示目前的 SQLite 連線設定檔與實際生效的 pragma。"""
+    print(f'profile: {SQLITE_PROFILE}')
+    with db.engine.connect() as connection:
+        for name, value in sqlite_profile.current_settings(connection).items():
+            print(f'{name}: {value}')
+    for option in ('pool_size', 'max_overflow', 'pool_timeout'):
+        if option in app.config['SQLALCHEMY_ENGINE_OPTIONS']:
+            print(f'{option}: {app.config["SQLALCHEMY_ENGINE_OPTIONS"][option]}')
+
+
+@app.cli.command('import-venues')
+@click.argument('csv_file', type=click.File(encoding='utf-8-sig'))
+def import_venues_command(csv_file):
+    """匯入球場座標（CSV 欄位：city,name,address,latitude,longitude），並更新同城市同名球場的隊伍座標。"""
+    rows = []
+    for line_no, record in enumerate(csv.DictReader(csv_file), start=2):
+        try:
+            latitude, longitude = team_geo.validate_coordinates(record['latitude'], record['longitude'])
+        except (KeyError, ValueError, TypeError):
+            raise click.ClickException(f'第 {line_no} 行座標格式錯誤')
+        rows.append({'city': record['city'].strip(), 'name': record['name'].strip(),
+                     'address': (record.get('address') or '').strip(), 'latitude': latitude, 'longitude': longitude,
+                     'created_at': datetime.utcnow()})
+    if rows:
+        stmt = sqlite_insert(Venue)
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=[Venue.city, Venue.name],
+            set_={'address': stmt.excluded.address, 'latitude': stmt.excluded.latitude,
+                  'longitude': stmt.excluded.longitude},
+        ), rows)
+    # 批次 UPDATE 不經過 ORM 事件，網格編號以相同規則在 SQL 內計算
+    updated = db.session.execute(
+        db.update(Team)
+        .where(Team.location_city == Venue.city, Team.location_venue == Venue.name)
+        .values(venue_id=Venue.id, latitude=Venue.latitude, longitude=Venue.longitude,
+                geo_cell=team_geo.cell_expression(Venue.latitude, Venue.longitude))
+    ).rowcount
+    bump_cache_version('teams')
+    db.session.commit()
+    print(f'已匯入 {len(rows)} 個球場，更新 {updated} 個隊伍的座標')
+
+
 # Render/gunicorn 會自動以 app:app 啟動
 # 確保 /data/uploads 資料夾存在且可寫入
 
-# 不論本地或 Render，每次啟動都自動建立資料表（若尚未建立）
+# ====== 啟動與 schema 版本 ======
+
+MIGRATIONS_DIR = os.path.join(app.root_path, 'migrations')
+# migrations/versions 最新的 revision，新增 migration 時一併更新（flask schema-status 會檢查）
+SCHEMA_VERSION = 'f4a6c8e0b2d3'
+
+# 是否在啟動時自動建立/升級資料庫；設為 0 時需於部署步驟執行 flask db upgrade
+app.config['SCHEMA_AUTO_UPGRADE'] = os.environ.get('SCHEMA_AUTO_UPGRADE', '1') == '1'
+
+
+# Flask-Migrate（連帶 alembic）的匯入約佔啟動時間三分之一，
+# 只有執行 flask db 指令或需要升級 schema 時才載入
+def init_migrate():
+    if 'migrate' not in app.extensions:
+        from flask_migrate import Migrate
+        Migrate(app, db, directory=MIGRATIONS_DIR)
+
+
+class LazyMigrateGroup(click.Group):
+    def _load(self):
+        init_migrate()
+        from flask_migrate.cli import db as db_cli_group
+        return db_cli_group
+
+    def list_commands(self, ctx):
+        return self._load().list_commands(ctx)
+
+    def get_command(self, ctx, name):
+        return self._load().get_command(ctx, name)
+
+
+app.cli.add_command(LazyMigrateGroup('db', help='Perform database migrations.'))
+
+
+def read_schema_version():
+    try:
+        with db.engine.connect() as connection:
+            return connection.exec_driver_sql('SELECT version_num FROM alembic_version').scalar()
+    except OperationalError:
+        return None
+
+
+# 同一台機器上的多個 worker 同時啟動時，只讓一個行程建立或升級資料庫
+@contextmanager
+def startup_lock():
+    try:
+        import fcntl
+    except ImportError:
+        # Windows 本地開發只會有單一行程
+        yield
+        return
+    with open(DB_PATH + '.startup.lock', 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def ensure_schema():
+    """以一次查詢比對 alembic_version；版本不符時才建立或升級資料庫。"""
+    if read_schema_version() == SCHEMA_VERSION:
+        return
+    with startup_lock():
+        current = read_schema_version()
+        if current == SCHEMA_VERSION:
+            return
+        if not app.config['SCHEMA_AUTO_UPGRADE']:
+            app.logger.warning('資料庫 schema 版本為 %s，程式需要 %s，請執行 flask db upgrade', current, SCHEMA_VERSION)
+            return
+        init_migrate()
+        from flask_migrate import stamp, upgrade
+        if not db.inspect(db.engine).has_table('user'):
+            # 全新資料庫：直接依模型建立後標記為最新版本
+            db.create_all()
+            with db.engine.begin() as connection:
+                team_search.install(connection)
+            stamp(revision=SCHEMA_VERSION)
+        else:
+            upgrade(revision=SCHEMA_VERSION)
+        app.logger.info('資料庫 schema 已由 %s 更新至 %s', current, SCHEMA_VERSION)
+
+
+@app.cli.command('schema-status')
+def schema_status_command():
+    """比對資料庫、程式與 migrations 的 schema 版本，不一致時以非零狀態結束。"""
+    init_migrate()
+    from alembic.script import ScriptDirectory
+    head = ScriptDirectory.from_config(app.extensions['migrate'].migrate.get_config()).get_current_head()
+    current = read_schema_version()
+    print(f'database: {current}')
+    print(f'SCHEMA_VERSION: {SCHEMA_VERSION}')
+    print(f'migrations head: {head}')
+    if not (current == SCHEMA_VERSION == head):
+        raise SystemExit(1)
+
+
+# 每個行程啟動時只做一次查詢；搭配 gunicorn --preload 時只在 master 執行一次
 with app.app_context():
-    db.create_all()
+    ensure_schema()
 
 # 若本地開發自動啟動 Flask 伺服器
 if __name__ == '__main__':
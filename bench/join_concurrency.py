@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""並發報名壓力測試：大量同時呼叫 /join_team，統計吞吐量並檢查名單是否出錯。
+
+在暫存目錄建立獨立的 SQLite 資料庫，以多個行程（模擬 gunicorn worker）
+各自開多條執行緒同時報名，結束後檢查：
+  - 正式名單是否超過人數上限
+  - 同一人是否重複報名
+  - 尚有空位時是否有人被排入候補
+  - 回應成功的次數是否等於實際寫入的筆數
+
+用法：python bench/join_concurrency.py --teams 20 --users-per-team 100 --processes 4 --threads 16
+
+資料庫鎖定時報名會退回重試，多次仍失敗才回 503（結果中列為「503 目前使用人數過多」）；
+預設參數下不應出現 500。
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from multiprocessing import get_context
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_app(workdir):
+    # app.py 以目前目錄決定資料庫位置，切到暫存目錄以免動到開發用資料庫
+    os.chdir(workdir)
+    sys.path.insert(0, ROOT)
+    os.environ.setdefault('SECRET_KEY', 'bench-join-concurrency')
+    import app as badminton
+    return badminton
+
+
+def seed(badminton, teams, users_per_team, max_participants):
+    app, db = badminton.app, badminton.db
+    now = datetime.utcnow()
+    with app.app_context():
+        db.session.execute(db.insert(badminton.User), [{
+            'username': f'bench{i}', 'password_hash': '-', 'nickname': f'bench{i}', 'phone': '0900000000',
+            'gender': '男', 'experience_years': 1, 'preferred_position': '不限', 'skill_level': 5,
+            'play_style': '雙打', 'preferred_time': '晚上', 'contact': '-', 'preferred_region': '台北市',
+        } for i in range(users_per_team + 1)])
+        db.session.execute(db.insert(badminton.Team), [{
+            'name': f'bench team {i}', 'organizer_id': 1, 'location_city': '台北市',
+            'location_venue': 'bench', 'location_address': '-', 'activity_type': '雙打',
+            # 每隊錯開時間，同一人報名多隊時不會被行程衝突檢查擋下
+            'start_time': now + timedelta(days=3, hours=3 * i), 'end_time': now + timedelta(days=3, hours=3 * i + 2),
+            'max_participants': max_participants,
+        } for i in range(teams)])
+        db.session.commit()
+        team_ids = db.session.execute(db.select(badminton.Team.id)).scalars().all()
+        user_ids = db.session.execute(db.select(badminton.User.id).where(badminton.User.id != 1)).scalars().all()
+    return team_ids, user_ids
+
+
+def run_chunk(args):
+    workdir, jobs, threads = args
+    badminton = load_app(workdir)
+    app = badminton.app
+    # 鎖定逾時等錯誤會以 500 計入結果，不需要每筆都印出 traceback
+    app.logger.disabled = True
+
+    def join(job):
+        team_id, user_id = job
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = user_id
+        try:
+            response = client.post(f'/join_team/{team_id}')
+            body = response.get_json(silent=True) or {}
+            return team_id, user_id, response.status_code, body.get('status') or body.get('error', '')
+        except Exception as e:
+            return team_id, user_id, 'exception', type(e).__name__
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return list(pool.map(join, jobs))
+
+
+def check_invariants(badminton, max_participants, results):
+    app, db, TeamMember = badminton.app, badminton.db, badminton.TeamMember
+    with app.app_context():
+        rows = db.session.execute(db.select(TeamMember.team_id, TeamMember.user_id, TeamMember.is_waitlist)).all()
+    confirmed = Counter(team_id for team_id, _, waitlist in rows if not waitlist)
+    waitlisted = Counter(team_id for team_id, _, waitlist in rows if waitlist)
+    pairs = Counter((team_id, user_id) for team_id, user_id, _ in rows)
+    accepted = sum(1 for _, _, status, _ in results if status == 200)
+    return {
+        'over_capacity_teams': sum(1 for count in confirmed.values() if count > max_participants),
+        'duplicate_memberships': sum(count - 1 for count in pairs.values() if count > 1),
+        'waitlisted_with_free_seats': sum(1 for team_id in waitlisted if confirmed[team_id] < max_participants),
+        'accepted_without_row': max(0, accepted - len(rows)),
+        'rows_without_success': max(0, len(rows) - accepted),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='並發報名壓力測試')
+    parser.add_argument('--teams', type=int, default=20)
+    parser.add_argument('--users-per-team', type=int, default=100)
+    parser.add_argument('--max-participants', type=int, default=4)
+    parser.add_argument('--duplicate-ratio', type=float, default=0.1, help='重複送出同一報名的比例')
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--json', help='將結果另存為 JSON 檔')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_join_')
+    badminton = load_app(workdir)
+    team_ids, user_ids = seed(badminton, args.teams, args.users_per_team, args.max_participants)
+
+    jobs = [(team_id, user_id) for team_id in team_ids for user_id in user_ids]
+    jobs += random.sample(jobs, int(len(jobs) * args.duplicate_ratio))
+    random.shuffle(jobs)
+    chunks = [jobs[i::args.processes] for i in range(args.processes)]
+
+    ctx = get_context('spawn')
+    started = time.perf_counter()
+    with ctx.Pool(args.processes) as pool:
+        results = [r for chunk in pool.map(run_chunk, [(workdir, c, args.threads) for c in chunks]) for r in chunk]
+    elapsed = time.perf_counter() - started
+
+    outcomes = Counter(f'{status} {detail}' for _, _, status, detail in results)
+    violations = check_invariants(badminton, args.max_participants, results)
+    report = {
+        'requests': len(results),
+        'elapsed_seconds': round(elapsed, 3),
+        'requests_per_second': round(len(results) / elapsed, 1),
+        'processes': args.processes,
+        'threads': args.threads,
+        'outcomes': dict(outcomes),
+        'violations': violations,
+        'database': os.path.join(workdir, 'badminton.db'),
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if any(violations.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    if os.path.exists('/data'):
+        sys.exit('偵測到 /data（正式環境），請勿在此執行壓力測試')
+    main()
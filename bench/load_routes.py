@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""各路由壓力測試：以測試資料對主要路由送出大量請求，統計延遲分位數、吞吐量與每個請求的查詢數。
+
+兩種模式：
+  - 預設在同一個行程內以 Flask test client 送出請求，可統計每個請求執行的 SQL 數量
+  - --url 對已啟動的伺服器（例如本機 gunicorn）送出真正的 HTTP 請求，不統計查詢數
+
+資料庫由 bench/seed_data.py 產生；未指定 --workdir 時會先建立新的暫存目錄並產生資料。
+結果可存成 JSON，再以 --compare 與先前的結果比較：
+
+  python bench/load_routes.py --users 5000 --teams 2000 --json before.json
+  python bench/load_routes.py --workdir /tmp/badminton_seed --json after.json --compare before.json
+
+對 gunicorn 測試時，伺服器需使用同一個資料庫目錄：
+
+  cd /tmp/badminton_seed && PYTHONPATH=<repo> gunicorn -c <repo>/gunicorn.conf.py app:app
+  python bench/load_routes.py --workdir /tmp/badminton_seed --url http://127.0.0.1:8000
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import seed_data
+
+LISTING_QUERIES = ['/teams', '/teams?city=台北市', '/teams?sort=start_time', '/teams?q=運動中心', '/teams?limit=50',
+                   '/teams?near=25.04,121.56&radius=5']
+# 依序執行；leave_team 退出 join_team 剛加入的隊伍
+ROUTES = ['teams', 'team_detail', 'team_messages', 'join_team', 'leave_team', 'login']
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return round(ordered[index], 2)
+
+
+def summarize(samples, elapsed):
+    latencies = sorted(sample['ms'] for sample in samples)
+    statuses = Counter(sample['status'] for sample in samples)
+    queries = [sample['queries'] for sample in samples if sample['queries'] is not None]
+    return {
+        'requests': len(samples),
+        'errors': sum(count for status, count in statuses.items() if not isinstance(status, int) or status >= 500),
+        'statuses': {str(status): count for status, count in sorted(statuses.items(), key=str)},
+        'p50_ms': percentile(latencies, 0.50),
+        'p95_ms': percentile(latencies, 0.95),
+        'p99_ms': percentile(latencies, 0.99),
+        'max_ms': round(latencies[-1], 2) if latencies else None,
+        'throughput_rps': round(len(samples) / elapsed, 1) if elapsed else None,
+        'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+    }
+
+
+class TestClientDriver:
+    """同一個行程內以 test client 送出請求，以 SQLAlchemy 事件計算每個請求的查詢數。"""
+
+    def __init__(self, badminton):
+        self.app = badminton.app
+        self.local = threading.local()
+        with self.app.app_context():
+            from sqlalchemy import event
+            event.listen(badminton.db.engine, 'before_cursor_execute', self._count)
+
+    def _count(self, *args):
+        self.local.queries = getattr(self.local, 'queries', 0) + 1
+
+    def request(self, method, path, user_id=None, form=None):
+        client = self.app.test_client()
+        if user_id is not None:
+            with client.session_transaction() as sess:
+                sess['user_id'] = user_id
+        self.local.queries = 0
+        started = time.perf_counter()
+        try:
+            response = client.open(path, method=method, data=form)
+            status = response.status_code
+            response.close()
+        except Exception as e:
+            status = type(e).__name__
+        return status, (time.perf_counter() - started) * 1000, self.local.queries
+
+    def prepare(self, user_ids, threads):
+        pass
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    # 與 test client 一致，量測的是請求本身，不跟隨轉址
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpDriver:
+    """對執行中的伺服器送出 HTTP 請求；每位使用者先登入一次並保留 cookie。"""
+
+    def __init__(self, base_url, password):
+        self.base_url = base_url.rstrip('/')
+        self.password = password
+        self.openers = {}
+        self.lock = threading.Lock()
+
+    def _opener(self, user_id):
+        with self.lock:
+            opener = self.openers.get(user_id)
+        if opener is None:
+            opener = urllib.request.build_opener(NoRedirect, urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+            if user_id is not None:
+                self._open(opener, 'POST', '/login', {'username': f'bench{user_id}', 'password': self.password})
+            with self.lock:
+                self.openers[user_id] = opener
+        return opener
+
+    def _open(self, opener, method, path, form):
+        data = urllib.parse.urlencode(form).encode() if form is not None else None
+        url = self.base_url + urllib.parse.quote(path, safe='/?=&')
+        try:
+            with opener.open(urllib.request.Request(url, data=data, method=method), timeout=60) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+        except OSError as e:
+            return type(e).__name__
+
+    def prepare(self, user_ids, threads):
+        # 先登入所有會用到的使用者，登入時間不計入各路由的量測
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(self._opener, user_ids))
+
+    def request(self, method, path, user_id=None, form=None):
+        # 登入請求本身要量測，不重用已登入的 cookie
+        opener = self._opener(None if path == '/login' else user_id)
+        started = time.perf_counter()
+        status = self._open(opener, method, path, form)
+        return status, (time.perf_counter() - started) * 1000, None
+
+
+def build_jobs(route, count, dataset, rng, joined, sessions):
+    teams, users = dataset['teams'], dataset['users']
+    if route == 'teams':
+        return [('GET', rng.choice(LISTING_QUERIES), rng.choice(sessions), None) for _ in range(count)]
+    if route == 'team_detail':
+        return [('GET', f'/team/{rng.randint(1, teams)}', rng.choice(sessions), None) for _ in range(count)]
+    if route == 'team_messages':
+        return [('GET', f'/team/{rng.randint(1, teams)}/messages', rng.choice(sessions), None) for _ in range(count)]
+    if route == 'join_team':
+        # 避開已是成員的組合，並記錄下來供 leave_team 使用
+        pairs = set()
+        while len(pairs) < count:
+            pair = (rng.randint(1, teams), rng.choice(sessions))
+            if pair not in dataset['members']:
+                pairs.add(pair)
+        joined.extend(sorted(pairs))
+        return [('POST', f'/join_team/{team_id}', user_id, None) for team_id, user_id in joined]
+    if route == 'leave_team':
+        return [('POST', f'/leave_team/{team_id}', user_id, None) for team_id, user_id in joined[:count]]
+    if route == 'login':
+        return [('POST', '/login', None, {'username': f'bench{rng.randint(1, users)}', 'password': dataset['password']})
+                for _ in range(count)]
+    raise ValueError(route)
+
+
+def run_route(driver, jobs, threads):
+    def send(job):
+        method, path, user_id, form = job
+        status, ms, queries = driver.request(method, path, user_id=user_id, form=form)
+        return {'status': status, 'ms': ms, 'queries': queries}
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        samples = list(pool.map(send, jobs))
+    return summarize(samples, time.perf_counter() - started)
+
+
+def load_dataset(badminton, password):
+    app, db = badminton.app, badminton.db
+    with app.app_context():
+        rows = db.session.execute(db.select(badminton.TeamMember.team_id, badminton.TeamMember.user_id))
+        members = {tuple(row) for row in rows}
+        return {
+            'users': db.session.execute(db.select(db.func.max(badminton.User.id))).scalar() or 0,
+            'teams': db.session.execute(db.select(db.func.max(badminton.Team.id))).scalar() or 0,
+            'members': members,
+            'password': password,
+        }
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=seed_data.ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline_path):
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    print(f'\n與 {baseline_path}（{baseline["meta"].get("revision")}）比較：')
+    print(f'{"route":<14}{"p50 ms":>24}{"p95 ms":>24}{"req/s":>22}{"queries":>18}')
+
+    def cell(old, new, width):
+        if old is None or new is None:
+            return f'{"-":>{width}}'
+        change = f'{(new - old) / old * 100:+.0f}%' if old else ''
+        return f'{f"{old}→{new} {change}":>{width}}'
+
+    for route, result in report['routes'].items():
+        old = baseline['routes'].get(route)
+        if not old:
+            continue
+        print(f'{route:<14}{cell(old["p50_ms"], result["p50_ms"], 24)}{cell(old["p95_ms"], result["p95_ms"], 24)}'
+              f'{cell(old["throughput_rps"], result["throughput_rps"], 22)}'
+              f'{cell(old["queries_per_request"], result["queries_per_request"], 18)}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='各路由壓力測試')
+    parser.add_argument('--workdir', help='已由 seed_data.py 產生資料的目錄（預設建立新的暫存目錄並產生資料）')
+    seed_data.add_arguments(parser)
+    parser.add_argument('--url', help='對執行中的伺服器測試，例如 http://127.0.0.1:8000')
+    parser.add_argument('--routes', nargs='+', default=ROUTES, choices=ROUTES)
+    parser.add_argument('--requests', type=int, default=500, help='每個路由的請求數')
+    parser.add_argument('--login-requests', type=int, default=20, help='登入的請求數（密碼雜湊刻意很慢）')
+    parser.add_argument('--sessions', type=int, default=20, help='已登入使用者的數量，請求平均分配給這些使用者')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--json', help='將結果另存為 JSON 檔')
+    parser.add_argument('--compare', help='與先前存下的 JSON 結果比較')
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='bench_routes_')
+    os.makedirs(workdir, exist_ok=True)
+    badminton = seed_data.load_app(workdir)
+    seeded = None
+    if not args.workdir:
+        seeded = seed_data.seed(badminton, args.users, args.teams, args.members_per_team, args.messages_per_team,
+                                args.cancellations, password=args.password, random_seed=args.seed)
+    dataset = load_dataset(badminton, args.password)
+    driver = HttpDriver(args.url, args.password) if args.url else TestClientDriver(badminton)
+
+    rng = random.Random(args.seed)
+    sessions = rng.sample(range(1, dataset['users'] + 1), min(args.sessions, dataset['users']))
+    driver.prepare(sessions, args.threads)
+    joined = []
+    routes = {}
+    for route in ROUTES:
+        if route not in args.routes:
+            continue
+        count = args.login_requests if route == 'login' else args.requests
+        jobs = build_jobs(route, count, dataset, rng, joined, sessions)
+        routes[route] = run_route(driver, jobs, args.threads)
+        print(f'{route:<14} p50 {routes[route]["p50_ms"]} ms  p95 {routes[route]["p95_ms"]} ms  '
+              f'{routes[route]["throughput_rps"]} req/s  queries {routes[route]["queries_per_request"]}',
+              file=sys.stderr)
+
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'mode': 'http' if args.url else 'test_client',
+            'url': args.url,
+            'threads': args.threads,
+            'sessions': len(sessions),
+            'sqlite_profile': badminton.SQLITE_PROFILE,
+            'database': badminton.DB_PATH,
+            'dataset': {'users': dataset['users'], 'teams': dataset['teams'], 'members': len(dataset['members'])},
+            'seed': seeded,
+        },
+        'routes': routes,
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == '__main__':
+    if os.path.exists('/data'):
+        sys.exit('偵測到 /data（正式環境），請勿在此執行壓力測試')
+    main()
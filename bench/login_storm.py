@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""登入尖峰壓力測試：大量同時登入時，量測登入吞吐量與一般瀏覽（/teams）的延遲。
+
+1. 基準：只有 --readers 條執行緒持續讀取 /teams，共 --seconds 秒
+2. 尖峰：同樣的讀取之外，另有 --logins 條執行緒持續登入，共 --seconds 秒
+
+密碼雜湊在背景執行緒計算，同時計算數為 PASSWORD_HASH_WORKERS，排隊超過 PASSWORD_HASH_QUEUE 時登入回 503。
+以同一個行程（test client）測試時可用 --hash-workers / --hash-queue / --hash-method 調整；
+--stored-method 先把所有使用者的密碼改存成另一種雜湊，量測登入時順便重新雜湊的成本。
+
+  python bench/login_storm.py --users 2000 --teams 500 --logins 16 --readers 4
+  python bench/login_storm.py --hash-workers 64 --hash-queue 1000   # 近似不限制同時雜湊數
+
+對 gunicorn 測試時（雜湊設定改由伺服器的環境變數決定）：
+
+  python bench/login_storm.py --workdir /tmp/badminton_seed --url http://127.0.0.1:8000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import seed_data  # noqa: E402
+from load_routes import HttpDriver, TestClientDriver, git_revision, load_dataset, summarize  # noqa: E402
+
+
+def run_phase(driver, dataset, readers, logins, seconds, random_seed, retry_delay=0):
+    """各執行緒持續送出請求直到時間到，回傳 {'teams': ..., 'login': ...} 的統計。"""
+    deadline = time.perf_counter() + seconds
+    samples = {'teams': [], 'login': []}
+    lock = threading.Lock()
+
+    def loop(kind, index):
+        rng = random.Random(random_seed * 1000 + index)
+        local = []
+        while time.perf_counter() < deadline:
+            if kind == 'teams':
+                status, ms, queries = driver.request('GET', '/teams')
+            else:
+                user_id = rng.randint(1, dataset['users'])
+                status, ms, queries = driver.request('POST', '/login', form={
+                    'username': f'bench{user_id}', 'password': dataset['password']})
+            local.append({'status': status, 'ms': ms, 'queries': queries})
+            if status == 503:
+                # 使用者看到「請稍後再試」後不會立刻重送
+                time.sleep(retry_delay)
+        with lock:
+            samples[kind].extend(local)
+
+    threads = [threading.Thread(target=loop, args=('teams', index)) for index in range(readers)]
+    threads += [threading.Thread(target=loop, args=('login', readers + index)) for index in range(logins)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return {kind: summarize(items, elapsed) for kind, items in samples.items() if items}
+
+
+def store_hashes(badminton, method, password):
+    """把所有使用者的密碼改存成 method 的雜湊（共用同一組），登入時會被重新雜湊成目前設定。"""
+    from werkzeug.security import generate_password_hash
+    app, db = badminton.app, badminton.db
+    with app.app_context():
+        db.session.execute(db.update(badminton.User).values(password_hash=generate_password_hash(password, method)))
+        db.session.commit()
+
+
+def report_line(name, result):
+    print(f'{name:<16} {result["throughput_rps"]} req/s  p50 {result["p50_ms"]} ms  p95 {result["p95_ms"]} ms  '
+          f'p99 {result["p99_ms"]} ms  {result["statuses"]}', file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='登入尖峰壓力測試')
+    parser.add_argument('--workdir', help='已由 seed_data.py 產生資料的目錄（預設建立新的暫存目錄並產生資料）')
+    seed_data.add_arguments(parser)
+    parser.add_argument('--url', help='對執行中的伺服器測試，例如 http://127.0.0.1:8000')
+    parser.add_argument('--readers', type=int, default=4, help='持續讀取 /teams 的執行緒數')
+    parser.add_argument('--logins', type=int, default=16, help='尖峰期間持續登入的執行緒數')
+    parser.add_argument('--seconds', type=float, default=10, help='每個階段的秒數')
+    parser.add_argument('--retry-delay', type=float, default=1, help='登入回 503 後隔幾秒再試')
+    parser.add_argument('--hash-workers', type=int, help='PASSWORD_HASH_WORKERS（只用於同一個行程測試）')
+    parser.add_argument('--hash-queue', type=int, help='PASSWORD_HASH_QUEUE（只用於同一個行程測試）')
+    parser.add_argument('--hash-method', help='PASSWORD_HASH_METHOD（只用於同一個行程測試）')
+    parser.add_argument('--stored-method', help='先把密碼改存成這種雜湊，例如 pbkdf2:sha256:600000')
+    parser.add_argument('--json', help='將結果另存為 JSON 檔')
+    args = parser.parse_args()
+
+    # app.py 載入時讀取設定，必須在 load_app 之前設定環境變數
+    for name, value in (('PASSWORD_HASH_WORKERS', args.hash_workers), ('PASSWORD_HASH_QUEUE', args.hash_queue),
+                        ('PASSWORD_HASH_METHOD', args.hash_method)):
+        if value is not None:
+            os.environ[name] = str(value)
+    os.environ.setdefault('NOTIFY_WORKERS', '0')
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='bench_login_')
+    os.makedirs(workdir, exist_ok=True)
+    badminton = seed_data.load_app(workdir)
+    seeded = None
+    if not args.workdir:
+        seeded = seed_data.seed(badminton, args.users, args.teams, args.members_per_team, args.messages_per_team,
+                                args.cancellations, password=args.password, random_seed=args.seed)
+    if args.stored_method:
+        store_hashes(badminton, args.stored_method, args.password)
+    dataset = load_dataset(badminton, args.password)
+    driver = HttpDriver(args.url, args.password) if args.url else TestClientDriver(badminton)
+
+    # 先讀一次 /teams 暖機，避免第一次查詢與模板編譯算進基準
+    driver.request('GET', '/teams')
+    baseline = run_phase(driver, dataset, args.readers, 0, args.seconds, args.seed)
+    report_line('teams (baseline)', baseline['teams'])
+    storm = run_phase(driver, dataset, args.readers, args.logins, args.seconds, args.seed + 1, args.retry_delay)
+    report_line('teams (storm)', storm['teams'])
+    report_line('login (storm)', storm['login'])
+
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'mode': 'http' if args.url else 'test_client',
+            'url': args.url,
+            'readers': args.readers,
+            'logins': args.logins,
+            'seconds': args.seconds,
+            'retry_delay': args.retry_delay,
+            'stored_method': args.stored_method,
+            'dataset': {'users': dataset['users'], 'teams': dataset['teams']},
+            'seed': seeded,
+        },
+        'baseline': baseline,
+        'storm': storm,
+    }
+    if not args.url:
+        config = badminton.app.config
+        report['meta']['password_hash'] = {'method': badminton.password_hasher.method,
+                                           'workers': config['PASSWORD_HASH_WORKERS'],
+                                           'queue': config['PASSWORD_HASH_QUEUE']}
+        report['hasher'] = badminton.password_hasher.stats()
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    if os.path.exists('/data'):
+        sys.exit('偵測到 /data（正式環境），請勿在此執行壓力測試')
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""通知寄件匣壓力測試：模擬留言洗版產生大量通知，量測寫入端的額外耗時與背景寄送的吞吐量。
+
+1. 以 seed_data 產生使用者與隊伍，對隨機隊伍送出 --messages 則留言，
+   量測每則留言寫入通知（INSERT ... SELECT 隊伍成員）所花的時間
+2. 以 --workers 條執行緒同時認領、合併、寄送，寄送器以 --send-ms 模擬每次寄送的延遲，
+   期間定時記錄積壓量
+
+用法：python bench/notification_drain.py --messages 5000 --workers 4 --send-ms 5
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import seed_data  # noqa: E402
+
+
+class SleepSender:
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def send(self, recipient, subject, lines):
+        time.sleep(self.seconds)
+        return True
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def enqueue_messages(badminton, teams, users, messages, random_seed):
+    """每則留言一個 transaction，回傳每次寫入通知的秒數。"""
+    app, db = badminton.app, badminton.db
+    rng = random.Random(random_seed)
+    timings = []
+    with app.app_context():
+        for index in range(messages):
+            team_id, sender_id = rng.randint(1, teams), rng.randint(1, users)
+            started = time.perf_counter()
+            badminton.enqueue_notifications(
+                'message', team_id, badminton.build_team_recipients_stmt(team_id, exclude_user_id=sender_id, waitlist=True),
+                nickname=f'球友{sender_id}', message=f'洗版留言 {index}')
+            timings.append(time.perf_counter() - started)
+            db.session.commit()
+        total = db.session.execute(db.select(db.func.count(badminton.Notification.id))).scalar()
+    return timings, total
+
+
+def drain(badminton, workers, batch_size, send_seconds, sample_interval):
+    app, db = badminton.app, badminton.db
+    pool = badminton.notification_outbox.OutboxWorkerPool(
+        badminton.claim_notifications, badminton.finish_notifications, badminton.render_notifications,
+        SleepSender(send_seconds), batch_size=batch_size, run_in_context=badminton.run_in_app_context)
+
+    def work():
+        while pool.run_in_context(pool.drain_once):
+            pass
+
+    def backlog():
+        with app.app_context():
+            return db.session.execute(
+                db.select(db.func.count(badminton.Notification.id)).where(badminton.Notification.available_at.isnot(None))
+            ).scalar()
+
+    threads = [threading.Thread(target=work) for _ in range(workers)]
+    samples = []
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    while any(thread.is_alive() for thread in threads):
+        samples.append((round(time.perf_counter() - started, 2), backlog()))
+        time.sleep(sample_interval)
+    elapsed = time.perf_counter() - started
+    return pool.stats(), elapsed, samples, backlog()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='通知寄件匣壓力測試')
+    parser.add_argument('--workdir', help='資料庫所在目錄（預設建立新的暫存目錄）')
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--teams', type=int, default=200)
+    parser.add_argument('--members-per-team', type=int, default=6)
+    parser.add_argument('--messages', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--batch-size', type=int, default=100, help='每次認領的收件者數')
+    parser.add_argument('--send-ms', type=float, default=5, help='模擬每次寄送的延遲毫秒')
+    parser.add_argument('--sample-interval', type=float, default=0.5)
+    parser.add_argument('--json', help='將結果另存為 JSON 檔')
+    args = parser.parse_args()
+
+    # 不啟動 app 內建的寄送執行緒、不等待合併時間，由這裡控制寄送
+    os.environ['NOTIFY_WORKERS'] = '0'
+    os.environ['NOTIFY_COALESCE_SECONDS'] = '0'
+    workdir = args.workdir or tempfile.mkdtemp(prefix='bench_notify_')
+    os.makedirs(workdir, exist_ok=True)
+    badminton = seed_data.load_app(workdir)
+    seed_data.seed(badminton, args.users, args.teams, args.members_per_team, 0, 0)
+
+    timings, queued = enqueue_messages(badminton, args.teams, args.users, args.messages, random_seed=2)
+    stats, elapsed, samples, remaining = drain(badminton, args.workers, args.batch_size, args.send_ms / 1000,
+                                               args.sample_interval)
+    report = {
+        'enqueue_ms': {
+            'mean': round(statistics.mean(timings) * 1000, 3),
+            'p50': round(percentile(timings, 0.5) * 1000, 3),
+            'p95': round(percentile(timings, 0.95) * 1000, 3),
+        },
+        'notifications_queued': queued,
+        'drain': {
+            'workers': args.workers,
+            'elapsed_seconds': round(elapsed, 2),
+            'notifications_per_second': round(stats.get('notifications', 0) / elapsed, 1) if elapsed else None,
+            'sends': stats.get('deliveries', 0),
+            'notifications_per_send': round(stats.get('notifications', 0) / max(stats.get('deliveries', 0), 1), 2),
+            'batches': stats.get('batches', 0),
+            'remaining_backlog': remaining,
+        },
+        'backlog_samples': samples,
+        'database': os.path.abspath(badminton.DB_PATH),
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    if os.path.exists('/data'):
+        sys.exit('偵測到 /data（正式環境），請勿在此執行壓力測試')
+    main()
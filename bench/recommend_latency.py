@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""隊伍推薦計分延遲測試：以合成資料建立特徵陣列，量測整批建立、增量更新與排名的時間。
+
+不需要資料庫，直接測試 team_recommender.TeamRecommender。
+
+用法：python bench/recommend_latency.py --teams 50000 --runs 50
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from team_recommender import TeamRecommender, TeamRow
+
+CITIES = ['台北市', '新北市', '桃園市', '台中市', '台南市', '高雄市', '基隆市', '新竹市']
+
+
+def make_rows(count, rng, first_id=1):
+    now = datetime.utcnow()
+    rows = []
+    for team_id in range(first_id, first_id + count):
+        start = now + timedelta(days=rng.randint(1, 30), hours=rng.randint(0, 23))
+        capacity = rng.randint(2, 4)
+        members = rng.randint(0, capacity)
+        rows.append(TeamRow(team_id, start, start + timedelta(hours=rng.choice([1, 2, 3])), rng.choice(CITIES),
+                            capacity, rng.randint(1, 18), members, sum(rng.randint(1, 18) for _ in range(members))))
+    return rows
+
+
+def timed(fn, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return {'median_ms': round(statistics.median(samples), 2), 'max_ms': round(max(samples), 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='隊伍推薦計分延遲測試')
+    parser.add_argument('--teams', type=int, default=50000)
+    parser.add_argument('--runs', type=int, default=50)
+    parser.add_argument('--changed', type=int, default=20, help='每次增量更新異動的隊伍數')
+    parser.add_argument('--json', help='將結果另存為 JSON 檔')
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    rows = make_rows(args.teams, rng)
+    by_id = {row.id: row for row in rows}
+    recommender = TeamRecommender()
+
+    started = time.perf_counter()
+    recommender.sync(0, 0, lambda after, until: [], lambda team_ids: rows)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    event_id = [0]
+
+    def incremental():
+        changed = rng.sample(list(by_id), args.changed)
+        event_id[0] += 1
+        recommender.sync(0, event_id[0], lambda after, until: changed,
+                         lambda team_ids: [by_id[team_id]._replace(member_count=0, member_skill_sum=0)
+                                           for team_id in team_ids])
+
+    exclude = rng.sample(list(by_id), 10)
+    report = {
+        'teams': args.teams,
+        'full_build_ms': round(build_ms, 1),
+        'incremental_sync': timed(incremental, args.runs),
+        'rank_top20': timed(lambda: recommender.rank(8, '台北市', '晚上', limit=20, exclude=exclude), args.runs),
+        'rank_top100': timed(lambda: recommender.rank(8, '台北市', '皆可', limit=100), args.runs),
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
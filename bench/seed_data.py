@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""產生測試資料：以 executemany 批次寫入大量使用者、隊伍、成員、留言與取消紀錄。
+
+資料庫建立在指定的工作目錄（預設為新的暫存目錄），之後可交給 bench/load_routes.py
+或以該目錄啟動 gunicorn 進行壓力測試。所有使用者的密碼都是 --password。
+
+用法：python bench/seed_data.py --workdir /tmp/badminton_seed --users 20000 --teams 10000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CITIES = ['台北市', '新北市', '桃園市', '台中市', '台南市', '高雄市', '基隆市', '新竹市']
+# 各城市中心座標，球場散布在中心附近約 ±0.1 度
+CITY_CENTERS = {
+    '台北市': (25.04, 121.56), '新北市': (25.01, 121.46), '桃園市': (24.99, 121.30), '台中市': (24.15, 120.67),
+    '台南市': (22.99, 120.21), '高雄市': (22.63, 120.30), '基隆市': (25.13, 121.74), '新竹市': (24.80, 120.97),
+}
+VENUES = ['中正運動中心', '大安運動中心', '新莊體育館', '板橋體育館', '市立羽球館', '國民運動中心', '社區活動中心']
+ACTIVITY_TYPES = ['單打', '雙打', '混雙', '練習']
+TIMES = ['早上', '下午', '晚上', '皆可']
+MESSAGES = ['還有位子嗎？', '我會準時到', '請問要自備球嗎', '場地費平分', '新手可以參加嗎', '今天會晚十分鐘到']
+
+BATCH_SIZE = 5000
+DEFAULT_PASSWORD = 'bench-password'
+
+
+def load_app(workdir):
+    # app.py 以目前目錄決定資料庫位置，切到工作目錄以免動到開發用資料庫
+    os.chdir(workdir)
+    sys.path.insert(0, ROOT)
+    os.environ.setdefault('SECRET_KEY', 'bench-seed-data')
+    import app as badminton
+    badminton.app.logger.disabled = True
+    return badminton
+
+
+def insert_rows(db, table, rows):
+    """分批 executemany 寫入，回傳筆數。"""
+    total = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            db.session.execute(table.insert(), batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        db.session.execute(table.insert(), batch)
+        total += len(batch)
+    return total
+
+
+def seed(badminton, users, teams, members_per_team, messages_per_team, cancellations,
+         password=DEFAULT_PASSWORD, random_seed=1):
+    """寫入測試資料，回傳各資料表筆數與耗時。資料庫必須是空的。"""
+    app, db = badminton.app, badminton.db
+    rng = random.Random(random_seed)
+    now = datetime.utcnow()
+    started = time.perf_counter()
+    counts = {}
+    with app.app_context():
+        if db.session.execute(db.select(db.func.count(badminton.User.id))).scalar():
+            raise RuntimeError('資料庫已有使用者，請指定新的 --workdir')
+        # 雜湊刻意設計得很慢，所有使用者共用同一組密碼雜湊
+        password_hash = badminton.password_hasher.hash(password)
+
+        counts['user'] = insert_rows(db, badminton.User.__table__, ({
+            'id': user_id, 'username': f'bench{user_id}', 'password_hash': password_hash,
+            'nickname': f'球友{user_id}', 'phone': f'09{user_id % 100000000:08d}', 'gender': rng.choice(['男', '女']),
+            'experience_years': rng.randint(0, 20), 'preferred_position': rng.choice(['前場', '後場', '不限']),
+            'skill_level': rng.randint(1, 18), 'play_style': rng.choice(['單打', '雙打', '都可以']),
+            'preferred_time': rng.choice(TIMES), 'contact': f'line:bench{user_id}',
+            'preferred_region': rng.choice(CITIES), 'notification_enabled': True,
+        } for user_id in range(1, users + 1)))
+
+        venue_rows = [{
+            'id': venue_id, 'city': city, 'name': name, 'address': f'{city}{name}',
+            'latitude': round(CITY_CENTERS[city][0] + rng.uniform(-0.1, 0.1), 6),
+            'longitude': round(CITY_CENTERS[city][1] + rng.uniform(-0.1, 0.1), 6), 'created_at': now,
+        } for venue_id, (city, name) in enumerate(((city, name) for city in CITIES for name in VENUES), start=1)]
+        counts['venue'] = insert_rows(db, badminton.Venue.__table__, venue_rows)
+        venues_by_key = {(row['city'], row['name']): row for row in venue_rows}
+
+        team_rows = []
+        for team_id in range(1, teams + 1):
+            city, venue = rng.choice(CITIES), rng.choice(VENUES)
+            venue_row = venues_by_key[(city, venue)]
+            start = (now + timedelta(days=rng.randint(2, 30), hours=rng.randint(0, 23))).replace(minute=0, second=0, microsecond=0)
+            team_rows.append({
+                'id': team_id, 'name': f'{city}{venue}{rng.choice(ACTIVITY_TYPES)}團 #{team_id}',
+                'organizer_id': rng.randint(1, users), 'location_city': city, 'location_venue': venue,
+                'location_address': f'{city}測試路{rng.randint(1, 500)}號', 'activity_type': rng.choice(ACTIVITY_TYPES),
+                'start_time': start, 'end_time': start + timedelta(hours=rng.choice([1, 2, 3])),
+                'max_participants': rng.randint(2, 4), 'description': f'{venue}固定場，歡迎{rng.choice(TIMES)}有空的球友',
+                'created_at': now - timedelta(minutes=rng.randint(0, 60 * 24 * 14)),
+                'venue_id': venue_row['id'], 'latitude': venue_row['latitude'], 'longitude': venue_row['longitude'],
+                **badminton.team_slots.slot_columns(start),
+                **badminton.team_geo.geo_columns(venue_row['latitude'], venue_row['longitude']),
+            })
+        counts['team'] = insert_rows(db, badminton.Team.__table__, team_rows)
+
+        def member_rows():
+            for team in team_rows:
+                for index, user_id in enumerate(rng.sample(range(1, users + 1), min(members_per_team, users))):
+                    yield {'team_id': team['id'], 'user_id': user_id, 'is_waitlist': index >= team['max_participants'],
+                           'joined_at': team['created_at'] + timedelta(minutes=index + 1),
+                           'team_start': team['start_time'], 'team_end': team['end_time']}
+        counts['team_member'] = insert_rows(db, badminton.TeamMember.__table__, member_rows())
+
+        counts['team_message'] = insert_rows(db, badminton.TeamMessage.__table__, ({
+            'team_id': team['id'], 'user_id': rng.randint(1, users), 'message': rng.choice(MESSAGES),
+            'is_public': rng.random() > 0.1, 'created_at': team['created_at'] + timedelta(minutes=10 + index),
+        } for team in team_rows for index in range(messages_per_team)))
+
+        counts['cancellation'] = insert_rows(db, badminton.Cancellation.__table__, ({
+            'user_id': rng.randint(1, users), 'team_id': rng.randint(1, teams),
+            'hours_before_event': round(rng.uniform(0, 72), 1),
+            'cancelled_at': now - timedelta(minutes=rng.randint(0, 60 * 24 * 30)),
+        } for _ in range(cancellations)))
+
+        # 批次寫入不經過 ORM 事件，時段與網格欄位已在上面算好，全文檢索索引需另外重建
+        connection = db.session.connection()
+        team_search = badminton.team_search
+        team_search.install(connection)
+        columns = db.select(badminton.Team.id, badminton.Team.name, badminton.Team.location_venue,
+                            badminton.Team.location_address, badminton.Team.description)
+        counts['team_fts'] = team_search.rebuild(connection, db.session.execute(columns))
+        badminton.bump_cache_version('teams')
+        badminton.bump_cache_version('profiles')
+        db.session.commit()
+    elapsed = time.perf_counter() - started
+    return {
+        'rows': counts,
+        'elapsed_seconds': round(elapsed, 2),
+        'rows_per_second': round(sum(counts.values()) / elapsed, 1) if elapsed else None,
+    }
+
+
+def add_arguments(parser):
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--teams', type=int, default=2000)
+    parser.add_argument('--members-per-team', type=int, default=3, help='超過人數上限的部分列為候補')
+    parser.add_argument('--messages-per-team', type=int, default=10)
+    parser.add_argument('--cancellations', type=int, default=2000)
+    parser.add_argument('--password', default=DEFAULT_PASSWORD)
+    parser.add_argument('--seed', type=int, default=1, help='亂數種子，相同參數產生相同資料')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='產生壓力測試資料')
+    parser.add_argument('--workdir', help='資料庫所在目錄（預設建立新的暫存目錄）')
+    add_arguments(parser)
+    parser.add_argument('--json', help='將結果另存為 JSON 檔')
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='bench_seed_')
+    os.makedirs(workdir, exist_ok=True)
+    badminton = load_app(workdir)
+    report = seed(badminton, args.users, args.teams, args.members_per_team, args.messages_per_team,
+                  args.cancellations, password=args.password, random_seed=args.seed)
+    report['database'] = os.path.abspath(badminton.DB_PATH)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    if os.path.exists('/data'):
+        sys.exit('偵測到 /data（正式環境），請勿在此產生測試資料')
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""SQLite 寫入吞吐量比較：以不同 SQLITE_PROFILE 執行相同的讀寫混合負載。
+
+每個設定檔各用一個暫存目錄與全新資料庫，以多個行程（模擬 gunicorn worker）
+各開多條執行緒，同時送出留言（寫入 team_message 與 team_event）與讀取留言，
+統計寫入吞吐量、延遲與 "database is locked" 等失敗次數。
+
+用法：python bench/sqlite_write_throughput.py --profiles legacy production --requests 4000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from multiprocessing import get_context
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_app(workdir):
+    # app.py 以目前目錄決定資料庫位置，切到暫存目錄以免動到開發用資料庫
+    os.chdir(workdir)
+    sys.path.insert(0, ROOT)
+    os.environ.setdefault('SECRET_KEY', 'bench-sqlite-write')
+    import app as badminton
+    badminton.app.logger.disabled = True
+    return badminton
+
+
+def seed(args):
+    workdir, teams, users = args
+    badminton = load_app(workdir)
+    app, db = badminton.app, badminton.db
+    start = datetime.utcnow() + timedelta(days=3)
+    with app.app_context():
+        db.session.execute(db.insert(badminton.User), [{
+            'username': f'bench{i}', 'password_hash': '-', 'nickname': f'bench{i}', 'phone': '0900000000',
+            'gender': '男', 'experience_years': 1, 'preferred_position': '不限', 'skill_level': 5,
+            'play_style': '雙打', 'preferred_time': '晚上', 'contact': '-', 'preferred_region': '台北市',
+        } for i in range(users)])
+        db.session.execute(db.insert(badminton.Team), [{
+            'name': f'bench team {i}', 'organizer_id': 1, 'location_city': '台北市',
+            'location_venue': 'bench', 'location_address': '-', 'activity_type': '雙打',
+            'start_time': start, 'end_time': start + timedelta(hours=2), 'max_participants': 8,
+        } for i in range(teams)])
+        db.session.commit()
+        with db.engine.connect() as connection:
+            return badminton.SQLITE_PROFILE, badminton.sqlite_profile.current_settings(connection)
+
+
+def run_chunk(args):
+    workdir, jobs, threads = args
+    badminton = load_app(workdir)
+    app = badminton.app
+
+    def request_once(job):
+        kind, team_id, user_id = job
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = user_id
+        started = time.perf_counter()
+        try:
+            if kind == 'write':
+                response = client.post(f'/team/{team_id}/messages', json={'message': 'bench', 'is_public': True})
+            else:
+                response = client.get(f'/team/{team_id}/messages')
+            status = response.status_code
+        except Exception as e:
+            status = type(e).__name__
+        return kind, status, time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return list(pool.map(request_once, jobs))
+
+
+def count_messages(workdir):
+    badminton = load_app(workdir)
+    with badminton.app.app_context():
+        return badminton.db.session.execute(badminton.db.select(badminton.func.count(badminton.TeamMessage.id))).scalar()
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * fraction))] * 1000, 1)
+
+
+def run_profile(profile, args):
+    os.environ['SQLITE_PROFILE'] = profile
+    workdir = tempfile.mkdtemp(prefix=f'bench_sqlite_{profile}_')
+    ctx = get_context('spawn')
+    with ctx.Pool(1) as pool:
+        name, settings = pool.apply(seed, ((workdir, args.teams, args.users),))
+
+    rng = random.Random(args.seed)
+    jobs = [('write' if rng.random() >= args.read_ratio else 'read', rng.randint(1, args.teams), rng.randint(1, args.users))
+            for _ in range(args.requests)]
+    chunks = [jobs[i::args.processes] for i in range(args.processes)]
+
+    with ctx.Pool(args.processes) as pool:
+        started = time.perf_counter()
+        results = [r for chunk in pool.map(run_chunk, [(workdir, c, args.threads) for c in chunks]) for r in chunk]
+        elapsed = time.perf_counter() - started
+        stored = pool.apply(count_messages, (workdir,))
+
+    writes = [r for r in results if r[0] == 'write']
+    write_ok = [latency for kind, status, latency in writes if status == 200]
+    return {
+        'profile': name,
+        'pragmas': settings,
+        'requests': len(results),
+        'elapsed_seconds': round(elapsed, 3),
+        'writes_per_second': round(len(write_ok) / elapsed, 1),
+        'requests_per_second': round(len(results) / elapsed, 1),
+        'write_p50_ms': percentile(write_ok, 0.5),
+        'write_p95_ms': percentile(write_ok, 0.95),
+        'outcomes': {f'{kind} {status}': count for (kind, status), count in Counter((k, s) for k, s, _ in results).items()},
+        'failed_writes': len(writes) - len(write_ok),
+        'stored_messages': stored,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SQLite 設定檔寫入吞吐量比較')
+    parser.add_argument('--profiles', nargs='+', default=['legacy', 'production'])
+    parser.add_argument('--requests', type=int, default=4000)
+    parser.add_argument('--read-ratio', type=float, default=0.5, help='讀取請求所佔比例')
+    parser.add_argument('--teams', type=int, default=20)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='將結果另存為 JSON 檔')
+    args = parser.parse_args()
+
+    reports = [run_profile(profile, args) for profile in args.profiles]
+    print(json.dumps(reports, ensure_ascii=False, indent=2))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    if os.path.exists('/data'):
+        sys.exit('偵測到 /data（正式環境），請勿在此執行壓力測試')
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""啟動時間測試：量測每個 gunicorn worker 載入 app.py 所需的時間。
+
+每次都開一個新的 Python 行程匯入 app（與未使用 --preload 的 worker 相同），
+分別測試全新資料庫（第一次部署）與已存在的資料庫（一般重啟、擴充 worker）。
+
+用法：python bench/startup_time.py --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_APP = (
+    'import sys, time\n'
+    f'sys.path.insert(0, {ROOT!r})\n'
+    'started = time.perf_counter()\n'
+    'import app\n'
+    'print(time.perf_counter() - started)\n'
+)
+
+
+def boot_once(workdir):
+    env = dict(os.environ, SECRET_KEY=os.environ.get('SECRET_KEY', 'bench-startup'))
+    # app.py 以目前目錄決定資料庫位置，在暫存目錄執行以免動到開發用資料庫
+    result = subprocess.run([sys.executable, '-c', IMPORT_APP], cwd=workdir, env=env,
+                            capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def summarize(samples):
+    return {
+        'runs': len(samples),
+        'min_ms': round(min(samples) * 1000, 1),
+        'median_ms': round(statistics.median(samples) * 1000, 1),
+        'max_ms': round(max(samples) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='app.py 啟動時間測試')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--json', help='將結果另存為 JSON 檔')
+    args = parser.parse_args()
+
+    cold = []
+    for _ in range(args.runs):
+        cold.append(boot_once(tempfile.mkdtemp(prefix='bench_startup_')))
+    workdir = tempfile.mkdtemp(prefix='bench_startup_')
+    boot_once(workdir)
+    warm = [boot_once(workdir) for _ in range(args.runs)]
+
+    report = {'fresh_database': summarize(cold), 'existing_database': summarize(warm)}
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    if os.path.exists('/data'):
+        sys.exit('偵測到 /data（正式環境），請勿在此執行測試')
+    main()
@@ -0,0 +1,130 @@
+"""隊伍封面圖：上傳內容邊讀邊寫入暫存檔並計算 SHA-256，以雜湊值為檔名存放，
+相同的圖片只存一份；上傳當下先產生各尺寸的縮圖，之後讀取只需送出現成的檔案。
+
+目錄結構：<root>/covers/<雜湊前 2 碼>/<雜湊>.<副檔名>，縮圖為 <雜湊>_<尺寸>.jpg。
+原圖最後才移入定位，原圖存在即代表縮圖都已產生完成。
+"""
+import hashlib
+import os
+import re
+import uuid
+
+from PIL import Image, ImageOps
+
+CHUNK_SIZE = 64 * 1024
+MAX_PIXELS = 40_000_000  # 解碼前先檢查像素數，避免壓縮炸彈
+
+# 依檔頭判斷格式，不相信用戶端宣告的 Content-Type
+SIGNATURES = (
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+)
+MIME_TYPES = {'jpg': 'image/jpeg', 'png': 'image/png', 'gif': 'image/gif', 'webp': 'image/webp'}
+
+# 縮圖名稱 -> 最大寬度；一律輸出 JPEG
+VARIANTS = {'thumb': 160, 'card': 640, 'large': 1280}
+VARIANT_QUALITY = 82
+
+# <雜湊>.<副檔名> 或 <雜湊>_<尺寸>.jpg
+FILE_NAME = re.compile(r'^([0-9a-f]{64})(?:_(thumb|card|large))?\.(jpg|png|gif|webp)$')
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+class ImageTooLarge(ValueError):
+    pass
+
+
+def sniff_format(head):
+    for signature, extension in SIGNATURES:
+        if head.startswith(signature):
+            return extension
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+def cover_dir(root, digest):
+    return os.path.join(root, 'covers', digest[:2])
+
+
+def file_name(digest, extension, variant=None):
+    return f'{digest}_{variant}.jpg' if variant else f'{digest}.{extension}'
+
+
+def resolve(root, name):
+    """檔名轉為 (路徑, MIME 類型)；格式不符時回傳 None，避免路徑穿越。"""
+    match = FILE_NAME.match(name)
+    if not match:
+        return None
+    digest, variant, extension = match.groups()
+    if variant and extension != 'jpg':
+        return None
+    return os.path.join(cover_dir(root, digest), name), MIME_TYPES[extension]
+
+
+def write_variants(source_path, directory, digest):
+    """產生各尺寸縮圖；無法解碼時丟出 InvalidImage。"""
+    try:
+        with Image.open(source_path) as image:
+            if image.width * image.height > MAX_PIXELS:
+                raise InvalidImage('圖片尺寸過大')
+            widest = max(VARIANTS.values())
+            # JPEG 可直接以較低解析度解碼，大圖省下大部分解碼時間與記憶體
+            image.draft('RGB', (widest, max(widest * image.height // max(image.width, 1), 1)))
+            image = ImageOps.exif_transpose(image).convert('RGB')
+            for variant, width in sorted(VARIANTS.items(), key=lambda item: -item[1]):
+                if image.width > width:
+                    size = (width, max(width * image.height // image.width, 1))
+                    image.thumbnail(size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+                path = os.path.join(directory, file_name(digest, None, variant))
+                temp_path = f'{path}.{uuid.uuid4().hex}.part'
+                image.save(temp_path, 'JPEG', quality=VARIANT_QUALITY, optimize=True, progressive=True)
+                os.replace(temp_path, path)
+    except (OSError, Image.DecompressionBombError) as exc:
+        raise InvalidImage(str(exc)) from exc
+
+
+def store(stream, root, max_bytes, chunk_size=CHUNK_SIZE):
+    """從 stream 分段讀取並寫入暫存檔，回傳 (雜湊, 副檔名, 位元組數, 是否為新檔案)。
+
+    超過 max_bytes 時丟出 ImageTooLarge，不是支援的圖片格式時丟出 InvalidImage；無論成功與否都會刪除暫存檔。
+    """
+    temp_dir = os.path.join(root, 'tmp')
+    os.makedirs(temp_dir, exist_ok=True)
+    temp_path = os.path.join(temp_dir, f'{uuid.uuid4().hex}.part')
+    digest = hashlib.sha256()
+    size = 0
+    head = b''
+    try:
+        with open(temp_path, 'wb') as f:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ImageTooLarge(max_bytes)
+                if len(head) < 16:
+                    head += chunk[:16]
+                digest.update(chunk)
+                f.write(chunk)
+        extension = sniff_format(head)
+        if extension is None:
+            raise InvalidImage('不支援的圖片格式')
+        digest = digest.hexdigest()
+        directory = cover_dir(root, digest)
+        final_path = os.path.join(directory, file_name(digest, extension))
+        if os.path.exists(final_path):
+            return digest, extension, size, False
+        os.makedirs(directory, exist_ok=True)
+        write_variants(temp_path, directory, digest)
+        os.replace(temp_path, final_path)
+        return digest, extension, size, True
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
@@ -0,0 +1,130 @@
+import logging
+import queue
+import threading
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """單一 SSE 連線的事件佇列。
+
+    last_id 之前的事件會被略過，因此 hub 為了補送而重讀舊事件時不會重複推送。
+    消化太慢而塞滿時標記為 overflowed，由串流結束連線，
+    讓瀏覽器以 Last-Event-ID 重新連線並從事件表補齊。
+    """
+
+    def __init__(self, team_id, last_id, maxsize=1000):
+        self.team_id = team_id
+        self.last_id = last_id
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def push(self, event):
+        if event.id <= self.last_id:
+            return
+        try:
+            self.queue.put_nowait(event)
+            self.last_id = event.id
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout):
+        return self.queue.get(timeout=timeout)
+
+
+class EventHub:
+    """每個 worker 一個背景執行緒輪詢事件表，再分送給本 worker 的訂閱者。
+
+    fetch_events(last_id) 回傳 id 大於 last_id 的事件（依 id 排序，需有 id 與
+    team_id 屬性）。不論有多少連線，每個 worker 每個輪詢週期只查詢一次；
+    無人訂閱時執行緒停止輪詢。max_subscribers 限制同時訂閱的連線數（None 表示不限制）。
+    """
+
+    def __init__(self, fetch_events, interval=0.5, max_subscribers=None):
+        self.fetch_events = fetch_events
+        self.interval = interval
+        self.max_subscribers = max_subscribers
+        self._count = 0
+        self.rejected = 0
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._last_id = None
+        self._rewind_to = None
+
+    def subscribe(self, team_id, since_id):
+        """訂閱 team_id 在 since_id 之後的事件；連線數已達上限時回傳 None。"""
+        subscription = Subscription(team_id, since_id)
+        with self._lock:
+            if self.max_subscribers is not None and self._count >= self.max_subscribers:
+                self.rejected += 1
+                return None
+            self._subscribers[team_id].add(subscription)
+            self._count += 1
+            # 新連線需要 since_id 之後的事件，必要時讓輪詢往回補讀
+            if self._rewind_to is None or since_id < self._rewind_to:
+                self._rewind_to = since_id
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='team-event-hub', daemon=True)
+                self._thread.start()
+            # 在鎖內喚醒：_next_start 也在鎖內清除，喚醒不會在清除與等待之間遺失
+            self._wakeup.set()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.team_id)
+            if subscribers is not None and subscription in subscribers:
+                subscribers.discard(subscription)
+                self._count -= 1
+                if not subscribers:
+                    del self._subscribers[subscription.team_id]
+
+    def subscriber_count(self):
+        with self._lock:
+            return self._count
+
+    def _next_start(self):
+        with self._lock:
+            # 先清除再檢查訂閱者；之後才訂閱的連線會重新喚醒，等待會立刻返回
+            self._wakeup.clear()
+            if not self._subscribers:
+                self._last_id = None
+                self._rewind_to = None
+                return None
+            start = self._last_id
+            if self._rewind_to is not None and (start is None or self._rewind_to < start):
+                start = self._rewind_to
+            self._rewind_to = None
+            return start
+
+    def _run(self):
+        while True:
+            start = self._next_start()
+            if start is None:
+                self._wakeup.wait()
+                continue
+            last_id = start
+            try:
+                for event in self.fetch_events(start):
+                    last_id = event.id
+                    self._dispatch(event)
+            except Exception:
+                logger.exception('讀取事件失敗')
+            with self._lock:
+                if self._last_id is None or last_id >= self._last_id:
+                    self._last_id = last_id
+                elif last_id > start:
+                    # 補讀尚未追上（單次讀取有筆數上限），下一輪從這裡繼續
+                    if self._rewind_to is None or last_id < self._rewind_to:
+                        self._rewind_to = last_id
+                    continue
+            self._wakeup.wait(self.interval)
+
+    def _dispatch(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(event.team_id, ()))
+        for subscription in subscribers:
+            subscription.push(event)
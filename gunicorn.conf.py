@@ -0,0 +1,23 @@
+import os
+
+# SSE 串流（/team/<id>/events）會長時間佔用一個連線，
+# 使用 gthread 讓每個串流只佔一條執行緒而不是整個 worker。
+# 容量：每個 worker 最多 SSE_MAX_STREAMS（預設 48）條執行緒給串流，其餘 GUNICORN_THREADS - SSE_MAX_STREAMS
+# （預設 16）條保留給一般請求；超過上限的串流回 503，頁面改用輪詢。同時觀看的人數較多時，
+# 增加 WEB_CONCURRENCY 或同時調高 GUNICORN_THREADS 與 SSE_MAX_STREAMS（每條閒置執行緒約佔數十 KB 記憶體）。
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 64))
+# 串流本身每 15 秒送一次 heartbeat，逾時需大於此值
+timeout = 60
+
+# GUNICORN_PRELOAD=1 時由 master 匯入 app（含 schema 檢查）一次，worker 直接 fork，
+# 啟動與擴充 worker 都更快；fork 前開啟的 SQLite 連線不可沿用，需在 worker 中捨棄
+preload_app = os.environ.get('GUNICORN_PRELOAD', '0') == '1'
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from app import app, db
+        with app.app_context():
+            db.engine.dispose(close=False)
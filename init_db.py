@@ -6,7 +6,9 @@ import sys
 os.environ['SECRET_KEY'] = 'badminton_secret_key_2024'
 
 # 导入应用
-from app import app, db
+from app import app, db, init_migrate, SCHEMA_VERSION
+import team_search
+from flask_migrate import stamp
 
 def init_database():
     """初始化数据库"""
@@ -18,6 +20,11 @@ def init_database():
             
             # 创建所有表
             db.create_all()
+            with db.engine.begin() as connection:
+                team_search.install(connection)
+            # 标记为最新 schema 版本，启动时才不会再执行升级
+            init_migrate()
+            stamp(revision=SCHEMA_VERSION)
             print("已创建所有数据表")
             
             # 检查数据库文件是否存在
@@ -0,0 +1,55 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class VersionedLRUCache:
+    """有容量上限與 TTL 的 LRU 快取，資料版本號改變時整批失效。
+
+    版本號由外部提供（例如存在資料庫中的計數器），因此多個 gunicorn
+    worker 各自持有的快取在任一 worker 寫入後都會一併失效。
+    """
+
+    def __init__(self, maxsize=256, ttl=30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._version = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, version, value):
+        with self._lock:
+            if version != self._version:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'version': self._version,
+            }
@@ -0,0 +1,35 @@
+"""add hot path indexes
+
+Revision ID: 3f1a9c2d7b10
+Revises: 
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1a9c2d7b10'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+# 資料表由 db.create_all() 建立，新資料庫已含這些索引，因此使用 if_not_exists
+def upgrade():
+    op.create_index('ix_team_start_time', 'team', ['start_time', 'id'], if_not_exists=True)
+    op.create_index('ix_team_end_time', 'team', ['end_time'], if_not_exists=True)
+    op.create_index('ix_team_created_at', 'team', ['created_at', 'id'], if_not_exists=True)
+    op.create_index('ix_team_member_team_waitlist', 'team_member', ['team_id', 'is_waitlist', 'joined_at'], if_not_exists=True)
+    op.create_index('ix_team_member_user', 'team_member', ['user_id', 'team_id'], if_not_exists=True)
+    op.create_index('ix_team_message_team_public_created', 'team_message', ['team_id', 'is_public', 'created_at'], if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_team_message_team_public_created', table_name='team_message', if_exists=True)
+    op.drop_index('ix_team_member_user', table_name='team_member', if_exists=True)
+    op.drop_index('ix_team_member_team_waitlist', table_name='team_member', if_exists=True)
+    op.drop_index('ix_team_created_at', table_name='team', if_exists=True)
+    op.drop_index('ix_team_end_time', table_name='team', if_exists=True)
+    op.drop_index('ix_team_start_time', table_name='team', if_exists=True)
@@ -0,0 +1,27 @@
+"""index team messages by id
+
+Revision ID: 5b7d9e1f3a24
+Revises: c2d8f4a6e913
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b7d9e1f3a24'
+down_revision = 'c2d8f4a6e913'
+branch_labels = None
+depends_on = None
+
+
+# 留言改以 id 分頁；(team_id, is_public) 索引隱含 rowid，可直接依 id 排序
+def upgrade():
+    op.create_index('ix_team_message_team_public', 'team_message', ['team_id', 'is_public'], if_not_exists=True)
+    op.drop_index('ix_team_message_team_public_created', table_name='team_message', if_exists=True)
+
+
+def downgrade():
+    op.create_index('ix_team_message_team_public_created', 'team_message', ['team_id', 'is_public', 'created_at'], if_not_exists=True)
+    op.drop_index('ix_team_message_team_public', table_name='team_message', if_exists=True)
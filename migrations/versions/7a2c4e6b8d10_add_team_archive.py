@@ -0,0 +1,49 @@
+"""add team archive and cancellation team index
+
+Revision ID: 7a2c4e6b8d10
+Revises: d4f6a8b0c2e5
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a2c4e6b8d10'
+down_revision = 'd4f6a8b0c2e5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'team_archive',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('team_id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('organizer_id', sa.Integer(), nullable=False),
+        sa.Column('location_city', sa.String(length=50), nullable=False),
+        sa.Column('location_venue', sa.String(length=100), nullable=False),
+        sa.Column('activity_type', sa.String(length=50), nullable=False),
+        sa.Column('start_time', sa.DateTime(), nullable=False),
+        sa.Column('end_time', sa.DateTime(), nullable=False),
+        sa.Column('max_participants', sa.Integer(), nullable=True),
+        sa.Column('member_count', sa.Integer(), nullable=False),
+        sa.Column('waitlist_count', sa.Integer(), nullable=False),
+        sa.Column('message_count', sa.Integer(), nullable=False),
+        sa.Column('members', sa.Text(), nullable=False),
+        sa.Column('cancellations', sa.Text(), nullable=False),
+        sa.Column('archived_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        if_not_exists=True
+    )
+    op.create_index('ix_team_archive_team_id', 'team_archive', ['team_id'], if_not_exists=True)
+    # 清理時依 team_id 刪除取消紀錄
+    op.create_index('ix_cancellation_team', 'cancellation', ['team_id'], if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_cancellation_team', table_name='cancellation', if_exists=True)
+    op.drop_index('ix_team_archive_team_id', table_name='team_archive', if_exists=True)
+    op.drop_table('team_archive', if_exists=True)
@@ -0,0 +1,30 @@
+"""add cache version
+
+Revision ID: 8c4e2b6a1d35
+Revises: 3f1a9c2d7b10
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c4e2b6a1d35'
+down_revision = '3f1a9c2d7b10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'cache_version',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('name'),
+        if_not_exists=True
+    )
+
+
+def downgrade():
+    op.drop_table('cache_version', if_exists=True)
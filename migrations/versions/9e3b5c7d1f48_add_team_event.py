@@ -0,0 +1,35 @@
+"""add team event log
+
+Revision ID: 9e3b5c7d1f48
+Revises: 5b7d9e1f3a24
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e3b5c7d1f48'
+down_revision = '5b7d9e1f3a24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'team_event',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('team_id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=20), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        if_not_exists=True
+    )
+    op.create_index('ix_team_event_team_id', 'team_event', ['team_id'], if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_team_event_team_id', table_name='team_event', if_exists=True)
+    op.drop_table('team_event', if_exists=True)
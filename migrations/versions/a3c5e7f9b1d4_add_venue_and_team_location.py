@@ -0,0 +1,56 @@
+"""add venue table and team coordinates with grid cell index
+
+Revision ID: a3c5e7f9b1d4
+Revises: f2b4d6e8a0c3
+Create Date: 2026-10-17 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c5e7f9b1d4'
+down_revision = 'f2b4d6e8a0c3'
+branch_labels = None
+depends_on = None
+
+
+COLUMNS = (
+    ('venue_id', sa.Integer()),
+    ('latitude', sa.Float()),
+    ('longitude', sa.Float()),
+    ('geo_cell', sa.Integer()),
+)
+
+
+def upgrade():
+    op.create_table(
+        'venue',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('city', sa.String(length=50), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('address', sa.String(length=200), nullable=True),
+        sa.Column('latitude', sa.Float(), nullable=False),
+        sa.Column('longitude', sa.Float(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        if_not_exists=True
+    )
+    op.create_index('uq_venue_city_name', 'venue', ['city', 'name'], unique=True, if_not_exists=True)
+    # 直接 ALTER TABLE，不用 batch 模式重建資料表（重建會遺失全文檢索的刪除觸發器）；
+    # 既有隊伍沒有座標，之後以 flask import-venues 匯入球場座標回填
+    existing = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('team')}
+    for name, type_ in COLUMNS:
+        if name not in existing:
+            op.add_column('team', sa.Column(name, type_, nullable=True))
+    op.create_index('ix_team_geo', 'team', ['geo_cell', 'start_time', 'latitude', 'longitude', 'id'],
+                    if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_team_geo', table_name='team', if_exists=True)
+    for name, _ in reversed(COLUMNS):
+        op.drop_column('team', name)
+    op.drop_index('uq_venue_city_name', table_name='venue', if_exists=True)
+    op.drop_table('venue', if_exists=True)
@@ -0,0 +1,43 @@
+"""add notification outbox
+
+Revision ID: b5d7f9a1c3e6
+Revises: a3c5e7f9b1d4
+Create Date: 2026-10-17 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5d7f9a1c3e6'
+down_revision = 'a3c5e7f9b1d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'notification',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=20), nullable=False),
+        sa.Column('team_id', sa.Integer(), nullable=True),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('available_at', sa.DateTime(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('id'),
+        if_not_exists=True
+    )
+    # 認領時依到期順序挑收件者，再以 (user_id, available_at) 取出該收件者所有到期的通知
+    op.create_index('ix_notification_available', 'notification', ['available_at', 'id'], if_not_exists=True)
+    op.create_index('ix_notification_user', 'notification', ['user_id', 'available_at'], if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_notification_user', table_name='notification', if_exists=True)
+    op.drop_index('ix_notification_available', table_name='notification', if_exists=True)
+    op.drop_table('notification', if_exists=True)
@@ -0,0 +1,35 @@
+"""add team full-text search
+
+Revision ID: c2d8f4a6e913
+Revises: 8c4e2b6a1d35
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+import team_search
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2d8f4a6e913'
+down_revision = '8c4e2b6a1d35'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    connection = op.get_bind()
+    team_search.install(connection)
+    team = sa.table(
+        'team',
+        sa.column('id'), sa.column('name'), sa.column('location_venue'),
+        sa.column('location_address'), sa.column('description'),
+    )
+    teams = connection.execute(sa.select(team)).fetchall()
+    team_search.rebuild(connection, teams)
+
+
+def downgrade():
+    op.execute('DROP TRIGGER IF EXISTS team_fts_delete')
+    op.execute('DROP TABLE IF EXISTS team_fts')
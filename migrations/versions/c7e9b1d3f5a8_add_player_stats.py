@@ -0,0 +1,55 @@
+"""add incrementally maintained player reliability stats
+
+Revision ID: c7e9b1d3f5a8
+Revises: b5d7f9a1c3e6
+Create Date: 2026-10-17 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7e9b1d3f5a8'
+down_revision = 'b5d7f9a1c3e6'
+branch_labels = None
+depends_on = None
+
+
+def counter_columns():
+    return [
+        sa.Column('joined_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('played_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('cancellation_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('late_cancellation_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('notice_hours_total', sa.Float(), server_default='0', nullable=False),
+    ]
+
+
+def upgrade():
+    # 既有的紀錄升級後以 flask rebuild-player-stats 計算一次
+    op.create_table(
+        'user_stats',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        *counter_columns(),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('user_id'),
+        if_not_exists=True
+    )
+    op.create_table(
+        'user_stats_day',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        *counter_columns(),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('user_id', 'day'),
+        if_not_exists=True
+    )
+    op.create_index('ix_user_stats_day_day', 'user_stats_day', ['day'], if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_user_stats_day_day', table_name='user_stats_day', if_exists=True)
+    op.drop_table('user_stats_day', if_exists=True)
+    op.drop_table('user_stats', if_exists=True)
@@ -0,0 +1,29 @@
+"""unique team member per user
+
+Revision ID: d4f6a8b0c2e5
+Revises: 9e3b5c7d1f48
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4f6a8b0c2e5'
+down_revision = '9e3b5c7d1f48'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 先移除過去並發報名造成的重複資料，只保留最早的一筆
+    op.execute(
+        'DELETE FROM team_member WHERE id NOT IN '
+        '(SELECT min(id) FROM team_member GROUP BY team_id, user_id)'
+    )
+    op.create_index('uq_team_member_team_user', 'team_member', ['team_id', 'user_id'], unique=True, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('uq_team_member_team_user', table_name='team_member', if_exists=True)
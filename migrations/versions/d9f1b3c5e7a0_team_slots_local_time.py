@@ -0,0 +1,41 @@
+"""recompute team time slot columns in Taiwan time
+
+Revision ID: d9f1b3c5e7a0
+Revises: c7e9b1d3f5a8
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9f1b3c5e7a0'
+down_revision = 'c7e9b1d3f5a8'
+branch_labels = None
+depends_on = None
+
+
+# 先前的回填與寫入都直接以 start_time（UTC）判斷，時段差了 8 小時；依台灣時間重新計算
+# （規則與 team_slots.slot_columns 一致）
+BACKFILL = """
+UPDATE team SET
+    start_weekday = (CAST(strftime('%w', start_time, '+8 hours') AS INTEGER) + 6) % 7,
+    start_minute = CAST(strftime('%H', start_time, '+8 hours') AS INTEGER) * 60
+        + CAST(strftime('%M', start_time, '+8 hours') AS INTEGER),
+    time_slot = CASE
+        WHEN CAST(strftime('%H', start_time, '+8 hours') AS INTEGER) < 6 THEN '深夜'
+        WHEN CAST(strftime('%H', start_time, '+8 hours') AS INTEGER) < 12 THEN '早上'
+        WHEN CAST(strftime('%H', start_time, '+8 hours') AS INTEGER) < 18 THEN '下午'
+        ELSE '晚上'
+    END,
+    is_weekend = strftime('%w', start_time, '+8 hours') IN ('0', '6')
+"""
+
+
+def upgrade():
+    op.execute(BACKFILL)
+
+
+def downgrade():
+    # 舊版程式讀到台灣時間的欄位仍可運作，只是時段判斷與舊規則不同，不需還原
+    pass
@@ -0,0 +1,57 @@
+"""add precomputed team time slot columns
+
+Revision ID: e1a3c5b7d9f2
+Revises: 7a2c4e6b8d10
+Create Date: 2026-10-17 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1a3c5b7d9f2'
+down_revision = '7a2c4e6b8d10'
+branch_labels = None
+depends_on = None
+
+
+COLUMNS = (
+    ('start_weekday', sa.SmallInteger()),
+    ('start_minute', sa.SmallInteger()),
+    ('time_slot', sa.String(length=10)),
+    ('is_weekend', sa.Boolean()),
+)
+
+# 既有資料一次性回填，之後由 ORM 事件在寫入時維護（規則與 team_slots.slot_columns 一致：
+# start_time 為 UTC，換算成台灣時間後判斷）
+BACKFILL = """
+UPDATE team SET
+    start_weekday = (CAST(strftime('%w', start_time, '+8 hours') AS INTEGER) + 6) % 7,
+    start_minute = CAST(strftime('%H', start_time, '+8 hours') AS INTEGER) * 60
+        + CAST(strftime('%M', start_time, '+8 hours') AS INTEGER),
+    time_slot = CASE
+        WHEN CAST(strftime('%H', start_time, '+8 hours') AS INTEGER) < 6 THEN '深夜'
+        WHEN CAST(strftime('%H', start_time, '+8 hours') AS INTEGER) < 12 THEN '早上'
+        WHEN CAST(strftime('%H', start_time, '+8 hours') AS INTEGER) < 18 THEN '下午'
+        ELSE '晚上'
+    END,
+    is_weekend = strftime('%w', start_time, '+8 hours') IN ('0', '6')
+"""
+
+def upgrade():
+    # 直接 ALTER TABLE，不用 batch 模式重建資料表（重建會遺失全文檢索的刪除觸發器）
+    existing = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('team')}
+    for name, type_ in COLUMNS:
+        if name not in existing:
+            op.add_column('team', sa.Column(name, type_, nullable=True))
+    op.execute(BACKFILL)
+    op.create_index('ix_team_slot', 'team', ['time_slot', 'start_time', 'id', 'is_weekend'], if_not_exists=True)
+    op.create_index('ix_team_weekend', 'team', ['is_weekend', 'start_time', 'id'], if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_team_weekend', table_name='team', if_exists=True)
+    op.drop_index('ix_team_slot', table_name='team', if_exists=True)
+    for name, _ in reversed(COLUMNS):
+        op.drop_column('team', name)
@@ -0,0 +1,39 @@
+"""copy team times onto team members for schedule conflict checks
+
+Revision ID: f2b4d6e8a0c3
+Revises: e1a3c5b7d9f2
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2b4d6e8a0c3'
+down_revision = 'e1a3c5b7d9f2'
+branch_labels = None
+depends_on = None
+
+
+BACKFILL = """
+UPDATE team_member SET
+    team_start = (SELECT start_time FROM team WHERE team.id = team_member.team_id),
+    team_end = (SELECT end_time FROM team WHERE team.id = team_member.team_id)
+"""
+
+
+def upgrade():
+    existing = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('team_member')}
+    for name in ('team_start', 'team_end'):
+        if name not in existing:
+            op.add_column('team_member', sa.Column(name, sa.DateTime(), nullable=True))
+    op.execute(BACKFILL)
+    op.create_index('ix_team_member_schedule', 'team_member',
+                    ['user_id', 'team_start', 'team_end', 'team_id', 'is_waitlist'], if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_team_member_schedule', table_name='team_member', if_exists=True)
+    op.drop_column('team_member', 'team_end')
+    op.drop_column('team_member', 'team_start')
@@ -0,0 +1,53 @@
+"""never reuse team and team_event ids
+
+Revision ID: f4a6c8e0b2d3
+Revises: d9f1b3c5e7a0
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+import team_search
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4a6c8e0b2d3'
+down_revision = 'd9f1b3c5e7a0'
+branch_labels = None
+depends_on = None
+
+
+# 沒有 AUTOINCREMENT 時 SQLite 以 max(id) + 1 配發新 id，清理過期隊伍後刪掉的 id 會被重複使用：
+# 事件 id 倒退會讓 SSE 的 Last-Event-ID、推薦快取與片段快取誤以為沒有新事件。
+# SQLite 無法以 ALTER TABLE 加上 AUTOINCREMENT，只能重建資料表；重建 team 會一併刪除
+# 全文檢索的刪除觸發器，之後重新建立。
+def _rebuild(table, autoincrement):
+    with op.batch_alter_table(table, recreate='always',
+                              table_kwargs={'sqlite_autoincrement': autoincrement}):
+        pass
+
+
+def upgrade():
+    _rebuild('team_event', True)
+    _rebuild('team', True)
+    connection = op.get_bind()
+    team_search.install(connection)
+    # 已封存的隊伍可能用過比目前最大 id 更大的 id
+    archived = connection.execute(sa.text('SELECT max(team_id) FROM team_archive')).scalar()
+    if archived:
+        connection.execute(
+            sa.text("UPDATE sqlite_sequence SET seq = :seq WHERE name = 'team' AND seq < :seq"),
+            {'seq': archived}
+        )
+        connection.execute(
+            sa.text("INSERT INTO sqlite_sequence (name, seq) SELECT 'team', :seq "
+                    "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'team')"),
+            {'seq': archived}
+        )
+
+
+def downgrade():
+    _rebuild('team', False)
+    _rebuild('team_event', False)
+    team_search.install(op.get_bind())
@@ -0,0 +1,143 @@
+"""通知寄件匣：觸發通知的寫入只在同一個 transaction 裡新增 notification 列，
+實際寄送交給背景執行緒，不增加請求的延遲。
+
+每個執行緒反覆認領一批到期的通知：先依到期順序挑出收件者，再一次認領這些收件者所有到期的通知，
+同一收件者的多則通知合併成一次寄送。認領時把 available_at 往後延一段租期，
+執行緒中途結束時租期過後會由其他執行緒重新認領；多個 gunicorn worker 同時執行也不會重複寄送。
+"""
+import logging
+import smtplib
+import threading
+import time
+from collections import Counter, defaultdict, namedtuple
+from email.message import EmailMessage
+
+# 認領到的一則通知；nickname/contact 為收件者資料，team_name 在隊伍已刪除時為 None
+ClaimedNotification = namedtuple('ClaimedNotification',
+                                 'id user_id nickname contact kind team_id team_name payload attempts')
+
+logger = logging.getLogger(__name__)
+
+
+class LogSender:
+    """開發用：把通知寫到 log。"""
+
+    def __init__(self, log=logger):
+        self.log = log
+
+    def send(self, recipient, subject, lines):
+        self.log.info('通知 %s（user %s）：%s\n%s', recipient.nickname, recipient.user_id, subject, '\n'.join(lines))
+        return True
+
+
+class SmtpSender:
+    """以 SMTP 寄出；聯絡方式不是 email 的使用者略過（回傳 False）。"""
+
+    def __init__(self, host, port, from_address, timeout=10):
+        self.host = host
+        self.port = port
+        self.from_address = from_address
+        self.timeout = timeout
+
+    def send(self, recipient, subject, lines):
+        if '@' not in (recipient.contact or ''):
+            return False
+        message = EmailMessage()
+        message['From'] = self.from_address
+        message['To'] = recipient.contact
+        message['Subject'] = subject
+        message.set_content('\n'.join(lines))
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            smtp.send_message(message)
+        return True
+
+
+def coalesce(notifications):
+    """依收件者分組，保持認領時的順序。"""
+    by_user = defaultdict(list)
+    for notification in notifications:
+        by_user[notification.user_id].append(notification)
+    return list(by_user.values())
+
+
+class OutboxWorkerPool:
+    """claim(batch_size) 認領一批通知並回傳 ClaimedNotification 清單；finish(delivered_ids, failed) 刪除已寄出的通知，
+    failed 為 [(ClaimedNotification, 錯誤訊息)]，由呼叫端決定重試時間或放棄。
+    render(notifications) 把同一收件者的通知組成 (主旨, 內文各行)。
+
+    claim/finish 在各執行緒自己的 app context 中執行，寄送在 transaction 之外進行。
+    """
+
+    def __init__(self, claim, finish, render, sender, workers=1, batch_size=100, interval=1.0, run_in_context=None):
+        self.claim = claim
+        self.finish = finish
+        self.render = render
+        self.sender = sender
+        self.workers = workers
+        self.batch_size = batch_size
+        self.interval = interval
+        self.run_in_context = run_in_context or (lambda func: func())
+        self._lock = threading.Lock()
+        self._threads = []
+        self._stats = Counter()
+        self._send_seconds = 0.0
+
+    @property
+    def started(self):
+        return bool(self._threads)
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'notification-worker-{index}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self):
+        while True:
+            try:
+                handled = self.run_in_context(self.drain_once)
+            except Exception:
+                logger.exception('處理通知失敗')
+                handled = 0
+            # 還有積壓時立刻認領下一批
+            if handled < self.batch_size:
+                time.sleep(self.interval)
+
+    def drain_once(self):
+        """認領並寄送一批，回傳處理的通知數。"""
+        notifications = self.claim(self.batch_size)
+        if not notifications:
+            return 0
+        delivered, failed = [], []
+        counts = Counter()
+        for group in coalesce(notifications):
+            subject, lines = self.render(group)
+            started = time.perf_counter()
+            try:
+                sent = self.sender.send(group[0], subject, lines)
+            except Exception as exc:
+                failed += [(notification, f'{type(exc).__name__}: {exc}') for notification in group]
+                counts['failures'] += 1
+            else:
+                delivered += [notification.id for notification in group]
+                counts['deliveries' if sent else 'skipped'] += 1
+            counts['send_seconds'] += time.perf_counter() - started
+        self.finish(delivered, failed)
+        with self._lock:
+            self._stats['batches'] += 1
+            self._stats['notifications'] += len(notifications)
+            self._stats['delivered'] += len(delivered)
+            self._stats['failed'] += len(failed)
+            self._stats['deliveries'] += counts['deliveries']
+            self._stats['skipped'] += counts['skipped']
+            self._stats['send_failures'] += counts['failures']
+            self._send_seconds += counts['send_seconds']
+        return len(notifications)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, send_seconds=round(self._send_seconds, 6),
+                        workers=sum(thread.is_alive() for thread in self._threads))
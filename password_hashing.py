@@ -0,0 +1,106 @@
+"""密碼雜湊：雜湊刻意設計得很慢，交給固定數量的背景執行緒計算，請求執行緒只等待結果。
+
+同時計算的雜湊數受 workers 限制，大量登入時其他路由仍有 CPU 可用（scrypt 每次另需約 32MB 記憶體，也一併受限）；
+排隊中的雜湊超過 max_pending 時直接丟出 HasherBusy，由呼叫端回應 503，不讓請求無限堆積。
+hashlib 的 scrypt / pbkdf2_hmac 計算時會釋放 GIL，背景執行緒可真正平行執行。
+
+雜湊方式使用 werkzeug 的格式（例如 scrypt:32768:8:1、pbkdf2:sha256:600000），
+登入成功時若既有雜湊的方式或成本與設定不同，順便以新設定重新雜湊。
+"""
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+SCRYPT_DEFAULTS = ('32768', '8', '1')  # N、r、p，與 werkzeug 相同
+
+
+class HasherBusy(Exception):
+    """排隊的雜湊已滿或等待逾時。"""
+
+
+def normalize_method(method):
+    """補齊省略的參數，讓設定值可與雜湊字串開頭的方式直接比較。"""
+    name, *params = method.split(':')
+    if name == 'scrypt':
+        return ':'.join(['scrypt', *params, *SCRYPT_DEFAULTS[len(params):]])
+    if name == 'pbkdf2':
+        defaults = ('sha256', str(DEFAULT_PBKDF2_ITERATIONS))
+        return ':'.join(['pbkdf2', *params, *defaults[len(params):]])
+    raise ValueError(f'不支援的雜湊方式：{method}')
+
+
+def method_of(password_hash):
+    return password_hash.split('$', 1)[0]
+
+
+class PasswordHasher:
+    def __init__(self, method, workers=1, max_pending=16, timeout=10.0):
+        self.method = normalize_method(method)
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._stats = Counter()
+        self._pending = 0
+        self._hash_seconds = 0.0
+        self._wait_seconds = 0.0
+
+    def needs_rehash(self, password_hash):
+        return method_of(password_hash) != self.method
+
+    def _timed(self, func, *args):
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self._hash_seconds += time.perf_counter() - started
+
+    def _submit(self, func, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats['rejected'] += 1
+            raise HasherBusy('排隊的雜湊已滿')
+        with self._lock:
+            self._stats['submitted'] += 1
+            self._pending += 1
+        started = time.perf_counter()
+        future = self._executor.submit(self._timed, func, *args)
+        future.add_done_callback(self._release)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            # 已開始的計算無法中止，完成後才釋放名額
+            with self._lock:
+                self._stats['timeouts'] += 1
+            raise HasherBusy('等待雜湊逾時') from None
+        finally:
+            with self._lock:
+                self._wait_seconds += time.perf_counter() - started
+
+    def _release(self, future):
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def hash(self, password):
+        return self._submit(generate_password_hash, password, self.method)
+
+    def _verify(self, password_hash, password):
+        if not check_password_hash(password_hash, password):
+            return False, None
+        if self.needs_rehash(password_hash):
+            return True, generate_password_hash(password, self.method)
+        return True, None
+
+    def verify(self, password_hash, password):
+        """回傳 (是否相符, 新雜湊)；新雜湊只在相符且需要以新設定重新雜湊時才有值。"""
+        return self._submit(self._verify, password_hash, password)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, pending=self._pending, hash_seconds=round(self._hash_seconds, 6),
+                        wait_seconds=round(self._wait_seconds, 6))
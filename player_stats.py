@@ -0,0 +1,56 @@
+"""球員信譽統計：累計值存在 user_stats（每人一列），近期統計以活動日期分日累加在 user_stats_day，
+顯示時直接讀取，不必彙總每位球員的完整報名與取消紀錄。
+
+計數的意義（都只計正式名額，候補不算）：
+- joined：取得正式名額的次數（報名成功、候補遞補、建立隊伍的主辦者）
+- played：活動結束後由過期隊伍清理結算，清理前仍算在已報名中
+- cancellations / late_cancellations：退出正式名額的次數，距活動開始不足 LATE_CANCEL_HOURS 小時為臨時取消
+- notice_hours_total：退出時距活動開始的小時數總和（活動已開始才退出以 0 計），除以取消次數即平均提前時間
+
+近期統計依活動日期分組：最近 WINDOW_DAYS 天內（含今天）舉行的活動，尚未舉行的活動不計入。
+"""
+from collections import namedtuple
+from datetime import timedelta
+
+LATE_CANCEL_HOURS = 24
+WINDOW_DAYS = 90
+COUNTERS = ('joined_count', 'played_count', 'cancellation_count', 'late_cancellation_count', 'notice_hours_total')
+
+StatsSummary = namedtuple('StatsSummary', 'joined played cancellations late_cancellations average_notice_hours reliability')
+EMPTY = StatsSummary(0, 0, 0, 0, None, None)
+
+
+def cancellation_deltas(hours_before):
+    """退出正式名額時各計數的增量。"""
+    return {
+        'cancellation_count': 1,
+        'late_cancellation_count': int(hours_before < LATE_CANCEL_HOURS),
+        'notice_hours_total': max(hours_before, 0.0),
+    }
+
+
+def window_range(today):
+    """近期統計涵蓋的活動日期（含頭尾）。"""
+    return today - timedelta(days=WINDOW_DAYS - 1), today
+
+
+def reliability(played, late_cancellations):
+    """出席率：完成的場次占（完成＋臨時取消）的比例；沒有紀錄時為 None。"""
+    total = played + late_cancellations
+    return played / total if total else None
+
+
+def summarize(row):
+    """user_stats / 近期統計查詢結果（具 COUNTERS 屬性，None 表示沒有紀錄）轉為 StatsSummary。"""
+    if row is None:
+        return EMPTY
+    played, late = row.played_count or 0, row.late_cancellation_count or 0
+    cancellations = row.cancellation_count or 0
+    return StatsSummary(
+        joined=row.joined_count or 0,
+        played=played,
+        cancellations=cancellations,
+        late_cancellations=late,
+        average_notice_hours=round((row.notice_hours_total or 0) / cancellations, 1) if cancellations else None,
+        reliability=reliability(played, late),
+    )
@@ -0,0 +1,147 @@
+"""請求量測：每個 endpoint 的延遲、SQL 查詢數與資料庫耗時，輸出為 Prometheus 文字格式。
+
+每個請求開始時建立一個 RequestTrace，SQLAlchemy 的 cursor 事件把查詢記到目前請求的
+trace 上；請求結束時一次併入各 endpoint 的直方圖，鎖只在結束時取用一次。
+同一個查詢在單一請求內重複執行達門檻時視為疑似 N+1。
+"""
+import bisect
+import os
+import threading
+import time
+from collections import Counter
+
+from sqlalchemy import event
+
+# 秒
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# 慢請求紀錄最多保留的 SQL 數量與每句長度
+MAX_LOGGED_STATEMENTS = 50
+MAX_STATEMENT_LENGTH = 500
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        # le 為「小於等於」，落在邊界上的值算進該 bucket
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class RequestTrace:
+    """單一請求執行過的 SQL。"""
+
+    __slots__ = ('started', 'queries', 'db_seconds', 'statements', 'log')
+
+    def __init__(self, keep_sql):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.statements = Counter()
+        self.log = [] if keep_sql else None
+
+    def record(self, statement, seconds):
+        self.queries += 1
+        self.db_seconds += seconds
+        self.statements[statement] += 1
+        if self.log is not None and len(self.log) < MAX_LOGGED_STATEMENTS:
+            self.log.append((seconds, statement[:MAX_STATEMENT_LENGTH]))
+
+
+def instrument_engine(engine, current_trace):
+    """把 engine 上的每個查詢記到 current_trace() 回傳的 trace；沒有進行中的請求時不記錄。"""
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        context.query_started = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        trace = current_trace()
+        if trace is not None:
+            trace.record(statement, time.perf_counter() - context.query_started)
+
+
+class RequestMetrics:
+    def __init__(self, n_plus_one_threshold=10, slow_request_seconds=0):
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.slow_request_seconds = slow_request_seconds
+        self._lock = threading.Lock()
+        self._requests = Counter()
+        self._latency = {}
+        self._queries = {}
+        self._db_seconds = Counter()
+        self._n_plus_one = Counter()
+        self._slow = Counter()
+
+    def start(self):
+        return RequestTrace(keep_sql=bool(self.slow_request_seconds))
+
+    def finish(self, trace, endpoint, method, status):
+        """併入統計，回傳 (耗時秒數, 重複最多次的 (SQL, 次數) 或 None, 是否為慢請求)。"""
+        seconds = time.perf_counter() - trace.started
+        repeated = None
+        if trace.statements:
+            statement, count = trace.statements.most_common(1)[0]
+            if count >= self.n_plus_one_threshold:
+                repeated = (statement, count)
+        slow = bool(self.slow_request_seconds) and seconds >= self.slow_request_seconds
+        with self._lock:
+            self._requests[(endpoint, method, str(status))] += 1
+            if endpoint not in self._latency:
+                self._latency[endpoint] = Histogram(LATENCY_BUCKETS)
+                self._queries[endpoint] = Histogram(QUERY_BUCKETS)
+            self._latency[endpoint].observe(seconds)
+            self._queries[endpoint].observe(trace.queries)
+            self._db_seconds[endpoint] += trace.db_seconds
+            if repeated:
+                self._n_plus_one[endpoint] += 1
+            if slow:
+                self._slow[endpoint] += 1
+        return seconds, repeated, slow
+
+    def render(self, extra=()):
+        """Prometheus 文字格式。extra 為 (名稱, 型別, 說明, [(labels, 值), ...])。"""
+        worker = {'worker': str(os.getpid())}
+        with self._lock:
+            families = [
+                ('http_requests_total', 'counter', '完成的請求數',
+                 [(dict(endpoint=e, method=m, status=s), n) for (e, m, s), n in sorted(self._requests.items())]),
+                ('db_query_seconds_total', 'counter', '請求內 SQL 執行時間合計',
+                 [({'endpoint': e}, round(v, 6)) for e, v in sorted(self._db_seconds.items())]),
+                ('n_plus_one_requests_total', 'counter', '同一查詢重複執行達門檻的請求數',
+                 [({'endpoint': e}, n) for e, n in sorted(self._n_plus_one.items())]),
+                ('slow_requests_total', 'counter', '超過慢請求門檻的請求數',
+                 [({'endpoint': e}, n) for e, n in sorted(self._slow.items())]),
+            ]
+            histograms = [
+                ('http_request_duration_seconds', '請求處理時間', self._latency),
+                ('db_queries_per_request', '每個請求執行的 SQL 數', self._queries),
+            ]
+            lines = []
+            for name, help_text, per_endpoint in histograms:
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+                for endpoint, histogram in sorted(per_endpoint.items()):
+                    labels = dict(worker, endpoint=endpoint)
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{format_labels(dict(labels, le=str(bound)))} {cumulative}')
+                    lines.append(f'{name}_sum{format_labels(labels)} {round(histogram.sum, 6)}')
+                    lines.append(f'{name}_count{format_labels(labels)} {histogram.count}')
+        for name, kind, help_text, samples in families + list(extra):
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+            lines += [f'{name}{format_labels(dict(worker, **labels))} {value}' for labels, value in samples]
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels):
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in labels.values())
+    return '{' + ','.join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + '}'
@@ -0,0 +1,468 @@
+let currentTeamId = null;
+let allTeams = [];
+let nextCursor = null;
+let isLoadingTeams = false;
+let teamsObserver = null;
+let teamsRequestSeq = 0;
+// 目前列表中與已報名隊伍時間重疊的隊伍（team_id → 重疊的隊伍）與已報名的隊伍
+let teamConflicts = {};
+let joinedTeamIds = new Set();
+// 依距離篩選時使用的目前位置（第一次選擇距離時才向瀏覽器取得）
+let userPosition = null;
+
+function showTeams() {
+    document.getElementById('filterSection').style.display = 'block';
+    document.getElementById('teamsContainer').style.display = 'block';
+    setupInfiniteScroll();
+    loadTeams(true);
+}
+
+function buildTeamsQuery() {
+    const params = new URLSearchParams();
+    const keyword = document.getElementById('filterKeyword').value.trim();
+    const city = document.getElementById('filterCity').value;
+    const venue = document.getElementById('filterVenue').value.trim();
+    const skill = document.getElementById('filterSkill').value;
+    const timePeriod = document.getElementById('filterTime').value;
+    if (keyword) params.set('q', keyword);
+    if (city) params.set('city', city);
+    if (venue) params.set('venue', venue);
+    if (skill) params.set('skill_level', skill);
+    if (timePeriod) params.set('time_period', timePeriod);
+    const radius = document.getElementById('filterRadius').value;
+    const near = radius && userPosition;
+    if (near) {
+        params.set('near', `${userPosition.latitude.toFixed(5)},${userPosition.longitude.toFixed(5)}`);
+        params.set('radius', radius);
+    }
+    // 有關鍵字時依相關度排序；沒有位置時無法依距離排序
+    let sort = document.getElementById('sortTeams').value;
+    if (sort === 'distance' && !near) sort = 'start_time';
+    params.set('sort', keyword && sort === 'start_time' ? 'relevance' : sort);
+    return params;
+}
+
+// reset 為 true 時從第一頁重新載入，否則以 nextCursor 載入下一頁
+async function loadTeams(reset = false) {
+    if (!reset && (isLoadingTeams || !nextCursor)) return;
+    // 以序號丟棄過期的回應（例如載入下一頁時使用者又改了篩選條件）
+    const seq = ++teamsRequestSeq;
+    isLoadingTeams = true;
+    document.getElementById('loadingSpinner').style.display = 'block';
+    
+    try {
+        const params = buildTeamsQuery();
+        if (!reset) params.set('cursor', nextCursor);
+        const response = await fetch('/teams?' + params.toString());
+        const page = await response.json();
+        if (seq !== teamsRequestSeq) return;
+        if (reset) {
+            allTeams = [];
+            teamConflicts = {};
+            joinedTeamIds = new Set();
+        }
+        allTeams = allTeams.concat(page.teams);
+        nextCursor = page.next_cursor;
+        displayTeams(page.teams, reset);
+        loadAvailability(page.teams);
+    } catch (error) {
+        console.error('載入隊伍失敗:', error);
+        alert('載入隊伍失敗，請重試');
+    } finally {
+        if (seq === teamsRequestSeq) {
+            isLoadingTeams = false;
+            document.getElementById('loadingSpinner').style.display = 'none';
+        }
+    }
+}
+
+// 一次查詢這一頁隊伍與自己行程的衝突，未登入時伺服器回 401，略過即可
+async function loadAvailability(teams) {
+    if (teams.length === 0) return;
+    try {
+        const response = await fetch('/teams/availability?team_ids=' + teams.map(t => t.id).join(','));
+        if (!response.ok) return;
+        const result = await response.json();
+        Object.assign(teamConflicts, result.conflicts);
+        result.joined.forEach(id => joinedTeamIds.add(id));
+        teams.forEach(team => markTeamCard(team.id));
+    } catch (error) {
+        console.error('載入行程衝突失敗:', error);
+    }
+}
+
+function markTeamCard(teamId) {
+    const card = document.querySelector(`.team-card[data-team-id="${teamId}"]`);
+    if (!card) return;
+    const badges = card.querySelector('.schedule-badges');
+    if (joinedTeamIds.has(teamId)) {
+        badges.innerHTML = '<span class="badge bg-primary">已報名</span>';
+    } else if (teamConflicts[teamId]) {
+        card.classList.add('team-conflict');
+        badges.innerHTML = `<span class="badge bg-danger" title="${conflictText(teamConflicts[teamId])}">時間衝突</span>`;
+    }
+}
+
+function conflictText(conflicts) {
+    return conflicts.map(c => `${c.name}（${c.start_time} - ${c.end_time.slice(11)}${c.is_waitlist ? '，候補' : ''}）`).join('、');
+}
+
+function setupInfiniteScroll() {
+    if (teamsObserver || !('IntersectionObserver' in window)) return;
+    teamsObserver = new IntersectionObserver(entries => {
+        if (entries.some(entry => entry.isIntersecting)) {
+            loadTeams();
+        }
+    }, { rootMargin: '200px' });
+    teamsObserver.observe(document.getElementById('teamsSentinel'));
+}
+
+function displayTeams(teams, reset = true) {
+    const container = document.getElementById('teamsList');
+    
+    if (reset && teams.length === 0) {
+        container.innerHTML = '<div class="col-12"><div class="alert alert-info">目前沒有符合條件的隊伍</div></div>';
+        return;
+    }
+    
+    const html = teams.map(team => `
+        <div class="col-md-6 mb-4">
+            <div class="card team-card h-100" data-team-id="${team.id}" onclick="showTeamDetail(${team.id})">
+                ${team.cover_image ? `<img src="${team.cover_image}" class="card-img-top team-cover" alt="" loading="lazy" decoding="async">` : ''}
+                <div class="card-body">
+                    <div class="d-flex justify-content-between align-items-start mb-2">
+                        <h5 class="card-title">${team.name}</h5>
+                        <span class="badge bg-${team.current_members >= team.max_participants ? 'danger' : 'success'}">
+                            ${team.current_members}/${team.max_participants}人
+                        </span>
+                    </div>
+                    
+                    <div class="mb-2">
+                        <small class="text-muted">
+                            <i class="fas fa-user me-1"></i>主辦者：${team.organizer} <span class="ms-2 badge bg-secondary">${team.organizer_gender}</span> <span class="ms-1 badge bg-success">級數 ${team.organizer_skill_level}</span>
+                        </small>
+                    </div>
+                    
+                    <div class="mb-2">
+                        <i class="fas fa-map-marker-alt me-1 text-main-pink"></i>
+                        <strong>${team.location_city}</strong> - ${team.location_venue}
+                        ${team.distance_km != null ? `<span class="ms-1 text-muted small">${team.distance_km} 公里</span>` : ''}
+                    </div>
+                    
+                    <div class="mb-2">
+                        <i class="fas fa-clock me-1 text-main-pink"></i>
+                        ${formatDateTime(team.start_time)} - ${formatTime(team.end_time)}
+                    </div>
+                    
+                    <div class="mb-2">
+                        <span class="badge bg-info">${team.activity_type}</span>
+                        ${team.waitlist_count > 0 ? `<span class="badge bg-warning ms-1">候補 ${team.waitlist_count}人</span>` : ''}
+                        <span class="schedule-badges ms-1"></span>
+                    </div>
+                    
+                    ${team.description ? `<p class="card-text text-muted small">${team.description.substring(0, 100)}${team.description.length > 100 ? '...' : ''}</p>` : ''}
+                </div>
+            </div>
+        </div>
+    `).join('');
+    
+    if (reset) {
+        container.innerHTML = html;
+    } else {
+        container.insertAdjacentHTML('beforeend', html);
+    }
+}
+
+function formatDateTime(dateTimeStr) {
+    const date = new Date(dateTimeStr);
+    return date.toLocaleDateString('zh-TW') + ' ' + date.toLocaleTimeString('zh-TW', {hour: '2-digit', minute: '2-digit'});
+}
+
+function renderSkillLevel(level) {
+    // 支援數字與字串
+    const table = {
+        1: '初學', 2: '初級', 3: '中級', 4: '中高級', 5: '高級', 6: '競技',
+        '1': '初學', '2': '初級', '3': '中級', '4': '中高級', '5': '高級', '6': '競技',
+        '初學': '初學', '初級': '初級', '中級': '中級', '中高級': '中高級', '高級': '高級', '競技': '競技'
+    };
+    return table[level] || level || '';
+}
+
+function formatTime(dateTimeStr) {
+    const date = new Date(dateTimeStr);
+    return date.toLocaleTimeString('zh-TW', {hour: '2-digit', minute: '2-digit'});
+}
+
+function showTeamDetail(teamId) {
+    currentTeamId = teamId;
+    const team = allTeams.find(t => t.id === teamId);
+    
+    if (!team) return;
+    
+    document.getElementById('teamModalTitle').textContent = team.name;
+    
+    const isFull = team.current_members >= team.max_participants;
+    const joinBtn = document.getElementById('joinTeamBtn');
+    
+    if (isFull) {
+        joinBtn.textContent = '候補登記';
+        joinBtn.className = 'btn btn-warning';
+    } else {
+        joinBtn.textContent = '我要加入';
+        joinBtn.className = 'btn';
+    }
+    
+    const conflicts = joinedTeamIds.has(teamId) ? null : teamConflicts[teamId];
+    
+    document.getElementById('teamModalBody').innerHTML = `
+        ${conflicts ? `
+        <div class="alert alert-warning">
+            <i class="fas fa-exclamation-triangle me-2"></i>與已報名的${conflictText(conflicts)}時間重疊
+        </div>
+        ` : ''}
+        <div class="row">
+            <div class="col-md-6">
+                <h6><i class="fas fa-user me-2"></i>主辦者資訊</h6>
+                <p>${team.organizer} <span class="ms-2 badge bg-secondary">${team.organizer_gender}</span> <span class="ms-1 badge bg-success">級數 ${team.organizer_skill_level}</span></p>
+                
+                <h6><i class="fas fa-map-marker-alt me-2"></i>活動地點</h6>
+                <p><strong>${team.location_city}</strong><br>
+                ${team.location_venue}<br>
+                <small class="text-muted">${team.location_address}</small></p>
+            </div>
+            <div class="col-md-6">
+                <h6><i class="fas fa-clock me-2"></i>活動時間</h6>
+                <p>${formatDateTime(team.start_time)}<br>
+                至 ${formatTime(team.end_time)}</p>
+                
+                <h6><i class="fas fa-users me-2"></i>參與狀況</h6>
+                <p>已報名：${team.current_members}/${team.max_participants}人<br>
+                ${team.waitlist_count > 0 ? `候補：${team.waitlist_count}人<br>` : ''}
+                活動類型：<span class="badge bg-info">${team.activity_type}</span></p>
+            </div>
+        </div>
+        
+        ${team.description ? `
+        <div class="mt-3">
+            <h6><i class="fas fa-info-circle me-2"></i>活動說明</h6>
+            <p>${team.description}</p>
+        </div>
+        ` : ''}
+        
+        <div class="mt-3">
+            <h6><i class="fas fa-comments me-2"></i>討論區</h6>
+            <div id="teamMessages" class="border rounded p-3" style="max-height: 200px; overflow-y: auto;">
+                <div class="text-center text-muted">載入留言中...</div>
+            </div>
+            <div class="mt-2">
+                <div class="input-group">
+                    <input type="text" class="form-control" id="newMessage" placeholder="輸入留言...">
+                    <button class="btn btn-outline-accent" onclick="sendMessage()">
+                        <i class="fas fa-paper-plane"></i>
+                    </button>
+                </div>
+            </div>
+        </div>
+    `;
+    
+    loadTeamMessages(teamId);
+    startMessagePolling(teamId);
+    
+    const modal = new bootstrap.Modal(document.getElementById('teamModal'));
+    modal.show();
+}
+
+// 討論區：開啟時載入最新一頁，之後以 SSE 接收新留言（或以 after_id 輪詢，無新留言時伺服器回 304）
+let latestMessageId = 0;
+let messagePollTimer = null;
+let teamEventSource = null;
+
+function renderTeamMessage(msg) {
+    const twTime = formatTaiwanTime(msg.created_at);
+    return `
+        <div class="mb-2">
+            <strong>${sanitizeMessage(msg.user_nickname)}</strong>
+            <small class="text-muted">${twTime}</small>
+            <div>${sanitizeMessage(msg.message)}</div>
+        </div>
+    `;
+}
+
+async function loadTeamMessages(teamId) {
+    try {
+        const response = await fetch(`/team/${teamId}/messages`);
+        const messages = await response.json();
+        
+        const container = document.getElementById('teamMessages');
+        latestMessageId = messages.length > 0 ? messages[0].id : 0;
+        
+        if (messages.length === 0) {
+            container.innerHTML = '<div class="text-center text-muted" id="noTeamMessages">還沒有留言</div>';
+            return;
+        }
+        
+        // 留言由下到上
+        container.innerHTML = messages.slice().reverse().map(renderTeamMessage).join('');
+        container.scrollTop = container.scrollHeight;
+    } catch (error) {
+        console.error('載入留言失敗:', error);
+    }
+}
+
+async function pollTeamMessages(teamId) {
+    try {
+        const response = await fetch(`/team/${teamId}/messages?after_id=${latestMessageId}`);
+        if (!response.ok || teamId !== currentTeamId) return;
+        appendTeamMessages(await response.json());
+    } catch (error) {
+        console.error('更新留言失敗:', error);
+    }
+}
+
+function appendTeamMessages(messages) {
+    // messages 由新到舊排列；略過已顯示過的留言
+    messages = messages.filter(msg => msg.id > latestMessageId);
+    if (messages.length === 0) return;
+    
+    const container = document.getElementById('teamMessages');
+    const placeholder = document.getElementById('noTeamMessages');
+    if (placeholder) placeholder.remove();
+    latestMessageId = messages[0].id;
+    container.insertAdjacentHTML('beforeend', messages.slice().reverse().map(renderTeamMessage).join(''));
+    container.scrollTop = container.scrollHeight;
+}
+
+// 優先以 SSE 接收新留言，不支援或伺服器串流已滿（503）時退回輪詢
+function startMessagePolling(teamId) {
+    stopMessagePolling();
+    if ('EventSource' in window) {
+        const events = new EventSource(`/team/${teamId}/events`);
+        teamEventSource = events;
+        events.addEventListener('message', event => appendTeamMessages([JSON.parse(event.data)]));
+        // 網路中斷時 EventSource 會自動重連；收到非 200 回應時則直接關閉
+        events.addEventListener('error', () => {
+            if (events.readyState === EventSource.CLOSED && teamEventSource === events) {
+                teamEventSource = null;
+                messagePollTimer = setInterval(() => pollTeamMessages(teamId), 5000);
+            }
+        });
+    } else {
+        messagePollTimer = setInterval(() => pollTeamMessages(teamId), 5000);
+    }
+}
+
+function stopMessagePolling() {
+    if (teamEventSource) {
+        teamEventSource.close();
+        teamEventSource = null;
+    }
+    if (messagePollTimer) {
+        clearInterval(messagePollTimer);
+        messagePollTimer = null;
+    }
+}
+
+document.getElementById('teamModal').addEventListener('hidden.bs.modal', stopMessagePolling);
+
+async function sendMessage() {
+    const messageInput = document.getElementById('newMessage');
+    const message = messageInput.value.trim();
+    
+    if (!message) return;
+    
+    try {
+        const response = await fetch(`/team/${currentTeamId}/messages`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ message: message })
+        });
+        
+        const result = await response.json();
+        
+        if (result.success) {
+            messageInput.value = '';
+            pollTeamMessages(currentTeamId);
+        } else {
+            alert('發送留言失敗');
+        }
+    } catch (error) {
+        alert('發送留言失敗');
+    }
+}
+
+async function joinTeam() {
+    if (!currentTeamId) return;
+    
+    try {
+        const response = await fetch(`/join_team/${currentTeamId}`, {
+            method: 'POST'
+        });
+        
+        const result = await response.json();
+        
+        if (result.success) {
+            alert(result.conflicts && result.conflicts.length
+                ? `${result.status}！注意：與${conflictText(result.conflicts)}時間重疊`
+                : `${result.status}！`);
+            const modal = bootstrap.Modal.getInstance(document.getElementById('teamModal'));
+            modal.hide();
+            refreshTeams();
+        } else {
+            alert(result.error || '加入失敗');
+        }
+    } catch (error) {
+        alert('加入失敗，請重試');
+    }
+}
+
+// 篩選與排序交由伺服器處理，重新從第一頁載入
+async function filterTeams() {
+    const radiusSelect = document.getElementById('filterRadius');
+    if (radiusSelect.value && !userPosition) {
+        try {
+            userPosition = await BadmintonApp.getCurrentLocation();
+            document.getElementById('sortTeams').value = 'distance';
+        } catch (error) {
+            alert(error.message);
+            radiusSelect.value = '';
+        }
+    }
+    loadTeams(true);
+}
+
+function clearFilters() {
+    document.getElementById('filterKeyword').value = '';
+    document.getElementById('filterCity').value = '';
+    document.getElementById('filterVenue').value = '';
+    document.getElementById('filterSkill').value = '';
+    document.getElementById('filterTime').value = '';
+    document.getElementById('filterRadius').value = '';
+    loadTeams(true);
+}
+
+function refreshTeams() {
+    loadTeams(true);
+}
+
+// Add some CSS for better UX
+const style = document.createElement('style');
+style.textContent = `
+    .team-card {
+        cursor: pointer;
+        transition: transform 0.2s, box-shadow 0.2s;
+    }
+    .team-card:hover {
+        transform: translateY(-2px);
+        box-shadow: 0 4px 8px rgba(0,0,0,0.1);
+    }
+    .team-card.team-conflict {
+        opacity: 0.6;
+    }
+    .team-card .team-cover {
+        aspect-ratio: 16 / 9;
+        object-fit: cover;
+    }
+`;
+document.head.appendChild(style);
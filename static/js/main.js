@@ -134,6 +134,18 @@ function formatDateTime(dateString) {
     }
 }
 
+// 留言時間：伺服器存的是 UTC（YYYY-MM-DD HH:MM），顯示時 +8 小時
+function formatTaiwanTime(createdAt) {
+    const date = new Date(createdAt.replace(/-/g, '/'));
+    date.setHours(date.getHours() + 8);
+    return `${date.getFullYear()}-${String(date.getMonth()+1).padStart(2,'0')}-${String(date.getDate()).padStart(2,'0')} ${String(date.getHours()).padStart(2,'0')}:${String(date.getMinutes()).padStart(2,'0')}`;
+}
+
+function getCsrfToken() {
+    const token = document.querySelector('meta[name="csrf-token"]');
+    return token ? token.getAttribute('content') : '';
+}
+
 function showNotification(message, type = 'info') {
     const notification = document.createElement('div');
     notification.className = `alert alert-${type} alert-dismissible fade show position-fixed`;
@@ -404,6 +416,8 @@ function leaveTeam(teamId) {
 // Export functions for use in other scripts
 window.BadmintonApp = {
     formatDateTime,
+    formatTaiwanTime,
+    getCsrfToken,
     showNotification,
     confirmAction,
     apiCall,
@@ -0,0 +1,252 @@
+// 留言 cursor：頁面只渲染最新一頁，之後以 SSE（或 after_id 輪詢）接收新留言、before_id 載入較早留言
+// 隊伍 id 與留言 cursor 由模板的 TEAM_PAGE 提供
+const TEAM_ID = TEAM_PAGE.teamId;
+let latestMessageId = TEAM_PAGE.latestMessageId;
+let oldestMessageId = TEAM_PAGE.oldestMessageId;
+const MESSAGE_POLL_INTERVAL = 5000;
+const ROSTER_POLL_INTERVAL = 30000;
+
+function renderMessage(msg) {
+    const twTime = formatTaiwanTime(msg.created_at);
+    return `
+        <div class="mb-3 border-bottom pb-2">
+            <div class="d-flex justify-content-between">
+                <strong>${sanitizeMessage(msg.user_nickname)}</strong>
+                <small class="text-muted">${twTime}</small>
+            </div>
+            <div class="mt-1">${sanitizeMessage(msg.message)}</div>
+        </div>
+    `;
+}
+
+async function fetchNewMessages() {
+    try {
+        const response = await fetch(`/team/${TEAM_ID}/messages?after_id=${latestMessageId}`);
+        if (!response.ok) return;
+        appendMessages(await response.json());
+    } catch (error) {
+        console.error('Error polling messages:', error);
+    }
+}
+
+async function loadEarlierMessages() {
+    const wrapper = document.getElementById('loadEarlierMessages');
+    try {
+        const response = await fetch(`/team/${TEAM_ID}/messages?before_id=${oldestMessageId}&limit=${TEAM_PAGE.messagePageSize}`);
+        const messages = await response.json();
+        if (messages.length > 0) {
+            oldestMessageId = messages[messages.length - 1].id;
+            wrapper.insertAdjacentHTML('afterend', messages.slice().reverse().map(renderMessage).join(''));
+        }
+        if (messages.length < TEAM_PAGE.messagePageSize) {
+            wrapper.remove();
+        }
+    } catch (error) {
+        console.error('Error loading earlier messages:', error);
+    }
+}
+
+function appendMessages(messages) {
+    // messages 由新到舊排列；略過已顯示過的留言
+    messages = messages.filter(msg => msg.id > latestMessageId);
+    if (messages.length === 0) return;
+    
+    const container = document.getElementById('messagesContainer');
+    const placeholder = document.getElementById('noMessages');
+    if (placeholder) placeholder.remove();
+    if (!oldestMessageId) oldestMessageId = messages[messages.length - 1].id;
+    latestMessageId = messages[0].id;
+    container.insertAdjacentHTML('beforeend', messages.slice().reverse().map(renderMessage).join(''));
+    container.scrollTop = container.scrollHeight;
+}
+
+// 名單異動後稍候再取得名單區塊：短時間內的多次異動只取一次，
+// 隨機延遲讓同時觀看的所有頁面分散送出請求
+const ROSTER_REFRESH_DELAY = 1000;
+const ROSTER_REFRESH_JITTER = 2000;
+let rosterRefreshTimer = null;
+
+function scheduleRosterRefresh() {
+    if (rosterRefreshTimer) return;
+    rosterRefreshTimer = setTimeout(refreshRoster, ROSTER_REFRESH_DELAY + Math.random() * ROSTER_REFRESH_JITTER);
+}
+
+async function refreshRoster() {
+    rosterRefreshTimer = null;
+    try {
+        const response = await fetch(`/team/${TEAM_ID}/roster`);
+        if (!response.ok) return;
+        const roster = await response.json();
+        document.getElementById('teamRoster').innerHTML = roster.html;
+        document.getElementById('memberCount').textContent = roster.member_count;
+        document.getElementById('waitlistCount').textContent = roster.waitlist_count;
+        document.getElementById('waitlistInfo').style.display = roster.waitlist_count ? '' : 'none';
+    } catch (error) {
+        console.error('Error refreshing roster:', error);
+    }
+}
+
+function updateCover(data) {
+    let cover = document.getElementById('teamCover');
+    if (!cover) {
+        cover = document.createElement('img');
+        cover.id = 'teamCover';
+        cover.className = 'card-img-top';
+        cover.alt = document.title;
+        cover.style.aspectRatio = '16 / 9';
+        cover.style.objectFit = 'cover';
+        document.getElementById('teamHeader').after(cover);
+    }
+    cover.removeAttribute('srcset');
+    cover.src = data.cover_image;
+}
+
+function startPolling() {
+    setInterval(() => {
+        if (document.visibilityState === 'visible') fetchNewMessages();
+    }, MESSAGE_POLL_INTERVAL);
+    // 名單有 ETag，沒有異動時伺服器回 304
+    setInterval(() => {
+        if (document.visibilityState === 'visible') refreshRoster();
+    }, ROSTER_POLL_INTERVAL);
+}
+
+// 優先使用 SSE 接收新留言與名單異動，不支援或伺服器串流已滿（503）時退回輪詢
+if ('EventSource' in window) {
+    const events = new EventSource(`/team/${TEAM_ID}/events`);
+    events.addEventListener('message', event => appendMessages([JSON.parse(event.data)]));
+    ['join', 'leave', 'promote'].forEach(kind => {
+        events.addEventListener(kind, scheduleRosterRefresh);
+    });
+    events.addEventListener('cover', event => updateCover(JSON.parse(event.data)));
+    // 網路中斷時 EventSource 會自動重連；收到非 200 回應時則直接關閉
+    events.addEventListener('error', () => {
+        if (events.readyState === EventSource.CLOSED) startPolling();
+    });
+} else {
+    startPolling();
+}
+
+function handleEnter(event) {
+    if (event.key === 'Enter') {
+        sendMessage();
+    }
+}
+
+async function sendMessage() {
+    const messageInput = document.getElementById('messageInput');
+    const message = messageInput.value.trim();
+    
+    if (!message) {
+        alert('請輸入留言內容');
+        return;
+    }
+    
+    if (message.length > 500) {
+        alert('留言內容不能超過500字');
+        return;
+    }
+    
+    // Disable button to prevent double submission
+    const sendButton = event.target;
+    sendButton.disabled = true;
+    sendButton.innerHTML = '<i class="fas fa-spinner fa-spin"></i>';
+    
+    try {
+        const response = await fetch(`/team/${TEAM_ID}/messages`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': getCsrfToken()
+            },
+            body: JSON.stringify({ message: message })
+        });
+        
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        
+        const result = await response.json();
+        
+        if (result.success) {
+            messageInput.value = '';
+            fetchNewMessages();
+        } else {
+            alert(result.error || '發送留言失敗');
+        }
+    } catch (error) {
+        console.error('Error sending message:', error);
+        alert('發送留言失敗，請檢查網路連線');
+    } finally {
+        // Re-enable button
+        sendButton.disabled = false;
+        sendButton.innerHTML = '<i class="fas fa-paper-plane"></i>';
+    }
+}
+
+async function joinTeam(teamId) {
+    if (!confirm('確定要加入這個隊伍嗎？')) {
+        return;
+    }
+    
+    try {
+        const response = await fetch('/join_team/' + teamId, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': getCsrfToken()
+            }
+        });
+        
+        // 時間衝突（409）等錯誤也會回傳 JSON 的 error
+        const result = await response.json();
+        
+        if (result.success) {
+            const conflicts = (result.conflicts || []).map(c => `${c.name}（${c.start_time}）`);
+            alert(conflicts.length ? `${result.status}！注意：與${conflicts.join('、')}時間重疊` : `${result.status}！`);
+            refreshRoster();
+        } else {
+            alert(result.error || '加入失敗');
+        }
+    } catch (error) {
+        console.error('Error joining team:', error);
+        alert('加入失敗，請檢查網路連線後重試');
+    }
+}
+
+// 封面圖直接以檔案內容作為請求本文上傳，伺服器邊收邊寫入磁碟
+async function uploadCover(input) {
+    const file = input.files[0];
+    if (!file) return;
+    const error = BadmintonApp.validateImageFile(file);
+    if (error) {
+        alert(error);
+        input.value = '';
+        return;
+    }
+    BadmintonApp.previewImage(input, document.getElementById('coverPreview'));
+    input.disabled = true;
+    
+    try {
+        const response = await fetch(`/team/${TEAM_ID}/cover`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': file.type,
+                'X-CSRFToken': getCsrfToken()
+            },
+            body: file
+        });
+        const result = await response.json();
+        
+        if (result.success) {
+            updateCover({cover_image: result.variants.large});
+        } else {
+            alert(result.error || '上傳失敗');
+        }
+    } catch (error) {
+        console.error('Error uploading cover:', error);
+        alert('上傳失敗，請檢查網路連線後重試');
+    } finally {
+        input.disabled = false;
+    }
+}
@@ -0,0 +1,211 @@
+"""靜態檔案建置：把 static/ 下的檔案壓縮空白後以內容雜湊重新命名，另存 gzip / brotli 預先壓縮檔，
+輸出到 static/dist/ 並寫入 manifest.json（原始路徑 -> 指紋檔名）。
+
+執行期以 manifest 把 url_for('static', ...) 換成指紋檔名；檔名隨內容改變，可讓瀏覽器快取一年。
+manifest 記錄原始檔的雜湊，原始檔改過但尚未重新建置時該檔改回提供原始檔，不會送出過期的內容。
+只處理 static/ 下的自有檔案；base.html 引用的 Bootstrap、Font Awesome 與 Google Fonts 仍由 CDN 提供。
+CSS 內 url() 的相對路徑不會改寫成指紋檔名，引用其他檔案的 CSS 不適合放進 static/ 建置。
+
+用法：python static_assets.py（或 flask build-assets）
+"""
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import re
+from collections import namedtuple
+
+BUILD_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+FINGERPRINT_LENGTH = 12
+# 值得預先壓縮的文字檔；圖片等已壓縮的格式只加上指紋
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt', '.map')
+# 依偏好順序：brotli 較小，瀏覽器支援時優先使用
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+logger = logging.getLogger(__name__)
+
+# 建置後的檔案：path 為 dist/ 下的相對路徑，encodings 為有預先壓縮檔的編碼
+BuiltAsset = namedtuple('BuiltAsset', 'path digest mimetype encodings')
+
+# 字串與 url(...) 內的內容原樣保留，只處理其餘部分
+CSS_TOKENS = re.compile(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|url\([^)]*\))|(/\*.*?\*/)|(\s+)''', re.S)
+CSS_PUNCTUATION = re.compile(r'\s*([{};,])\s*')
+
+
+def minify_css(text):
+    """移除註解並壓縮空白；字串與 url() 不變。"""
+    # 逐段處理：字串以 \0 包起來保留、註解刪除、空白收成一個空格
+    out = []
+    last = 0
+    for match in CSS_TOKENS.finditer(text):
+        out.append(text[last:match.start()])
+        literal, comment, space = match.groups()
+        if literal:
+            out.append('\0' + literal + '\0')
+        elif space:
+            out.append(' ')
+        last = match.end()
+    out.append(text[last:])
+    pieces = ''.join(out).split('\0')
+    # 偶數位置為一般內容，奇數位置為保留的字串
+    for index in range(0, len(pieces), 2):
+        pieces[index] = CSS_PUNCTUATION.sub(r'\1', pieces[index]).replace(';}', '}')
+    return ''.join(pieces).strip() + '\n'
+
+
+def minify_js(text):
+    """保守的壓縮：只移除縮排、空行與整行的 // 註解，保留換行，不改變程式語意（含自動分號插入）。
+    樣板字串內的縮排也會移除，對產生的 HTML 沒有影響。"""
+    lines = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line and not line.startswith('//'):
+            lines.append(line)
+    return '\n'.join(lines) + '\n'
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+
+def file_digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def compressors():
+    """可用的壓縮方式；brotli 為選用套件，未安裝時只產生 gzip。"""
+    available = {'gzip': lambda data: gzip.compress(data, compresslevel=9, mtime=0)}
+    try:
+        import brotli
+    except ImportError:
+        logger.warning('未安裝 brotli，只產生 gzip 預先壓縮檔')
+    else:
+        available['br'] = lambda data: brotli.compress(data, quality=11)
+    return available
+
+
+def iter_sources(static_dir):
+    for root, dirs, files in os.walk(static_dir):
+        if root == static_dir and BUILD_DIR in dirs:
+            dirs.remove(BUILD_DIR)
+        dirs.sort()
+        for name in sorted(files):
+            if not name.startswith('.'):
+                yield os.path.relpath(os.path.join(root, name), static_dir).replace(os.sep, '/')
+
+
+def write_file(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+def build(static_dir):
+    """建置 static_dir 下所有檔案，回傳 manifest。舊的指紋檔保留，部署期間仍在使用舊頁面的瀏覽器不會找不到檔案。"""
+    out_dir = os.path.join(static_dir, BUILD_DIR)
+    available = compressors()
+    assets = {}
+    for source in iter_sources(static_dir):
+        with open(os.path.join(static_dir, source), 'rb') as f:
+            original = f.read()
+        stem, extension = os.path.splitext(source)
+        minify = MINIFIERS.get(extension)
+        data = minify(original.decode('utf-8')).encode('utf-8') if minify else original
+        path = f'{stem}.{file_digest(data)[:FINGERPRINT_LENGTH]}{extension}'
+        write_file(os.path.join(out_dir, path), data)
+        encodings = []
+        if extension in COMPRESSIBLE:
+            for encoding, suffix in ENCODINGS:
+                if encoding not in available:
+                    continue
+                compressed = available[encoding](data)
+                # 壓縮後沒有變小就不提供
+                if len(compressed) < len(data):
+                    write_file(os.path.join(out_dir, path + suffix), compressed)
+                    encodings.append(encoding)
+        assets[source] = {
+            'path': path,
+            'source_digest': file_digest(original),
+            'size': len(data),
+            'encodings': encodings,
+        }
+    manifest = {'version': file_digest(json.dumps(assets, sort_keys=True).encode())[:FINGERPRINT_LENGTH],
+                'assets': assets}
+    write_file(os.path.join(out_dir, MANIFEST_NAME),
+               json.dumps(manifest, ensure_ascii=False, indent=2, sort_keys=True).encode('utf-8'))
+    return manifest
+
+
+class AssetManifest:
+    """執行期查詢：url_path() 把原始路徑換成 dist/ 下的指紋路徑，built() 查詢指紋路徑對應的建置檔。"""
+
+    def __init__(self, static_dir, assets=None, version=''):
+        self.static_dir = static_dir
+        self.version = version
+        self._urls = {}
+        self._built = {}
+        for source, entry in (assets or {}).items():
+            path = f'{BUILD_DIR}/{entry["path"]}'
+            mimetype = mimetypes.guess_type(source)[0] or 'application/octet-stream'
+            self._urls[source] = path
+            self._built[path] = BuiltAsset(os.path.join(static_dir, BUILD_DIR, entry['path']),
+                                           entry['path'].rsplit('.', 2)[-2], mimetype, tuple(entry['encodings']))
+
+    def url_path(self, filename):
+        return self._urls.get(filename, filename)
+
+    def built(self, path):
+        return self._built.get(path)
+
+
+def load_manifest(static_dir):
+    """讀取 manifest；尚未建置時回傳空的 manifest（照常提供原始檔）。"""
+    try:
+        with open(os.path.join(static_dir, BUILD_DIR, MANIFEST_NAME), encoding='utf-8') as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return AssetManifest(static_dir)
+    assets = {}
+    for source, entry in manifest['assets'].items():
+        try:
+            with open(os.path.join(static_dir, source), 'rb') as f:
+                current = file_digest(f.read())
+        except FileNotFoundError:
+            continue
+        if current != entry['source_digest']:
+            logger.warning('%s 在建置後有修改，改為提供原始檔；請重新執行 flask build-assets', source)
+            continue
+        assets[source] = entry
+    return AssetManifest(static_dir, assets, manifest['version'])
+
+
+def parse_accept_encoding(header):
+    """回傳用戶端接受的編碼（q=0 表示不接受）。"""
+    accepted = set()
+    for item in (header or '').split(','):
+        name, _, params = item.strip().partition(';')
+        quality = re.search(r'q\s*=\s*([0-9]*\.?[0-9]+)', params)
+        if name and not (quality and float(quality.group(1)) == 0):
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+def choose_encoding(asset, accept_encoding):
+    """依 Accept-Encoding 挑選預先壓縮檔，回傳 (編碼, 路徑)；都不接受時回傳 (None, 未壓縮檔)。"""
+    accepted = parse_accept_encoding(accept_encoding)
+    for encoding, suffix in ENCODINGS:
+        if encoding in asset.encodings and (encoding in accepted or '*' in accepted):
+            return encoding, asset.path + suffix
+    return None, asset.path
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    static_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+    result = build(static_dir)
+    for name, entry in sorted(result['assets'].items()):
+        print(f'{name} -> {BUILD_DIR}/{entry["path"]} ({entry["size"]} bytes; {", ".join(entry["encodings"]) or "-"})')
@@ -0,0 +1,107 @@
+"""隊伍位置：經緯度切成固定大小的網格，每個隊伍存一個格子編號並建立索引。
+附近搜尋只讀取搜尋範圍涵蓋的格子，再以距離過濾與排序，不必對每個隊伍計算距離。
+
+格子為緯度、經度各 CELL_DEGREES 度的方格（台灣附近約 5.5 × 5 公里）。同一緯度列的格子編號連續，
+每一列只需一個 BETWEEN 範圍。範圍跨越 ±180 度經線時不處理。
+"""
+import math
+from collections import namedtuple
+
+import sqlalchemy as sa
+
+CELL_DEGREES = 0.05
+CELLS_PER_ROW = round(360 / CELL_DEGREES)
+ROWS = round(180 / CELL_DEGREES)
+KM_PER_DEGREE = math.pi * 6371.0088 / 180  # 每度緯度的公里數
+
+DEFAULT_RADIUS_KM = 5.0
+MAX_RADIUS_KM = 50.0
+
+Near = namedtuple('Near', 'latitude longitude radius_km')
+
+
+def validate_coordinates(latitude, longitude):
+    """轉為 float 並檢查範圍，無法辨識時丟出 ValueError。"""
+    latitude, longitude = float(latitude), float(longitude)
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValueError((latitude, longitude))
+    return latitude, longitude
+
+
+def _row(latitude):
+    return min(max(math.floor((latitude + 90) / CELL_DEGREES), 0), ROWS - 1)
+
+
+def _column(longitude):
+    return min(max(math.floor((longitude + 180) / CELL_DEGREES), 0), CELLS_PER_ROW - 1)
+
+
+def cell_of(latitude, longitude):
+    return _row(latitude) * CELLS_PER_ROW + _column(longitude)
+
+
+def cell_expression(latitude, longitude):
+    """與 cell_of 相同的格子編號，以 SQL 計算（加上偏移後必為非負，CAST 截斷即為無條件捨去）。"""
+    row = sa.func.min(sa.cast((latitude + 90) / CELL_DEGREES, sa.Integer), ROWS - 1)
+    column = sa.func.min(sa.cast((longitude + 180) / CELL_DEGREES, sa.Integer), CELLS_PER_ROW - 1)
+    return row * CELLS_PER_ROW + column
+
+
+def geo_columns(latitude, longitude):
+    """由座標算出要存入資料表的格子編號，沒有座標時為 None。"""
+    if latitude is None or longitude is None:
+        return {'geo_cell': None}
+    return {'geo_cell': cell_of(latitude, longitude)}
+
+
+def register_sync(model):
+    """新增或修改時以 ORM 事件同步格子編號；以 executemany 批次寫入時需自行呼叫 geo_columns。"""
+
+    @sa.event.listens_for(model, 'before_insert')
+    @sa.event.listens_for(model, 'before_update')
+    def _sync(mapper, connection, target):
+        for name, value in geo_columns(target.latitude, target.longitude).items():
+            setattr(target, name, value)
+
+
+def parse_near(value, radius=''):
+    """near='緯度,經度'、radius 公里（預設 DEFAULT_RADIUS_KM）轉為 Near，無法辨識時丟出 ValueError。"""
+    latitude, longitude = validate_coordinates(*value.split(','))
+    radius_km = float(radius) if radius else DEFAULT_RADIUS_KM
+    if not 0 < radius_km <= MAX_RADIUS_KM:
+        raise ValueError(radius)
+    return Near(latitude, longitude, radius_km)
+
+
+def cell_ranges(near):
+    """搜尋範圍外接方框涵蓋的格子，每個緯度列一段 (起, 迄) 編號。"""
+    lat_span = near.radius_km / KM_PER_DEGREE
+    # 離赤道越遠，每度經度越短；以方框內緯度絕對值最大處計算，確保涵蓋整個圓
+    widest = min(abs(near.latitude) + lat_span, 89.9)
+    lon_span = min(near.radius_km / (KM_PER_DEGREE * math.cos(math.radians(widest))), 180)
+    first_column, last_column = _column(near.longitude - lon_span), _column(near.longitude + lon_span)
+    return [
+        (row * CELLS_PER_ROW + first_column, row * CELLS_PER_ROW + last_column)
+        for row in range(_row(near.latitude - lat_span), _row(near.latitude + lat_span) + 1)
+    ]
+
+
+def distance_sq_column(model, near):
+    """與搜尋點距離（公里）的平方。
+
+    以等距圓柱投影近似，只用四則運算即可在 SQLite 內計算；MAX_RADIUS_KM 以內與大圓距離的誤差在 0.5% 以內。
+    """
+    km_per_lon_degree = KM_PER_DEGREE * math.cos(math.radians(near.latitude))
+    dx = (model.longitude - near.longitude) * km_per_lon_degree
+    dy = (model.latitude - near.latitude) * KM_PER_DEGREE
+    return dx * dx + dy * dy
+
+
+def where_clauses(model, near):
+    """只讀取涵蓋的格子（走 geo_cell 索引），再排除方框角落超出半徑的隊伍。"""
+    cells = sa.or_(*(model.geo_cell.between(first, last) for first, last in cell_ranges(near)))
+    return [cells, distance_sq_column(model, near) <= near.radius_km ** 2]
+
+
+def distance_km(distance_sq):
+    return round(math.sqrt(distance_sq), 2)
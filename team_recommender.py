@@ -0,0 +1,180 @@
+"""隊伍推薦：以 NumPy 特徵矩陣替所有即將開始的隊伍與目前使用者計分。
+
+隊伍端特徵（城市、時段、主辦者與成員級數、剩餘名額）預先整理成欄位陣列，
+隊伍有異動時只重算該隊；使用者端只是幾個數值，計分是一次整批的陣列運算。
+"""
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+
+import numpy as np
+
+from team_slots import TIME_SLOTS, to_local
+
+SLOT_NAMES = list(TIME_SLOTS)
+
+WEIGHTS = {
+    'organizer_skill': 0.25,
+    'member_skill': 0.20,
+    'region': 0.25,
+    'time': 0.20,
+    'seats': 0.10,
+}
+# 級數差距達此值以上，級數分數為 0
+MAX_SKILL_GAP = 6.0
+# 單次異動的隊伍超過此數量時直接整批重建
+REBUILD_THRESHOLD = 2000
+
+# load_rows 回傳的每一列
+TeamRow = namedtuple('TeamRow', 'id start_time end_time city capacity organizer_skill member_count member_skill_sum')
+
+COLUMNS = ('ids', 'start_ts', 'city', 'slots', 'organizer_skill', 'member_skill', 'seats')
+
+
+def slot_coverage(start, end):
+    """隊伍時間（UTC）換算成台灣時間後落在各偏好時段的比例（跨午夜的部分算到隔天）。"""
+    local = to_local(start)
+    begin = local.hour + local.minute / 60
+    finish = begin + max((end - start).total_seconds() / 3600, 0)
+    duration = finish - begin
+    if duration <= 0:
+        return [0.0] * len(SLOT_NAMES)
+    coverage = []
+    for name in SLOT_NAMES:
+        low, high = TIME_SLOTS[name]
+        overlap = sum(max(0.0, min(finish, high + day) - max(begin, low + day)) for day in (0, 24))
+        coverage.append(overlap / duration)
+    return coverage
+
+
+def user_slot_vector(preferred_time):
+    if preferred_time in TIME_SLOTS:
+        return np.array([name == preferred_time for name in SLOT_NAMES], dtype=np.float32)
+    # 皆可、不限或未填寫
+    return np.ones(len(SLOT_NAMES), dtype=np.float32)
+
+
+class TeamRecommender:
+    """每個 worker 一份隊伍特徵陣列；sync() 依事件 id 增量更新，rank() 只讀取當下的快照。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._columns = None
+        self._row_of = {}
+        self._cities = {}
+        self._generation = None
+        self._event_id = None
+
+    def _city_code(self, city):
+        return self._cities.setdefault(city, len(self._cities))
+
+    def _encode(self, rows):
+        columns = {
+            'ids': np.array([row.id for row in rows], dtype=np.int64),
+            'start_ts': np.array([row.start_time.timestamp() for row in rows], dtype=np.float64),
+            'city': np.array([self._city_code(row.city) for row in rows], dtype=np.int32),
+            'slots': np.array([slot_coverage(row.start_time, row.end_time) for row in rows],
+                              dtype=np.float32).reshape(len(rows), len(SLOT_NAMES)),
+            'organizer_skill': np.array([row.organizer_skill for row in rows], dtype=np.float32),
+            # 沒有正式成員時以主辦者級數代表
+            'member_skill': np.array([row.member_skill_sum / row.member_count if row.member_count
+                                      else row.organizer_skill for row in rows], dtype=np.float32),
+            'seats': np.array([max(row.capacity - row.member_count, 0) / row.capacity if row.capacity else 0.0
+                               for row in rows], dtype=np.float32),
+        }
+        return columns
+
+    def _rebuild(self, rows):
+        rows = list(rows)
+        self._columns = self._encode(rows)
+        self._row_of = {team_id: index for index, team_id in enumerate(self._columns['ids'].tolist())}
+
+    def _upsert(self, team_ids, rows):
+        # 先複製再修改，正在計分的執行緒仍使用舊的陣列
+        rows = list(rows)
+        columns = {name: array.copy() for name, array in self._columns.items()}
+        found = {row.id for row in rows}
+        # 已刪除或已開始的隊伍：開始時間設為 0，計分時自然被排除
+        for team_id in team_ids:
+            if team_id not in found and team_id in self._row_of:
+                columns['start_ts'][self._row_of[team_id]] = 0
+        fresh = self._encode(rows)
+        appended = []
+        for index, team_id in enumerate(fresh['ids'].tolist()):
+            row = self._row_of.get(team_id)
+            if row is None:
+                appended.append(index)
+                continue
+            for name in COLUMNS:
+                columns[name][row] = fresh[name][index]
+        if appended:
+            start = len(columns['ids'])
+            for name in COLUMNS:
+                columns[name] = np.concatenate([columns[name], fresh[name][appended]])
+            for offset, index in enumerate(appended):
+                self._row_of[int(fresh['ids'][index])] = start + offset
+        self._columns = columns
+
+    def sync(self, generation, latest_event_id, changed_team_ids, load_rows):
+        """generation 改變（例如個人檔案級數變動）時整批重建，否則只重算事件涉及的隊伍。
+
+        changed_team_ids(after_id, until_id) 回傳異動的隊伍 id；load_rows(team_ids) 回傳 TeamRow，
+        team_ids 為 None 時載入所有即將開始的隊伍。
+        """
+        with self._lock:
+            if self._columns is not None and generation == self._generation and latest_event_id == self._event_id:
+                return
+            rebuild = (self._columns is None or generation != self._generation
+                       or latest_event_id < self._event_id or self._mostly_expired())
+            if not rebuild:
+                team_ids = changed_team_ids(self._event_id, latest_event_id)
+                if len(team_ids) > REBUILD_THRESHOLD:
+                    rebuild = True
+                else:
+                    self._upsert(team_ids, load_rows(team_ids))
+            if rebuild:
+                self._rebuild(load_rows(None))
+            self._generation = generation
+            self._event_id = latest_event_id
+
+    def _mostly_expired(self):
+        start_ts = self._columns['start_ts']
+        expired = int(np.count_nonzero(start_ts <= time.time()))
+        return expired > 1000 and expired * 2 > len(start_ts)
+
+    def rank(self, skill_level, region, preferred_time, limit=20, exclude=(), now=None):
+        """回傳 [(team_id, score), ...]，分數 0~1，由高到低。"""
+        columns = self._columns
+        if columns is None or not len(columns['ids']):
+            return []
+        now = (now or datetime.utcnow()).timestamp()
+        skill = np.float32(skill_level)
+        organizer_fit = np.clip(1 - np.abs(columns['organizer_skill'] - skill) / MAX_SKILL_GAP, 0, 1)
+        member_fit = np.clip(1 - np.abs(columns['member_skill'] - skill) / MAX_SKILL_GAP, 0, 1)
+        region_code = self._cities.get(region, -1)
+        region_fit = (columns['city'] == region_code).astype(np.float32)
+        time_fit = columns['slots'] @ user_slot_vector(preferred_time)
+        scores = (WEIGHTS['organizer_skill'] * organizer_fit
+                  + WEIGHTS['member_skill'] * member_fit
+                  + WEIGHTS['region'] * region_fit
+                  + WEIGHTS['time'] * time_fit
+                  + WEIGHTS['seats'] * columns['seats'])
+        eligible = columns['start_ts'] > now
+        if exclude:
+            eligible &= ~np.isin(columns['ids'], np.fromiter(exclude, dtype=np.int64))
+        candidates = np.flatnonzero(eligible)
+        if not len(candidates):
+            return []
+        limit = min(limit, len(candidates))
+        top = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(int(columns['ids'][i]), float(scores[i])) for i in top]
+
+    def stats(self):
+        columns = self._columns
+        return {
+            'teams': 0 if columns is None else len(columns['ids']),
+            'event_id': self._event_id,
+            'generation': self._generation,
+        }
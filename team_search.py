@@ -0,0 +1,116 @@
+import re
+
+import sqlalchemy as sa
+
+# 全文檢索：以 SQLite FTS5 索引隊伍名稱、球場、地址與說明。
+# unicode61 會把連續的中文字視為同一個詞，無法以「新莊」找到「新莊體育館」，
+# 因此寫入前先把中文斷成二字詞（bigram），並保留每段最後一個字，
+# 查詢一個字時改用前綴比對，兩個字以上則要求所有二字詞都出現。
+
+FTS_COLUMNS = ('name', 'venue', 'address', 'description')
+# bm25 欄位權重，與 FTS_COLUMNS 順序一致
+FTS_WEIGHTS = (10.0, 5.0, 2.0, 1.0)
+
+CJK_RUN = re.compile(r'[㐀-䶿一-鿿豈-﫿]+')
+QUERY_TERM = re.compile(r'[㐀-䶿一-鿿豈-﫿]+|[^\W_]+')
+
+CREATE_FTS_TABLE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS team_fts USING fts5("
+    "name, venue, address, description, tokenize='unicode61 remove_diacritics 2')"
+)
+# 刪除改由觸發器處理，批次 DELETE 也能保持同步
+CREATE_DELETE_TRIGGER = (
+    "CREATE TRIGGER IF NOT EXISTS team_fts_delete AFTER DELETE ON team BEGIN "
+    "DELETE FROM team_fts WHERE rowid = old.id; END"
+)
+
+team_fts = sa.table('team_fts', sa.column('rowid'), sa.column('team_fts'))
+
+
+def _segment_run(run):
+    if len(run) == 1:
+        return run
+    bigrams = [run[i:i + 2] for i in range(len(run) - 1)]
+    return ' '.join(bigrams + [run[-1]])
+
+
+def segment_text(text):
+    if not text:
+        return ''
+    return CJK_RUN.sub(lambda m: ' ' + _segment_run(m.group()) + ' ', text)
+
+
+def build_match_query(q):
+    terms = []
+    for word in QUERY_TERM.findall(q or ''):
+        if CJK_RUN.fullmatch(word):
+            if len(word) == 1:
+                terms.append(f'"{word}"*')
+            else:
+                terms.extend(f'"{word[i:i + 2]}"' for i in range(len(word) - 1))
+        else:
+            terms.append(f'"{word}"*')
+    return ' '.join(terms)
+
+
+def match_clause(match_query):
+    return team_fts.c.team_fts.op('MATCH')(match_query)
+
+
+def score_column():
+    return sa.func.bm25(sa.literal_column('team_fts'), *FTS_WEIGHTS)
+
+
+def install(connection):
+    connection.exec_driver_sql(CREATE_FTS_TABLE)
+    connection.exec_driver_sql(CREATE_DELETE_TRIGGER)
+
+
+def _row_values(team):
+    return (
+        segment_text(team.name),
+        segment_text(team.location_venue),
+        segment_text(team.location_address),
+        segment_text(team.description),
+    )
+
+
+def index_team(connection, team):
+    connection.exec_driver_sql('DELETE FROM team_fts WHERE rowid = ?', (team.id,))
+    connection.exec_driver_sql(
+        'INSERT INTO team_fts (rowid, name, venue, address, description) VALUES (?, ?, ?, ?, ?)',
+        (team.id,) + _row_values(team)
+    )
+
+
+def register_sync(model):
+    """以 ORM 事件在同一個 transaction 內同步新增/修改的隊伍。"""
+
+    @sa.event.listens_for(model, 'after_insert')
+    @sa.event.listens_for(model, 'after_update')
+    def _sync(mapper, connection, target):
+        index_team(connection, target)
+
+
+def rebuild(connection, teams, batch_size=1000):
+    """清空並重建索引，teams 為可迭代的 Team 物件，回傳寫入筆數。"""
+    connection.exec_driver_sql('DELETE FROM team_fts')
+    total = 0
+    batch = []
+    for team in teams:
+        batch.append((team.id,) + _row_values(team))
+        if len(batch) >= batch_size:
+            total += _insert_batch(connection, batch)
+            batch = []
+    if batch:
+        total += _insert_batch(connection, batch)
+    connection.exec_driver_sql("INSERT INTO team_fts (team_fts) VALUES ('optimize')")
+    return total
+
+
+def _insert_batch(connection, batch):
+    connection.exec_driver_sql(
+        'INSERT INTO team_fts (rowid, name, venue, address, description) VALUES (?, ?, ?, ?, ?)',
+        batch
+    )
+    return len(batch)
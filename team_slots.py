@@ -0,0 +1,112 @@
+"""隊伍時段：開始時間所屬的星期、時段與分鐘數預先存成欄位，篩選時直接比對有索引的欄位，
+不必對每一列計算 strftime。
+
+隊伍時間以 UTC 儲存（建立隊伍時前端送出 toISOString()，程式以 datetime.utcnow() 比較），
+星期、時段與是否為假日則依台灣時間（UTC+8，無日光節約時間）判斷，與頁面顯示的時間一致。
+"""
+from collections import namedtuple
+from datetime import timedelta
+
+import sqlalchemy as sa
+
+LOCAL_UTC_OFFSET = timedelta(hours=8)  # 遷移的回填 SQL 以 strftime(..., '+8 hours') 做相同換算
+
+# 時段以開始時間判斷（小時，含起不含迄），與 User.preferred_time 的選項一致
+TIME_SLOTS = {'早上': (6, 12), '下午': (12, 18), '晚上': (18, 24)}
+LATE_NIGHT = '深夜'  # 0~6 點開始
+
+# 篩選選項的別名（首頁篩選使用「上午」「晚間」）
+SLOT_ALIASES = {'上午': '早上', '晚間': '晚上'}
+DAY_TYPES = {'平日': False, '假日': True}
+# 個人檔案中代表不限時段的選項
+ANY_TIME = ('皆可', '不限', '')
+
+# is_weekend：None 不限；time_slot：None 不限；weekdays：0=週一 … 6=週日；minute_from/minute_until：開始時間落在此區間（含）
+SlotFilter = namedtuple('SlotFilter', 'is_weekend time_slot weekdays minute_from minute_until')
+NO_FILTER = SlotFilter(None, None, None, None, None)
+
+
+def to_local(utc_time):
+    """資料庫中的 UTC 時間（naive datetime）轉為台灣時間。"""
+    return utc_time + LOCAL_UTC_OFFSET
+
+
+def time_slot_of(local_time):
+    for name, (low, high) in TIME_SLOTS.items():
+        if low <= local_time.hour < high:
+            return name
+    return LATE_NIGHT
+
+
+def slot_columns(start_time):
+    """由開始時間（UTC）算出要存入資料表的時段欄位，皆以台灣時間計算。"""
+    local = to_local(start_time)
+    return {
+        'start_weekday': local.weekday(),
+        'start_minute': local.hour * 60 + local.minute,
+        'time_slot': time_slot_of(local),
+        'is_weekend': local.weekday() >= 5,
+    }
+
+
+def register_sync(model):
+    """新增或修改隊伍時以 ORM 事件同步時段欄位；以 executemany 批次寫入時需自行呼叫 slot_columns。"""
+
+    @sa.event.listens_for(model, 'before_insert')
+    @sa.event.listens_for(model, 'before_update')
+    def _sync(mapper, connection, target):
+        if target.start_time is not None:
+            for name, value in slot_columns(target.start_time).items():
+                setattr(target, name, value)
+
+
+def parse_time_period(value):
+    """「平日晚間」「假日」「早上」等篩選值轉為 (is_weekend, time_slot)，無法辨識時丟出 ValueError。"""
+    value = (value or '').strip()
+    is_weekend = None
+    for prefix, weekend in DAY_TYPES.items():
+        if value.startswith(prefix):
+            is_weekend = weekend
+            value = value[len(prefix):]
+            break
+    value = SLOT_ALIASES.get(value, value)
+    if value and value not in TIME_SLOTS and value != LATE_NIGHT:
+        raise ValueError(value)
+    return is_weekend, value or None
+
+
+def parse_clock(value):
+    """'HH:MM' 轉為當天第幾分鐘，無法辨識時丟出 ValueError。"""
+    hours, minutes = value.split(':')
+    hours, minutes = int(hours), int(minutes)
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError(value)
+    return hours * 60 + minutes
+
+
+def parse_weekdays(value):
+    """'1,6,7'（ISO：1=週一 … 7=週日）轉為排序後的 weekday() 值，無法辨識時丟出 ValueError。"""
+    days = sorted({int(day) - 1 for day in value.split(',') if day.strip()})
+    if not days or days[0] < 0 or days[-1] > 6:
+        raise ValueError(value)
+    return tuple(days)
+
+
+def where_clauses(model, slot_filter):
+    """SlotFilter 轉為 WHERE 條件。
+
+    時段走 (time_slot, start_time, id, is_weekend) 索引、只篩平日/假日走 (is_weekend, start_time, id)，
+    兩者都依 start_time 排序，分頁查詢讀滿一頁就停；星期與時間區間則在依序掃描時逐筆過濾。
+    """
+    clauses = []
+    if slot_filter.time_slot is not None:
+        clauses.append(model.time_slot == slot_filter.time_slot)
+    if slot_filter.is_weekend is not None:
+        clauses.append(model.is_weekend == slot_filter.is_weekend)
+    if slot_filter.weekdays is not None:
+        clauses.append(model.start_weekday.in_(slot_filter.weekdays))
+    if slot_filter.minute_from is not None:
+        clauses.append(model.start_minute >= slot_filter.minute_from)
+    if slot_filter.minute_until is not None:
+        clauses.append(model.start_minute <= slot_filter.minute_until)
+    return clauses